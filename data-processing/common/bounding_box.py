@@ -27,17 +27,116 @@ from common.types import (
 )
 
 
+CV2_MAXIMUM_HUE = 180
+
+
+class HueIndex:
+    """
+    An index of the pixels in an image by hue, for finding all pixels of a hue without scanning the
+    whole image. Building the index converts the image to HSV once. Each lookup then only
+    touches the pixels that match the hue. Build one index per page when searching a page for
+    many hues (e.g., for every entity colorized in a batch).
+
+    Only pixels selected by 'pixel_mask' (a boolean array with the same height and width as the
+    image) are indexed. Hues are expressed as they are for 'find_boxes_with_color'.
+    """
+
+    def __init__(self, hsv_image: np.ndarray, pixel_mask: np.ndarray) -> None:
+        ys, xs = np.nonzero(pixel_mask)
+        hues = hsv_image[ys, xs, 0]
+        order = np.argsort(hues, kind="stable")
+        self.ys = ys[order]
+        self.xs = xs[order]
+        self.values = hsv_image[ys, xs, 2][order]
+        sorted_hues = hues[order]
+
+        # Pixels with cv2 hue 'h' are at positions 'hue_starts[h]' to 'hue_starts[h + 1]'.
+        self.hue_starts = np.searchsorted(
+            sorted_hues, np.arange(CV2_MAXIMUM_HUE + 1), side="left"
+        )
+
+    @staticmethod
+    def for_saturated_pixels(
+        image: np.ndarray, saturation_threshold: int = 50
+    ) -> "HueIndex":
+        """
+        Index all pixels with a saturation above 'saturation_threshold' (out of 255). This is the
+        index that 'find_boxes_with_color' searches: white pixels could be detected as having any
+        hue, so unsaturated pixels are left out.
+        """
+        img_hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+        return HueIndex(img_hsv, img_hsv[:, :, 1] > saturation_threshold)
+
+    def find_pixels(
+        self,
+        hue: float,
+        tolerance: float,
+        value_range: Optional[Tuple[float, float]] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the y- and x-coordinates of all indexed pixels that match 'hue'. If 'value_range' is
+        provided, only pixels with a value (from 0-to-255) at or above the start of the range and
+        below the end of the range are returned.
+        """
+        matching_hues = _get_matching_cv2_hues(hue, tolerance)
+        slices = [
+            slice(self.hue_starts[h], self.hue_starts[h + 1]) for h in matching_hues
+        ]
+        if len(slices) == 0:
+            return np.array([], dtype=self.ys.dtype), np.array([], dtype=self.xs.dtype)
+
+        ys = np.concatenate([self.ys[s] for s in slices])
+        xs = np.concatenate([self.xs[s] for s in slices])
+        if value_range is not None:
+            values = np.concatenate([self.values[s] for s in slices])
+            in_range = (values >= value_range[0]) & (values < value_range[1])
+            ys, xs = ys[in_range], xs[in_range]
+        return ys, xs
+
+    def contains_hue(
+        self,
+        hue: float,
+        tolerance: float,
+        value_range: Optional[Tuple[float, float]] = None,
+    ) -> bool:
+        " Determine whether any indexed pixel matches 'hue' (see 'find_pixels'). "
+        if value_range is not None:
+            ys, _ = self.find_pixels(hue, tolerance, value_range)
+            return len(ys) > 0
+        return any(
+            self.hue_starts[h + 1] > self.hue_starts[h]
+            for h in _get_matching_cv2_hues(hue, tolerance)
+        )
+
+
+def _get_matching_cv2_hues(hue: float, tolerance: float) -> np.ndarray:
+    """
+    Get all of the hues that OpenCV could assign to a pixel (0-179) that are within 'tolerance'
+    of 'hue'. Distances between hues wrap around, as hue is an angle.
+    """
+    cv2_hue = hue * CV2_MAXIMUM_HUE
+    cv2_tolerance = tolerance * CV2_MAXIMUM_HUE
+    distance_to_hue = np.abs(np.arange(CV2_MAXIMUM_HUE) - cv2_hue)
+    abs_distance_to_hue = np.minimum(distance_to_hue, CV2_MAXIMUM_HUE - distance_to_hue)
+    return np.nonzero(abs_distance_to_hue <= cv2_tolerance)[0]
+
+
 def extract_bounding_boxes(
     diff_image: np.ndarray,
     page_number: int,
     hue: float,
     masks: Optional[Iterable[FloatRectangle]] = None,
+    hue_index: Optional[HueIndex] = None,
+    tolerance: float = 0.01,
+    value_range: Optional[Tuple[float, float]] = None,
 ) -> List[BoundingBox]:
     """
     See 'PixelMerger' for description of how bounding boxes are extracted.
     Masks are assumed to be non-intersecting. Masks should be expressed as ratios relative to the
     page's width and height instead of pixel values---left, top, width, and height all have values
-    in the range 0..1).
+    in the range 0..1). When extracting boxes for many hues from the same image, pass in
+    a 'hue_index' built for the image, so that the image is only indexed once. See
+    'find_boxes_with_color' for a description of the other arguments.
     """
     image_height, image_width, _ = diff_image.shape
     pixel_masks = None
@@ -52,7 +151,16 @@ def extract_bounding_boxes(
             for m in masks
         ]
 
-    pixel_boxes = list(find_boxes_with_color(diff_image, hue, masks=pixel_masks))
+    pixel_boxes = list(
+        find_boxes_with_color(
+            diff_image,
+            hue,
+            tolerance=tolerance,
+            masks=pixel_masks,
+            hue_index=hue_index,
+            value_range=value_range,
+        )
+    )
     boxes = []
     for box in pixel_boxes:
         left_ratio = float(box.left) / image_width
@@ -71,6 +179,8 @@ def find_boxes_with_color(
     hue: float,
     tolerance: float = 0.01,
     masks: Optional[Iterable[Rectangle]] = None,
+    hue_index: Optional[HueIndex] = None,
+    value_range: Optional[Tuple[float, float]] = None,
 ) -> List[Rectangle]:
     """
     Arguments:
@@ -78,59 +188,81 @@ def find_boxes_with_color(
     - 'tolerance': is the amount of difference from 'hue' (from 0-to-1) still considered that hue.
     - 'masks': a set of masks to apply to the image, one at a time. Bounding boxes are extracted
         from within each of those boxes. Masks should be in pixel coordinates.
+    - 'hue_index': an index of the image built with 'HueIndex.for_saturated_pixels'. If not
+        provided, one will be built for this call.
+    - 'value_range': if provided, only pixels with a value (i.e., brightness, from 0-to-255) in
+        this range are considered to have the hue. Set this when entities were colored with
+        colors that have the same hue, but different brightness (see 'Palette').
     """
 
     height, width, _ = image.shape
     if masks is None:
         masks = (Rectangle(left=0, top=0, width=width, height=height),)
 
-    CV2_MAXIMUM_HUE = 180
-    SATURATION_THRESHOLD = 50  # out of 255
-
-    cv2_hue = hue * CV2_MAXIMUM_HUE
-    cv2_tolerance = tolerance * CV2_MAXIMUM_HUE
-    img_hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-
-    saturated_pixels = img_hsv[:, :, 1] > SATURATION_THRESHOLD
-
-    hues = img_hsv[:, :, 0]
-    distance_to_hue = np.abs(hues.astype(np.int16) - cv2_hue)
-    abs_distance_to_hue = np.minimum(distance_to_hue, CV2_MAXIMUM_HUE - distance_to_hue)
+    # To determine which pixels have a color, we look for those that:
+    # 1. Match the hue
+    # 2. Are heavily saturated (i.e. aren't white---white pixels could be detected as having
+    #    any hue, with no saturation.) Only saturated pixels are included in the hue index.
+    if hue_index is None:
+        hue_index = HueIndex.for_saturated_pixels(image)
+    ys, xs = hue_index.find_pixels(hue, tolerance, value_range)
 
     boxes = []
     for mask in masks:
 
-        masked_distances = np.full(abs_distance_to_hue.shape, np.inf)
-
         right = mask.left + mask.width
         bottom = mask.top + mask.height
-        masked_distances[mask.top : bottom, mask.left : right] = abs_distance_to_hue[
-            mask.top : bottom, mask.left : right
-        ]
+        in_mask = (xs >= mask.left) & (xs < right) & (ys >= mask.top) & (ys < bottom)
 
-        # To determine which pixels have a color, we look for those that:
-        # 1. Match the hue
-        # 2. Are heavily saturated (i.e. aren't white---white pixels could be detected as having
-        #    any hue, with no saturation.)
-        matching_pixels = np.where(
-            (masked_distances <= cv2_tolerance) & saturated_pixels
-        )
-
-        matching_pixels_list: List[Point] = []
-        for i in range(len(matching_pixels[0])):
-            matching_pixels_list.append(
-                Point(matching_pixels[1][i], matching_pixels[0][i])
-            )
-        boxes.extend(list(PixelMerger().merge_pixels(matching_pixels_list)))
+        boxes.extend(merge_pixels(xs[in_mask], ys[in_mask]))
 
     return boxes
 
 
+def merge_pixels(
+    xs: np.ndarray, ys: np.ndarray, max_vertical_break: int = 1
+) -> List[Rectangle]:
+    """
+    Merge pixels into bounding boxes, given the x- and y-coordinates of the pixels (in any order).
+    Produces the same rectangles as 'PixelMerger', in the same order (i.e., from top to bottom),
+    though it does the merging with array operations rather than one row at a time.
+    """
+    if len(ys) == 0:
+        return []
+
+    order = np.argsort(ys, kind="stable")
+    sorted_ys = ys[order]
+    sorted_xs = xs[order]
+
+    # A new rectangle starts at each vertical gap between consecutive rows of pixels.
+    gaps = np.nonzero(np.diff(sorted_ys) > max_vertical_break)[0] + 1
+    starts = np.concatenate(([0], gaps))
+    ends = np.concatenate((gaps, [len(sorted_ys)]))
+
+    tops = sorted_ys[starts]
+    bottoms = sorted_ys[ends - 1]
+    min_xs = np.minimum.reduceat(sorted_xs, starts)
+    max_xs = np.maximum.reduceat(sorted_xs, starts)
+
+    return [
+        Rectangle(
+            left=int(min_x),
+            top=int(top),
+            width=int(max_x - min_x + 1),
+            height=int(bottom - top + 1),
+        )
+        for min_x, max_x, top, bottom in zip(min_xs, max_xs, tops, bottoms)
+    ]
+
+
 class PixelMerger:
     """
     Merges pixels into bounding boxes. The algorithm was designed to create one bounding box per
     line of text in a PDF. To do this, the algorithm combines all pixels at the same y-position
     into lines. Then it merges vertically-adjacent lines into boxes.
+
+    This merger handles pixels one at a time. 'merge_pixels' implements the same algorithm with
+    array operations, and is much faster for pages with many colorized pixels.
     """
 
     def __init__(self, max_vertical_break: int = 1) -> None:
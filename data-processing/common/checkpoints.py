@@ -0,0 +1,66 @@
+"""
+Checkpoints of which pipeline commands have finished running for each paper, so that a job that
+was interrupted can be resumed where it stopped (see the '--resume' option of 'run_pipeline').
+A command is only recorded as finished for a paper if it saved results for the paper.
+Commands that process a paper in many steps keep finer-grained checkpoints of their own (e.g.,
+'LocateEntitiesCommand' records which entities have been located in each batch).
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List
+
+from common import directories, file_utils
+from common.types import ArxivId, CompletedCommand, Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # type: ignore # pylint: disable=invalid-name
+
+
+def get_checkpoints_path(arxiv_id: ArxivId) -> Path:
+    return os.path.join(
+        directories.arxiv_subdir("checkpoints", arxiv_id), "commands.csv"
+    )
+
+
+_thread_lock = threading.Lock()
+
+
+@contextmanager
+def _lock_checkpoints(arxiv_id: ArxivId) -> Iterator[None]:
+    """
+    Hold a lock on a paper's checkpoints, so that processes running different entity pipelines
+    at once don't interleave their writes to the checkpoints file.
+    """
+    checkpoints_dir = directories.arxiv_subdir("checkpoints", arxiv_id)
+    os.makedirs(checkpoints_dir, exist_ok=True)
+    with _thread_lock, open(os.path.join(checkpoints_dir, "lock"), "w") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        yield
+
+
+def load_completed_commands(arxiv_id: ArxivId) -> List[str]:
+    " Load the names of the commands that have finished running for a paper. "
+    checkpoints_path = get_checkpoints_path(arxiv_id)
+    if not file_utils.data_file_exists(checkpoints_path):
+        return []
+    with _lock_checkpoints(arxiv_id):
+        return [
+            c.command
+            for c in file_utils.load_from_csv(checkpoints_path, CompletedCommand)
+        ]
+
+
+def record_command_completed(arxiv_id: ArxivId, command_name: str) -> None:
+    checkpoints_path = get_checkpoints_path(arxiv_id)
+    with _lock_checkpoints(arxiv_id):
+        file_utils.append_to_csv(checkpoints_path, CompletedCommand(command_name))
+
+
+def clear_checkpoints(arxiv_id: ArxivId) -> None:
+    " Forget which commands have finished running for a paper. "
+    file_utils.delete_data_file(get_checkpoints_path(arxiv_id))
@@ -96,6 +96,83 @@ def generate_hues() -> Iterator[float]:
     return
 
 
+Value = float
+
+
+@dataclass(frozen=True)
+class Palette:
+    """
+    The set of colors that entities in one batch can be colorized with. Each color is a
+    combination of one of 'num_hues' evenly-spaced hues and one of the levels of brightness (the
+    'V' in HSV) in 'values'. The more colors in a palette, the more entities can be located
+    with each compilation of a paper.
+    """
+
+    num_hues: int = NUM_HUES
+    values: Tuple[Value, ...] = (1.0,)
+
+    hue_tolerance: float = 0.01
+    " Maximum difference from an entity's hue (from 0-to-1) for a pixel to be that entity's. "
+
+    shift_tolerance: float = 0.02
+    " Tolerance for detecting whether an entity's hue has shifted (see 'has_hue_shifted'). "
+
+    def hues(self) -> List[Hue]:
+        # Don't include both 0 and 1 as hues (see 'HUES').
+        return list(np.linspace(0, 1 - (1.0 / self.num_hues), self.num_hues))
+
+    def size(self) -> int:
+        return self.num_hues * len(self.values)
+
+    def value_range(self, value: Value) -> Optional[Tuple[float, float]]:
+        """
+        Get the range of pixel values (from 0-to-255) that will be considered to have been colored
+        with brightness 'value'. Ranges for adjacent levels meet halfway between the levels. Returns
+        'None' if the palette only has one level of brightness, in which case any value will do.
+        """
+        if len(self.values) == 1:
+            return None
+        levels = sorted(self.values)
+        index = levels.index(value)
+        low = (levels[index - 1] + value) / 2 * 255 if index > 0 else 0.0
+        high = (
+            (value + levels[index + 1]) / 2 * 255
+            if index < len(levels) - 1
+            else float("inf")
+        )
+        return (low, high)
+
+
+PALETTES = {
+    "default": Palette(),
+    # Pixels of the hues in this palette are 3 OpenCV hue units (6 degrees) apart, and only match an
+    # entity's hue if they're within 1 unit. Dark colors have half the brightness of bright colors.
+    # This depends on pages being rastered without anti-aliasing (the Ghostscript default), as
+    # anti-aliasing blends the edges of dark characters with white, making them brighter.
+    "wide": Palette(
+        num_hues=60, values=(1.0, 0.5), hue_tolerance=1 / 180, shift_tolerance=1 / 180
+    ),
+}
+"""
+Palettes that can be chosen when locating entities. The 'default' palette has the 30 hues that
+have always been used to colorize entities. The 'wide' palette has 120 colors, which is as many
+as can be told apart reliably: a pixel's hue is only known to within 1 OpenCV hue unit, so hues
+closer than 3 units could both match it, and any brightness level between the two it uses would be
+confused with the blended edges of glyphs.
+"""
+
+
+def generate_colors(palette: Palette) -> Iterator[Tuple[Hue, Value]]:
+    " Generate all colors in a palette, cycling through all hues for each brightness level. "
+    hues = palette.hues()
+    for value in palette.values:
+        for hue in hues:
+            yield hue, value
+    logging.debug(
+        "Out of colors. Hopefully the caller is restarting this generator to keep coloring."
+    )
+
+
 def wrap_span(
     tex: str, start: int, end: int, before: str, after: str, braces: bool = False
 ) -> str:
@@ -111,7 +188,13 @@ def wrap_span(
 
 
 def insert_color_in_tex(
-    tex: str, entity_id: str, hue: float, start: int, end: int, braces: bool = False
+    tex: str,
+    entity_id: str,
+    hue: float,
+    start: int,
+    end: int,
+    braces: bool = False,
+    value: Value = 1.0,
 ) -> str:
     """
     Set 'braces' if you want the TeX (including coloring commands) to be wrapped in curly braces.
@@ -122,24 +205,25 @@ def insert_color_in_tex(
         tex,
         start,
         end,
-        _get_color_start_tex(hue),
+        _get_color_start_tex(hue, value),
         _get_color_end_tex(entity_id),
         braces,
     )
 
 
-def _get_tex_color(hue: float) -> Tuple[float, float, float]:
+def _get_tex_color(hue: float, value: Value = 1.0) -> Tuple[float, float, float]:
     """
     Convert a hue value to RGB for a fully-saturated color with a range of [0:1,0:1,0:1].
+    'value' sets the brightness of the color, where 1 is the brightest.
     """
-    red, green, blue = colorsys.hsv_to_rgb(hue, 1, 255)
+    red, green, blue = colorsys.hsv_to_rgb(hue, 1, 255 * value)
     red_scaled = red / 255.0
     blue_scaled = blue / 255.0
     green_scaled = green / 255.0
     return red_scaled, green_scaled, blue_scaled
 
 
-def _get_color_start_tex(hue: float) -> str:
+def _get_color_start_tex(hue: float, value: Value = 1.0) -> str:
     """
     Coloring macros were chosen carefully to satisfy a few needs:
     1. Be portable to many documents.
@@ -156,7 +240,7 @@ def _get_color_start_tex(hue: float) -> str:
     characters be faded and thus have different R, G, and B values no matter what the color. However,
     those same pixels will still have the same hue, just at a higher value or lower saturation.
     """
-    red, green, blue = _get_tex_color(hue)
+    red, green, blue = _get_tex_color(hue, value)
     return rf"\scholarsetcolor[rgb]{{{red},{green},{blue}}}"
 
 
@@ -189,15 +273,23 @@ class ColorizedTex:
     therefore be colorized in a later pass.
     """
 
+    entity_values: Optional[Dict[EntityId, Value]] = None
+    """
+    Map from entity IDs to the brightness of the colors they've been colored. If not defined,
+    all entities were colored with the brightest color of their hue.
+    """
+
 
 def colorize_entities(
     tex: str,
     entities: Sequence[SerializableEntity],
     options: ColorizeOptions = ColorizeOptions(),
+    palette: Palette = PALETTES["default"],
 ) -> ColorizedTex:
     """
     This function assumes that entities do not overlap. It is up to the caller to appropriately
-    filter entities to those that do not overlap with each other.
+    filter entities to those that do not overlap with each other. Entities are colored with
+    the colors in 'palette'.
     """
 
     insert_color_macros = options.insert_color_macros
@@ -221,20 +313,22 @@ def colorize_entities(
         entities_filtered, key=lambda e: e.start, reverse=True
     )
 
-    hue_generator = generate_hues()
+    color_generator = generate_colors(palette)
     entity_hues = {}
+    entity_values = {}
 
     colorized_tex = tex
     for e in entities_reverse_order:
 
         # Get a hue to color this entity
         if preset_hue is not None:
-            hue = preset_hue
+            hue, value = preset_hue, 1.0
         else:
-            hue = next(hue_generator)
+            hue, value = next(color_generator)
 
         # Save a reference to this colorized entity to return to the caller
         entity_hues[e.id_] = hue
+        entity_values[e.id_] = value
 
         # Determine what range of characters to color
         color_character_range = CharacterRange(e.start, e.end)
@@ -247,6 +341,7 @@ def colorize_entities(
             color_character_range.start,
             color_character_range.end,
             braces=braces,
+            value=value,
         )
 
     # Only insert color macros after all entities have been wrapped in color commands.
@@ -256,4 +351,6 @@ def colorize_entities(
     if insert_color_macros:
         colorized_tex = add_color_macros(colorized_tex)
 
-    return ColorizedTex(colorized_tex, entity_hues, skipped=skipped)
+    return ColorizedTex(
+        colorized_tex, entity_hues, skipped=skipped, entity_values=entity_values
+    )
@@ -1,7 +1,20 @@
 import os
 from abc import ABC, abstractmethod
 from argparse import ArgumentParser
-from typing import Any, Generic, Iterator, List, Optional, Type, TypeVar
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Generic,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+)
 
 from common import directories
 from common.types import ArxivId, Path
@@ -38,6 +51,17 @@ class Command(ABC, Generic[I, R]):
         (Optionally) override this method to add provide command line arguments for this command.
         """
 
+    @staticmethod
+    def is_parallel_safe() -> bool:
+        """
+        (Optionally) override this method to return 'True' if 'process' can be called for several
+        items at once from different threads. Commands whose 'process' spends most of its time
+        waiting on subprocesses or the network can then process items concurrently. 'load' and
+        'save' are always called from one thread, and results are saved in the order that items
+        were loaded, so only 'process' needs to be safe to call concurrently.
+        """
+        return False
+
     @abstractmethod
     def load(self) -> Iterator[I]:
         """
@@ -60,6 +84,52 @@ class Command(ABC, Generic[I, R]):
 CommandList = List[Type[Command[Any, Any]]]  # pylint: disable=unsubscriptable-object
 
 
+def process_items(
+    command: Command[I, R],
+    process_workers: int = 1,
+    item_done: Optional[Callable[[I], None]] = None,
+) -> Iterator[Tuple[I, R]]:
+    """
+    Load and process all items for a command, yielding each item with each of its results. If the
+    command is parallel-safe and 'process_workers' is greater than 1, items are processed by a
+    pool of threads. Results are yielded in the order items were loaded either way, so the caller
+    can save them from one thread. When processing concurrently, an item's results are only
+    yielded once all of them have been produced, and items are loaded no more than a few items
+    ahead of the results that have been yielded. If 'item_done' is provided, it is called with
+    each item once all of the item's results have been yielded, even if there were no results.
+    """
+
+    if process_workers <= 1 or not command.is_parallel_safe():
+        for item in command.load():
+            for result in command.process(item):
+                yield item, result
+            if item_done is not None:
+                item_done(item)
+        return
+
+    def process_all(item: I) -> List[R]:
+        return list(command.process(item))
+
+    with ThreadPoolExecutor(max_workers=process_workers) as executor:
+        pending: Deque[Tuple[I, Future]] = deque()  # type: ignore
+        for item in command.load():
+            pending.append((item, executor.submit(process_all, item)))
+            while pending and (
+                len(pending) > process_workers * 2 or pending[0][1].done()
+            ):
+                done_item, future = pending.popleft()
+                for result in future.result():
+                    yield done_item, result
+                if item_done is not None:
+                    item_done(done_item)
+        while pending:
+            done_item, future = pending.popleft()
+            for result in future.result():
+                yield done_item, result
+            if item_done is not None:
+                item_done(done_item)
+
+
 class ArxivBatchCommand(Command[I, R], ABC):
     """
     A command for a batch job that will process a number of papers each indexed by arXiv ID.
@@ -43,6 +43,10 @@ class CompileTexCommand(ArxivBatchCommand[CompilationTask, CompilationResult], A
     def get_arxiv_ids_dirkey(self) -> str:
         return self.get_sources_dirkey()
 
+    @staticmethod
+    def is_parallel_safe() -> bool:
+        return True
+
     def load(self) -> Iterator[CompilationTask]:
         for arxiv_id in self.arxiv_ids:
             output_dir = directories.arxiv_subdir(self.get_output_dirkey(), arxiv_id)
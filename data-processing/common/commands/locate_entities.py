@@ -1,26 +1,76 @@
-import glob
+import hashlib
 import logging
 import os.path
 import shutil
 from abc import ABC, abstractmethod
 from argparse import ArgumentParser
 from collections import deque
-from dataclasses import dataclass
-from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Type
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+)
 
 from common import directories, file_utils
-from common.colorize_tex import ColorizedTex, colorize_entities
+from common.colorize_tex import PALETTES, ColorizedTex, Palette, colorize_entities
 from common.commands.base import ArxivBatchCommand
 from common.commands.compile_tex import save_compilation_result
-from common.commands.raster_pages import raster_pages
-from common.compile import (compile_tex, get_compiled_tex_files,
-                            get_last_autotex_compiler,
-                            get_last_colorized_entity_id)
+from common.commands.raster_pages import (
+    get_raster_settings,
+    get_streaming_raster_command,
+    raster_pages,
+    raster_pages_to_images,
+)
+from common.compile import (
+    compile_tex,
+    did_compilation_fail,
+    get_compiled_tex_files,
+    get_last_autotex_compiler,
+    get_output_files,
+    get_page_count,
+    get_last_colorized_entity_id,
+)
+from common.compile_cache import (
+    CompileCache,
+    compute_cache_key,
+    fingerprint_directory,
+    get_compiler_settings,
+    snapshot_directory,
+)
 from common.diff_images import diff_images_in_raster_dirs
-from common.locate_entities import locate_entities
-from common.types import (ArxivId, ColorizationRecord, ColorizeOptions,
-                          FileContents, HueLocationInfo, RelativePath,
-                          SerializableEntity)
+from common.locate_entities import (
+    LocatedPages,
+    LocationResult,
+    locate_entities,
+    locate_entities_in_images,
+    predict_pages,
+)
+from common.page_images import PageImages, load_page_images, save_page_images
+from common.timing import StageTimer
+from common.types import (
+    ArxivId,
+    ColorizationFault,
+    ColorizationRecord,
+    ColorizeOptions,
+    CompilationResult,
+    FileContents,
+    HueLocationInfo,
+    LocationCheckpoint,
+    OutputFile,
+    RelativePath,
+    SerializableEntity,
+    StageTiming,
+)
+from common.workspace import WORKSPACE_STRATEGIES, create_workspace
 
 
 @dataclass(frozen=True)
@@ -32,6 +82,65 @@ class LocationTask:
     group: int
 
 
+@dataclass(frozen=True)
+class BatchDirectories:
+    " Scratch directories used to colorize, compile, raster, and difference one batch. "
+
+    colorized_tex: RelativePath
+    compiled_tex: RelativePath
+    rasters: RelativePath
+    diffs: RelativePath
+
+    def all(self) -> List[RelativePath]:
+        return [self.colorized_tex, self.compiled_tex, self.rasters, self.diffs]
+
+
+@dataclass
+class BatchOutcome:
+    """
+    The result of colorizing, compiling, rastering, differencing, and searching for one batch
+    of entities. Outcomes are created by batch workers, and then inspected one at a time to decide
+    which entity locations to save, and which entities need to be processed in another batch.
+    """
+
+    index: int
+    iteration_id: str
+    batch: List[str]
+    " IDs of the entities colorized in this batch. "
+
+    dirs: BatchDirectories
+
+    colorized: bool = True
+    " Whether any entities were colorized. If not, there is nothing else to do for this batch. "
+
+    skipped: List[str] = field(default_factory=list)
+    " IDs of entities that could not be colorized in this batch, in the order they were batched. "
+
+    entity_hues: Dict[str, float] = field(default_factory=dict)
+    entity_values: Optional[Dict[str, float]] = None
+    compilation_result: Optional[CompilationResult] = None
+    cache_key: Optional[str] = None
+    " Key of this batch's compilation in the compile cache, if the cache is used. "
+
+    location_result: Optional[LocationResult] = None
+
+    timer: StageTimer = field(default_factory=StageTimer)
+    " Time spent in each stage of processing the batch. "
+
+
+RASTER_MODES = ["memory", "disk"]
+
+FAILURE_ISOLATION_STRATEGIES = ["bisect", "alone"]
+"""
+Strategies for finding the entities responsible for a batch failing to compile, or for shifting
+the layout of a page when no single entity in the batch could be blamed for the shift:
+* 'bisect': split the batch in two (at the last entity colorized before the compiler failed, if
+  known) and process both halves as batches. Entities that still fail on their own are skipped.
+* 'alone': process the entities suspected of causing the failure on their own, one at a time.
+  If no entity is suspected, the first entity in the batch is skipped.
+"""
+
+
 ColorizeFunc = Callable[[str, List[SerializableEntity], ColorizeOptions], ColorizedTex]
 
 
@@ -63,6 +172,14 @@ class LocateEntitiesCommand(ArxivBatchCommand[LocationTask, HueLocationInfo], AB
             "diffed-images": f"diffed-images-with-colorized-{entity_name}",
             "entity-locations": f"{entity_name}-locations",
         }
+        self._original_images: Dict[ArxivId, Dict[RelativePath, PageImages]] = {}
+        self._unstreamable_file_types: Set[str] = set()
+        self._sources_fingerprints: Dict[ArxivId, str] = {}
+        self._compile_cache: Optional[CompileCache] = None
+        self._compiler_settings = ""
+        self._located_pages: LocatedPages = []
+        self._known_faults: Dict[ArxivId, Dict[Tuple[str, str], ColorizationFault]] = {}
+        self._checkpoints: Dict[ArxivId, Dict[Tuple[str, str], LocationCheckpoint]] = {}
 
     @staticmethod
     def init_parser(parser: ArgumentParser) -> None:
@@ -70,10 +187,39 @@ class LocateEntitiesCommand(ArxivBatchCommand[LocationTask, HueLocationInfo], AB
         parser.add_argument(
             "--batch-size",
             type=int,
-            default=30,
+            default=None,
             help=(
                 "Number of entities to detect at a time. This number is limited by the number "
-                + "of distinct hues that OpenCV can detect."
+                + "of distinct hues that OpenCV can detect. Defaults to the number of colors "
+                + "in the palette (see '--palette')."
+            ),
+        )
+        parser.add_argument(
+            "--palette",
+            choices=list(PALETTES.keys()),
+            default="default",
+            help=(
+                "Palette of colors to colorize entities with. Each batch of entities can have "
+                + "as many entities as there are colors in the palette, so larger palettes "
+                + "require fewer compilations of each paper. 'default' has 30 colors. 'wide' "
+                + "has 120 colors (60 hues, each at two levels of brightness), so papers with "
+                + "several hundred entities still take several compilations. 'wide' requires "
+                + "pages to be rastered without anti-aliasing (i.e., without Ghostscript's "
+                + "'-dTextAlphaBits' and '-dGraphicsAlphaBits' options), as anti-aliased edges "
+                + "of dark glyphs can be mistaken for bright colors. Entities colorized with a "
+                + "custom colorization function (e.g., citations) always use the default palette."
+            ),
+        )
+        parser.add_argument(
+            "--batch-workers",
+            type=int,
+            default=1,
+            help=(
+                "Maximum number of batches of entities to process at the same time. Each batch is "
+                + "colorized, compiled, rastered, and differenced in its own directories, so "
+                + "batches can be processed in parallel. Set this to the number of available "
+                + "cores to make use of all of them when processing a paper. Results do not "
+                + "depend on the order in which batches finish."
             ),
         )
         parser.add_argument(
@@ -88,6 +234,100 @@ class LocateEntitiesCommand(ArxivBatchCommand[LocationTask, HueLocationInfo], AB
                 + "process all diffs of all papers regardless of evidence of layout shift."
             ),
         )
+        parser.add_argument(
+            "--workspace-strategy",
+            choices=WORKSPACE_STRATEGIES,
+            default="link",
+            help=(
+                "How to create the directory of sources compiled for each batch. 'copy' copies "
+                + "all of the normalized sources twice for each batch: once to save the colorized "
+                + "sources, and once to compile them. 'link' only writes the colorized TeX file, "
+                + "and shares the contents of all other files with the normalized sources "
+                + "(using reflinks where the file system supports them, and hard links for "
+                + "figures otherwise). With 'link', the directory of colorized sources for each "
+                + "batch only contains the colorized TeX file."
+            ),
+        )
+        parser.add_argument(
+            "--raster-mode",
+            choices=RASTER_MODES,
+            default="memory",
+            help=(
+                "How to pass rasters of the colorized pages to the image differencing and hue "
+                + "search. 'memory' streams page rasters from the rasterer straight into memory, "
+                + "and compares them to rasters of the original paper that are loaded once for "
+                + "each paper. Images are only written to disk if intermediate files are kept. "
+                + "'disk' saves rasters and diffs of every page as PNGs, and reads them back "
+                + "to search for hues. 'memory' falls back to 'disk' for types of output files "
+                + "that have no streaming rasterer (see the 'streaming-rasterers' section of "
+                + "'config.ini')."
+            ),
+        )
+        parser.add_argument(
+            "--predict-pages",
+            action="store_true",
+            help=(
+                "Whether to only raster and difference the pages that a batch of entities is "
+                + "predicted to appear on, based on the pages where entities that appear "
+                + "before and after them in the TeX were found in earlier batches. If the "
+                + "entities are not all found well within the predicted pages, or if the "
+                + "colorized paper has a different number of pages than the original, all "
+                + "pages are rastered. Only applies when the raster mode is 'memory' and the "
+                + "rasterer is Ghostscript."
+            ),
+        )
+        parser.add_argument(
+            "--failure-isolation",
+            choices=FAILURE_ISOLATION_STRATEGIES,
+            default="alone",
+            help=(
+                "How to find the entities responsible when a batch fails to compile, or when "
+                + "the layout of a batch shifted and no single entity could be blamed. "
+                + "'bisect' splits the batch in halves that are processed as batches, which "
+                + "takes a number of compilations that grows with the logarithm of the batch "
+                + "size. 'alone' processes suspected entities one at a time. Defaults to 'alone'."
+            ),
+        )
+        parser.add_argument(
+            "--max-recovery-batches",
+            type=int,
+            default=None,
+            help=(
+                "Maximum number of batches to compile for each group of entities to recover "
+                + "from colorization faults (i.e., batches of entities that were already in a "
+                + "batch that failed to compile or shifted the layout of the page). Once the "
+                + "limit is reached, entities that need to be retried are skipped. This bounds "
+                + "the time spent on papers where many entities cause faults. Defaults to no limit."
+            ),
+        )
+        parser.add_argument(
+            "--remember-faults",
+            action="store_true",
+            help=(
+                "Whether to remember entities that cause faults. If set, entities that fail to "
+                + "compile with a TeX error even when colorized on their own, and entities that "
+                + "shift the layout of other entities, are recorded in the 'colorization-faults' "
+                + "data directory. When a paper is processed again with the same compiler "
+                + "settings, unchanged entities that failed to compile are skipped, and those that "
+                + "shifted the layout are processed on their own from the start. Compilations that "
+                + "fail without a TeX error (e.g., because they were interrupted or timed out) are "
+                + "never recorded as faults."
+            ),
+        )
+        parser.add_argument(
+            "--compile-cache",
+            action="store_true",
+            help=(
+                "Whether to cache compiled colorized sources. If set, the outputs of compiling "
+                + "and rastering each batch that compiles successfully are saved in the "
+                + "'compile-cache' data directory, keyed by a hash of the colorized sources and "
+                + "the compiler settings. When a paper is processed again, batches with the "
+                + "exact same colorized sources reuse the cached outputs instead of being "
+                + "compiled and rastered again. Only useful when a paper's data is kept between "
+                + "runs (i.e., not with '--one-paper-at-a-time'), as the cache is deleted with "
+                + "the paper's data. Counts of cache hits and misses are logged for each paper."
+            ),
+        )
         parser.add_argument(
             "--keep-intermediate-files",
             action="store_true",
@@ -97,6 +337,27 @@ class LocateEntitiesCommand(ArxivBatchCommand[LocationTask, HueLocationInfo], AB
                 + "these files. See the argument documentation in 'run_pipeline' for more context."
             ),
         )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help=(
+                "Resume locating entities for papers that were interrupted. Entities are "
+                + "checkpointed as each batch finishes. When resuming, locations that were saved "
+                + "for checkpointed entities are kept, and the entities are not located again. "
+                + "Entities that have changed since they were checkpointed are located again."
+            ),
+        )
+        parser.add_argument(
+            "--retain-batch-files",
+            nargs="*",
+            metavar="PATTERN",
+            help=(
+                "Glob patterns of intermediate files to keep when deleting the intermediate "
+                + "files for a batch (e.g., '*.csv' to keep the hues assigned to entities and "
+                + "the compilation results). Patterns are matched against paths relative to the "
+                + "batch's directories. By default, no files are kept."
+            ),
+        )
 
     @staticmethod
     @abstractmethod
@@ -151,7 +412,13 @@ class LocateEntitiesCommand(ArxivBatchCommand[LocationTask, HueLocationInfo], AB
     def load(self) -> Iterator[LocationTask]:
 
         for arxiv_id in self.arxiv_ids:
-            for output_base_dir in self.output_base_dirs.values():
+            # When resuming, locations that were saved before the interruption are kept.
+            resume = self.args.resume and file_utils.data_file_exists(
+                self._get_checkpoints_path(arxiv_id)
+            )
+            for key, output_base_dir in self.output_base_dirs.items():
+                if resume and key == "entity-locations":
+                    continue
                 file_utils.clean_directory(
                     directories.arxiv_subdir(output_base_dir, arxiv_id)
                 )
@@ -163,12 +430,16 @@ class LocateEntitiesCommand(ArxivBatchCommand[LocationTask, HueLocationInfo], AB
             # so that the type of entities can be inferred from the entity ID in later commands.
             entities_dir = directories.arxiv_subdir(self.get_input_dirkey(), arxiv_id)
             entities: List[SerializableEntity] = []
-            for entities_path in glob.glob(os.path.join(entities_dir, "entities*.csv")):
+            for entities_path in file_utils.glob_data_files(
+                entities_dir, "entities*.csv"
+            ):
                 entities.extend(
                     file_utils.load_from_csv(
                         entities_path, self.get_detected_entity_type()
                     )
                 )
+            if resume:
+                self._prepare_to_resume(arxiv_id, entities)
 
             main_tex_files = get_compiled_tex_files(
                 directories.arxiv_subdir("compiled-normalized-sources", arxiv_id)
@@ -219,95 +490,232 @@ class LocateEntitiesCommand(ArxivBatchCommand[LocationTask, HueLocationInfo], AB
         # trying to detect which entity in a batch may have shifted to cause many others to move.)
         entities_ordered = sorted(entities_filtered, key=lambda e: e.start)
 
-        # Construct a queue of entities to detect.
+        # Rasters of the original paper are compared to the rasters of every batch. When
+        # rasters are kept in memory, load them once up front instead of once per batch.
+        if self.args.raster_mode == "memory":
+            self._load_original_images(item.arxiv_id)
+
+        # If enabled, outputs of compiling each batch are cached. The normalized sources and
+        # compiler settings are hashed once up front, as they are the same for every batch.
+        self._compile_cache = None
+        if self.args.compile_cache or self.args.remember_faults:
+            self._compiler_settings = get_compiler_settings()
+        if self.args.compile_cache:
+            self._compile_cache = CompileCache(
+                directories.arxiv_subdir("compile-cache", item.arxiv_id)
+            )
+            if item.arxiv_id not in self._sources_fingerprints:
+                self._sources_fingerprints = {
+                    item.arxiv_id: fingerprint_directory(
+                        directories.arxiv_subdir("normalized-sources", item.arxiv_id)
+                    )
+                }
+
+        # Construct a queue of entities to detect. Entities that caused faults the last time
+        # this paper was processed are skipped or processed on their own from the start.
         entities_by_id = {e.id_: e for e in entities_ordered}
         to_process = deque([e.id_ for e in entities_ordered])
         to_process_alone: Deque[str] = deque()
-
-        # Path to output directories. These directories will be redefined once for each batch.
-        colorized_tex_dir: Optional[str] = None
-        compiled_tex_dir: Optional[str] = None
-        raster_output_dir: Optional[str] = None
-        diffs_output_dir: Optional[str] = None
+        to_bisect: Deque[List[str]] = deque()
+        if self.args.remember_faults:
+            to_process, to_process_alone = self._apply_known_faults(item, to_process)
 
         # Iteration state
         batch_index = -1
-        iteration_id = None
+        if self.args.resume:
+            to_process, to_process_alone, batch_index = self._skip_checkpointed(
+                item, to_process, to_process_alone
+            )
+        batch_size = self.args.batch_size or self._get_palette().size()
+
+        # Entities that have been in a batch that failed to compile or shifted the layout. Batches
+        # with any of these entities are spent on recovering from colorization faults.
+        retried: Set[str] = set(to_process_alone)
+
+        # Pages where entities have been found, for predicting which pages later batches are on.
+        located: Dict[str, Tuple[int, int]] = {}
+        self._located_pages = []
+        num_batches = 0
+        num_recovery_batches = 0
+
+        def has_next_batch() -> bool:
+            return (
+                len(to_bisect) > 0 or len(to_process) > 0 or len(to_process_alone) > 0
+            )
 
         def next_batch() -> List[str]:
             """
-            Get the next batch of entities to process. First tries to sample a batch from
-            'to_process', and then attempts to sample individual entities from 'to_process_alone'.
+            Get the next batch of entities to process. First tries to take a part of a bisected
+            batch from 'to_bisect', then tries to sample a batch from 'to_process', and then
+            attempts to sample individual entities from 'to_process_alone'.
             """
+            if len(to_bisect) > 0:
+                return to_bisect.popleft()
             if len(to_process) > 0:
                 return [
                     to_process.popleft()
-                    for _ in range(min(self.args.batch_size, len(to_process)))
+                    for _ in range(min(batch_size, len(to_process)))
                 ]
             return [to_process_alone.popleft()]
 
-        def _cleanup_from_last_batch() -> None:
-            " Clean up output directories from the last batch. "
-            if batch_index > -1 and not self.args.keep_intermediate_files:
-                logging.debug(  # pylint: disable=logging-not-lazy
-                    "Deleting intermediate files used to locate entities (i.e., colorized "
-                    + "sources, compilation results, and rasters) for paper %s iteration %s",
-                    item.arxiv_id,
-                    iteration_id or "''",
-                )
-                intermediate_files_dirs = [
-                    colorized_tex_dir,
-                    compiled_tex_dir,
-                    raster_output_dir,
-                    diffs_output_dir,
-                ]
-                for dir_ in intermediate_files_dirs:
-                    if dir_ and os.path.exists(dir_):
-                        file_utils.clean_directory(dir_)
-                        os.rmdir(dir_)
+        # Batches are run in waves of up to 'batch_workers' batches. Each batch in a wave is
+        # colorized, compiled, rastered, and searched for entities in its own scratch directories,
+        # in parallel with the other batches in the wave. Once all batches in the wave finish,
+        # their outcomes are inspected in batch order, which decides which entities need to be
+        # processed again in a later wave. Because waves are formed and resolved in a fixed order,
+        # the batches (and the locations saved for them) do not depend on which batch happens to
+        # finish first. With one worker, this is equivalent to processing batches one at a time.
+        max_workers = max(1, self.args.batch_workers)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while has_next_batch():
+
+                wave: List[Tuple[int, List[str]]] = []
+                while len(wave) < max_workers and has_next_batch():
+                    batch = next_batch()
+                    if any(id_ in retried for id_ in batch):
+                        if (
+                            self.args.max_recovery_batches is not None
+                            and num_recovery_batches >= self.args.max_recovery_batches
+                        ):
+                            logging.warning(  # pylint: disable=logging-not-lazy
+                                "Reached the limit of %d batches for recovering from "
+                                + "colorization faults for paper %s. The locations of "
+                                + "entities %s will not be detected.",
+                                self.args.max_recovery_batches,
+                                item.arxiv_id,
+                                batch,
+                            )
+                            continue
+                        num_recovery_batches += 1
+                    batch_index += 1
+                    wave.append((batch_index, batch))
+                num_batches += len(wave)
+
+                # Batches read a snapshot of the located pages, which is replaced (rather than
+                # updated) between waves, as batches run in other threads.
+                if self.args.predict_pages:
+                    self._located_pages = sorted(
+                        (entities_by_id[id_].start, first_page, last_page)
+                        for id_, (first_page, last_page) in located.items()
+                    )
 
-        while len(to_process) > 0 or len(to_process_alone) > 0:
-            if batch_index > -1:
-                _cleanup_from_last_batch()
+                futures = [
+                    executor.submit(
+                        self._run_batch,
+                        item,
+                        index,
+                        [entities_by_id[id_] for id_ in batch],
+                    )
+                    for index, batch in wave
+                ]
 
-            batch_index += 1
-            logging.debug(
-                "Locating bounding boxes for batch %d-%d of entities of type %s for paper %s.",
+                requeue: List[str] = []
+                for future in futures:
+                    outcome = future.result()
+                    try:
+                        requeue_for_batch, save_ids = self._resolve_outcome(
+                            item, outcome, to_process_alone, to_bisect
+                        )
+                        requeue.extend(requeue_for_batch)
+                        if self._is_faulty(outcome):
+                            retried.update(outcome.batch)
+                        self._save_timings(item, outcome)
+                        for result in self._make_location_records(
+                            item, outcome, save_ids
+                        ):
+                            first_page, last_page = located.get(
+                                result.entity_id, (result.page, result.page)
+                            )
+                            located[result.entity_id] = (
+                                min(first_page, result.page),
+                                max(last_page, result.page),
+                            )
+                            yield result
+                        self._record_checkpoints(
+                            item,
+                            outcome,
+                            set(requeue_for_batch)
+                            | set(to_process_alone)
+                            | {id_ for batch in to_bisect for id_ in batch},
+                        )
+                    finally:
+                        self._cleanup_batch(item, outcome)
+
+                # Entities that need to be retried are placed at the front of the queue, in the
+                # order of the batches they were taken from.
+                to_process.extendleft(reversed(requeue))
+
+        logging.info(  # pylint: disable=logging-not-lazy
+            "Compiled %d batch(es) of entities for entity group %d of file %s of paper %s, "
+            + "%d of which were spent recovering from colorization faults.",
+            num_batches,
+            item.group,
+            item.tex_path,
+            item.arxiv_id,
+            num_recovery_batches,
+        )
+        if self._compile_cache is not None:
+            logging.info(  # pylint: disable=logging-not-lazy
+                "Compile cache for entity group %d of file %s of paper %s: %d hit(s) and %d "
+                + "miss(es) for compilations, %d hit(s) and %d miss(es) for rasters.",
                 item.group,
-                batch_index,
-                self.get_entity_name(),
+                item.tex_path,
                 item.arxiv_id,
+                self._compile_cache.compile_stats.hits,
+                self._compile_cache.compile_stats.misses,
+                self._compile_cache.raster_stats.hits,
+                self._compile_cache.raster_stats.misses,
             )
-            iteration_id = directories.tex_iteration(
-                item.tex_path, f"{item.group}-{batch_index}"
-            )
 
-            # Define output directory locations for this batch.
-            colorized_tex_dir = directories.iteration(
+    def _run_batch(
+        self, item: LocationTask, batch_index: int, entities: List[SerializableEntity]
+    ) -> "BatchOutcome":
+        """
+        Run the full chain of processing for one batch of entities: colorize the TeX, compile it,
+        raster the pages, difference the pages against the original rasters, and search the
+        differences for the colorized entities. This method is safe to call from worker
+        threads, as every batch gets its own scratch directories. Decisions about what to do
+        about errors in the batch are deferred to '_resolve_outcome'.
+        """
+
+        logging.debug(
+            "Locating bounding boxes for batch %d-%d of entities of type %s for paper %s.",
+            item.group,
+            batch_index,
+            self.get_entity_name(),
+            item.arxiv_id,
+        )
+        iteration_id = directories.tex_iteration(
+            item.tex_path, f"{item.group}-{batch_index}"
+        )
+
+        # Define output directory locations for this batch.
+        dirs = BatchDirectories(
+            colorized_tex=directories.iteration(
                 self.output_base_dirs["sources"], item.arxiv_id, iteration_id
-            )
-            compiled_tex_dir = directories.iteration(
+            ),
+            compiled_tex=directories.iteration(
                 self.output_base_dirs["compiled-sources"], item.arxiv_id, iteration_id,
-            )
-            raster_output_dir = directories.iteration(
+            ),
+            rasters=directories.iteration(
                 self.output_base_dirs["paper-images"], item.arxiv_id, iteration_id
-            )
-            diffs_output_dir = directories.iteration(
+            ),
+            diffs=directories.iteration(
                 self.output_base_dirs["diffed-images"], item.arxiv_id, iteration_id
-            )
-
-            # Fetch the next batch of entities to process.
-            batch = next_batch()
-            entities: List[SerializableEntity] = [entities_by_id[id_] for id_ in batch]
+            ),
+        )
+        batch = [e.id_ for e in entities]
+        outcome = BatchOutcome(batch_index, iteration_id, batch, dirs)
 
-            # Colorize the TeX for all the entities.
-            custom_colorize_func = self.get_colorize_func()
-            logging.debug(
-                "Attempting to colorize entities in TeX for entity batch %d-%d of paper %s.",
-                item.group,
-                batch_index,
-                item.arxiv_id,
-            )
+        # Colorize the TeX for all the entities.
+        custom_colorize_func = self.get_colorize_func()
+        logging.debug(
+            "Attempting to colorize entities in TeX for entity batch %d-%d of paper %s.",
+            item.group,
+            batch_index,
+            item.arxiv_id,
+        )
+        with outcome.timer.time("colorize"):
             if custom_colorize_func is not None:
                 colorized_tex = custom_colorize_func(
                     item.file_contents.contents, entities, self.get_colorize_options()
@@ -323,291 +731,973 @@ class LocateEntitiesCommand(ArxivBatchCommand[LocationTask, HueLocationInfo], AB
                         item.arxiv_id,
                         item.file_contents.path,
                     )
-                    continue
+                    outcome.colorized = False
+                    return outcome
             else:
                 colorized_tex = colorize_entities(
-                    item.file_contents.contents, entities, self.get_colorize_options()
+                    item.file_contents.contents,
+                    entities,
+                    self.get_colorize_options(),
+                    palette=self._get_palette(),
                 )
+        outcome.entity_hues = colorized_tex.entity_hues
+        outcome.entity_values = colorized_tex.entity_values
+
+        # If some entities were skipped during colorization, perhaps because they
+        # overlapped with each other, remove them from the batch. They will be added
+        # back to the work queue when this outcome is resolved.
+        if colorized_tex.skipped is not None and len(colorized_tex.skipped) > 0:
+            logging.info(  # pylint: disable=logging-not-lazy
+                "Entities %s were skipped during colorization batch %d-%d for paper "
+                + "%s. They will be processed in a later batch.",
+                [e.id_ for e in colorized_tex.skipped],
+                item.group,
+                batch_index,
+                item.arxiv_id,
+            )
+            skipped_ids = {e.id_ for e in colorized_tex.skipped}
+            outcome.skipped = [id_ for id_ in batch if id_ in skipped_ids]
+            outcome.batch = [id_ for id_ in batch if id_ not in skipped_ids]
 
-            # If some entities were skipped during colorization, perhaps because they
-            # overlapped with each other, add them back to the work queue.
-            if colorized_tex.skipped is not None and len(colorized_tex.skipped) > 0:
-                logging.info(  # pylint: disable=logging-not-lazy
-                    "Entities %s were skipped during colorization batch %d-%d for paper "
-                    + "%s. They will be processed in a later batch.",
-                    [e.id_ for e in colorized_tex.skipped],
-                    item.group,
-                    batch_index,
-                    item.arxiv_id,
-                )
-                # Queue skipped entities in the order that they initially appeared in the batch.
-                reprocess_ids = {e.id_ for e in colorized_tex.skipped}
-                reprocess_sorted = [id_ for id_ in batch if id_ in reprocess_ids]
-                to_process.extendleft(reversed(reprocess_sorted))
-
-                # Remove skipped entities from the current batch.
-                for skip in colorized_tex.skipped:
-                    del batch[batch.index(skip.id_)]
-
-            # Save the colorized TeX to the file system.
+        # Save the colorized TeX to the file system.
+        with outcome.timer.time("workspace"):
             save_success = save_colorized_tex(
                 item.arxiv_id,
-                colorized_tex_dir,
+                dirs.colorized_tex,
                 item.tex_path,
                 iteration_id,
                 colorized_tex.tex,
                 item.file_contents.encoding,
                 colorized_tex.entity_hues,
+                copy_sources=self.args.workspace_strategy == "copy",
             )
-            logging.debug(
-                "Finished attempting to colorize entities for entity batch %d-%d of paper %s.",
-                item.group,
-                batch_index,
+        logging.debug(
+            "Finished attempting to colorize entities for entity batch %d-%d of paper %s.",
+            item.group,
+            batch_index,
+            item.arxiv_id,
+        )
+        if not save_success:
+            logging.error(  # pylint: disable=logging-not-lazy
+                "Failed to save colorized TeX files for arXiv paper %s. "
+                "This paper will be skipped.",
                 item.arxiv_id,
             )
-            if not save_success:
+
+        # Compile the TeX with the colors. Unless the sources are to be copied in full, the
+        # compilation directory is a workspace that shares unmodified files with the normalized
+        # sources, and only contains a new copy of the colorized TeX file.
+        modified_files = {
+            item.tex_path: colorized_tex.tex.encode(item.file_contents.encoding)
+        }
+        with outcome.timer.time("workspace"):
+            if self.args.workspace_strategy == "copy":
+                shutil.copytree(dirs.colorized_tex, dirs.compiled_tex)
+            else:
+                create_workspace(
+                    directories.arxiv_subdir("normalized-sources", item.arxiv_id),
+                    dirs.compiled_tex,
+                    modified_files,
+                    strategy=self.args.workspace_strategy,
+                )
+
+        # If these exact colorized sources have been compiled before, reuse the outputs.
+        with outcome.timer.time("compile"):
+            compilation_result = None
+            if self._compile_cache is not None:
+                outcome.cache_key = self._get_cache_key(item.arxiv_id, modified_files)
+                compilation_result = self._compile_cache.load_compilation(
+                    outcome.cache_key, dirs.compiled_tex
+                )
+            if compilation_result is None:
+                snapshot = snapshot_directory(dirs.compiled_tex)
+                compilation_result = compile_tex(dirs.compiled_tex)
+                if self._compile_cache is not None and outcome.cache_key is not None:
+                    self._compile_cache.save_compilation(
+                        outcome.cache_key,
+                        dirs.compiled_tex,
+                        compilation_result,
+                        snapshot,
+                    )
+        outcome.compilation_result = compilation_result
+        if not compilation_result.success:
+            return outcome
+
+        # Raster the pages to images, and compute diffs from the original images.
+        output_files = compilation_result.output_files
+        if self.args.raster_mode == "memory" and self._can_raster_to_memory(
+            output_files
+        ):
+            outcome.location_result = self._locate_in_memory(
+                item, outcome, output_files
+            )
+            return outcome
+
+        for output_file in output_files:
+            rasters_dir = os.path.join(
+                dirs.rasters, directories.escape_slashes(output_file.path)
+            )
+            with outcome.timer.time("raster"):
+                raster_success = self._raster_to_dir(outcome, output_file, rasters_dir)
+            if raster_success:
+                outcome.timer.add("raster", 0.0, pages=len(os.listdir(rasters_dir)))
+            if not raster_success:
                 logging.error(  # pylint: disable=logging-not-lazy
-                    "Failed to save colorized TeX files for arXiv paper %s. "
-                    "This paper will be skipped.",
+                    "Failed to rasterize pages for %s iteration %s. The locations for entities "
+                    + "with IDs %s with not be detected.",
                     item.arxiv_id,
+                    iteration_id,
+                    outcome.batch,
                 )
+                return outcome
 
-            # Compile the TeX with the colors.
-            shutil.copytree(colorized_tex_dir, compiled_tex_dir)
-            compilation_result = compile_tex(compiled_tex_dir)
-            save_compilation_result(
-                "compiled-sources", item.arxiv_id, compiled_tex_dir, compilation_result
+        logging.debug(
+            "Attempting to diff rastered pages for paper %s iteration %s.",
+            item.arxiv_id,
+            iteration_id,
+        )
+        with outcome.timer.time("diff"):
+            diff_success = diff_images_in_raster_dirs(
+                output_files, dirs.rasters, dirs.diffs, item.arxiv_id,
             )
-            if not compilation_result.success:
+        logging.debug(
+            "Finished diffing attempt for paper %s iteration %s. Success? %s.",
+            item.arxiv_id,
+            iteration_id,
+            diff_success,
+        )
+        if not diff_success:
+            logging.error(  # pylint: disable=logging-not-lazy
+                "Failed to difference images of original and colorized versions of "
+                + "papers %s in batch processing iteration %s. The locations for entities with IDs "
+                + "%s will not be detected.",
+                item.arxiv_id,
+                iteration_id,
+                outcome.batch,
+            )
+            return outcome
 
-                # If colorizing a specific entity caused the failure, remove the entity that caused
-                # the problem from the batch and restart with a new batch, minus this entity.
-                last_colorized_entity_id = get_last_colorized_entity(
-                    item.arxiv_id, compiled_tex_dir
-                )
-                if last_colorized_entity_id is not None:
-                    problem_ids = [last_colorized_entity_id]
-                    if batch.index(last_colorized_entity_id) < len(batch) - 1:
-                        problem_ids += [
-                            batch[batch.index(last_colorized_entity_id) + 1]
-                        ]
-
-                    if len(batch) == 1:
-                        logging.warning(  # pylint: disable=logging-not-lazy
-                            "Failed to compile paper %s with colorized entity %s, even when it was "
-                            + "colorized in isolation. The location of this entity will not be detected.",
-                            item.arxiv_id,
-                            batch[0],
-                        )
-                        continue
+        # Locate the entities in the diffed images.
+        logging.debug(
+            "Attempting to locate entities using image differences for paper %s iteration %s.",
+            item.arxiv_id,
+            iteration_id,
+        )
+        outcome.location_result = locate_entities(
+            item.arxiv_id,
+            dirs.rasters,
+            dirs.diffs,
+            colorized_tex.entity_hues,
+            entity_values=colorized_tex.entity_values,
+            palette=self._get_palette(),
+            timer=outcome.timer,
+        )
+        logging.debug(
+            "Finished attempt at locating entities with image diffs for paper %s iteration %s.",
+            item.arxiv_id,
+            iteration_id,
+        )
+        return outcome
+
+    def _raster_to_dir(
+        self, outcome: "BatchOutcome", output_file: OutputFile, rasters_dir: str
+    ) -> bool:
+        " Raster the pages of an output file to a directory, or copy them from the cache. "
+        cached_rasters_dir = self._get_cached_rasters_dir(outcome, output_file.path)
+        if cached_rasters_dir is not None:
+            shutil.copytree(cached_rasters_dir, rasters_dir)
+            return True
+
+        raster_success = raster_pages(
+            outcome.dirs.compiled_tex,
+            rasters_dir,
+            output_file.path,
+            output_file.output_type,
+        )
+        if (
+            raster_success
+            and self._compile_cache is not None
+            and outcome.cache_key is not None
+        ):
+            self._compile_cache.save_rasters_dir(
+                outcome.cache_key, get_raster_settings(), output_file.path, rasters_dir,
+            )
+        return raster_success
 
+    def _can_raster_to_memory(self, output_files: List[OutputFile]) -> bool:
+        " Determine whether there is a streaming rasterer for each of the output files. "
+        for output_file in output_files:
+            if get_streaming_raster_command(output_file.output_type) is None:
+                if output_file.output_type not in self._unstreamable_file_types:
                     logging.warning(  # pylint: disable=logging-not-lazy
-                        "Failed to compile paper %s with colorized entities. The culprit may be "
-                        + "the colorization command for entity %s. The problematic entities will be "
-                        + "colorized on their own, and the rest of the entities will be colorized "
-                        + "together in the next batch.",
-                        item.arxiv_id,
-                        " or ".join(problem_ids),
+                        "No streaming rasterer is set or could be derived from the 'rasterers' "
+                        + "section of the config file for files of type %s. These files will "
+                        + "be rastered to disk.",
+                        output_file.output_type,
                     )
+                    self._unstreamable_file_types.add(output_file.output_type)
+                return False
+        return True
+
+    def _load_original_images(self, arxiv_id: ArxivId) -> None:
+        " Load rasters of the pages of the original paper, keeping images for one paper at a time. "
+        if arxiv_id in self._original_images:
+            return
+
+        original_images: Dict[RelativePath, PageImages] = {}
+        output_files = get_output_files(
+            directories.arxiv_subdir("compiled-normalized-sources", arxiv_id)
+        )
+        for output_file in output_files:
+            images_dir = os.path.join(
+                directories.arxiv_subdir("paper-images", arxiv_id),
+                directories.escape_slashes(output_file.path),
+            )
+            if not os.path.exists(images_dir):
+                logging.warning(  # pylint: disable=logging-not-lazy
+                    "Could not find expected directory of images from the compiled original "
+                    + "sources at %s. Entities will not be located in output file %s of paper %s.",
+                    images_dir,
+                    output_file.path,
+                    arxiv_id,
+                )
+                continue
+            original_images[output_file.path] = load_page_images(images_dir)
 
-                    for id_ in problem_ids:
-                        to_process_alone.append(id_)
-                        del batch[batch.index(id_)]
+        self._original_images = {arxiv_id: original_images}
 
-                    to_process.extendleft(reversed(batch))
-                    continue
+    def _locate_in_memory(
+        self,
+        item: LocationTask,
+        outcome: "BatchOutcome",
+        output_files: List[OutputFile],
+    ) -> Optional[LocationResult]:
+        """
+        Raster the pages of the colorized paper into memory, and search them for entities. Rasters
+        and diffs are only written to the batch's directories if intermediate files are kept.
+        If pages are predicted for the batch, only the predicted pages are rastered first. If
+        the entities weren't all found well within those pages, all pages are rastered.
+        """
+        pages = self._predict_pages(item, outcome, output_files)
+        if pages is not None:
+            location_result = self._raster_and_locate(
+                item, outcome, output_files, pages
+            )
+            if location_result is not None and self._found_on_pages(
+                item, outcome, output_files, location_result, pages
+            ):
+                return location_result
+            logging.debug(
+                "Entities in batch %d-%d of paper %s were not all found on predicted pages "
+                + "%d-%d. All pages will be rastered.",
+                item.group,
+                outcome.index,
+                item.arxiv_id,
+                pages[0] + 1,
+                pages[1] + 1,
+            )
 
-                # If there was some other reason for the error, remove just the first entity from the batch.
+        return self._raster_and_locate(item, outcome, output_files)
+
+    def _raster_and_locate(
+        self,
+        item: LocationTask,
+        outcome: "BatchOutcome",
+        output_files: List[OutputFile],
+        pages: Optional[Tuple[int, int]] = None,
+    ) -> Optional[LocationResult]:
+        raster_settings = get_raster_settings(streaming=True)
+        if pages is not None:
+            raster_settings += f" pages {pages[0]}-{pages[1]}"
+
+        modified_images: Dict[RelativePath, PageImages] = {}
+        for output_file in output_files:
+            with outcome.timer.time("raster"):
+                images = self._load_cached_rasters(
+                    outcome, raster_settings, output_file.path
+                )
+                if images is None:
+                    images = raster_pages_to_images(
+                        outcome.dirs.compiled_tex,
+                        output_file.path,
+                        output_file.output_type,
+                        pages=pages,
+                    )
+                    if (
+                        images is not None
+                        and self._compile_cache is not None
+                        and outcome.cache_key is not None
+                    ):
+                        self._compile_cache.save_rasters(
+                            outcome.cache_key,
+                            raster_settings,
+                            output_file.path,
+                            images,
+                        )
+            if images is None:
                 logging.error(  # pylint: disable=logging-not-lazy
-                    "Failed to compile paper %s with colorized entities %s. The cause "
-                    + "is assumed to be in the first colorized entity. The location for the "
-                    + "first entity %s will not be detected. The remainder of the entities in "
-                    + "this batch will be processed in another batch.",
+                    "Failed to rasterize pages for %s iteration %s. The locations for entities "
+                    + "with IDs %s with not be detected.",
                     item.arxiv_id,
-                    batch,
-                    batch[0],
+                    outcome.iteration_id,
+                    outcome.batch,
                 )
-                del [batch[0]]
-                to_process.extendleft(reversed(batch))
-                continue
-
-            # Raster the pages to images, and compute diffs from the original images.
-            output_files = compilation_result.output_files
-            for output_file in output_files:
-                raster_success = raster_pages(
-                    compiled_tex_dir,
+                return None
+            if self.args.keep_intermediate_files:
+                save_page_images(
+                    images,
                     os.path.join(
-                        raster_output_dir, directories.escape_slashes(output_file.path)
+                        outcome.dirs.rasters,
+                        directories.escape_slashes(output_file.path),
                     ),
-                    output_file.path,
-                    output_file.output_type,
                 )
-                if not raster_success:
-                    logging.error(  # pylint: disable=logging-not-lazy
-                        "Failed to rasterize pages for %s iteration %s. The locations for entities "
-                        + "with IDs %s with not be detected.",
+            outcome.timer.add("raster", 0.0, pages=len(images))
+            modified_images[output_file.path] = images
+
+        return locate_entities_in_images(
+            self._original_images.get(item.arxiv_id, {}),
+            modified_images,
+            outcome.entity_hues,
+            diffed_images_dir=outcome.dirs.diffs
+            if self.args.keep_intermediate_files
+            else None,
+            entity_values=outcome.entity_values,
+            palette=self._get_palette(),
+            pages=pages,
+            timer=outcome.timer,
+        )
+
+    def _predict_pages(
+        self,
+        item: LocationTask,
+        outcome: "BatchOutcome",
+        output_files: List[OutputFile],
+    ) -> Optional[Tuple[int, int]]:
+        """
+        Predict which pages of the colorized paper a batch of entities will be found on, from the
+        pages where entities from earlier batches were found. Pages are only predicted if the
+        colorized paper has the same number of pages as the original. Returns 'None' if all
+        pages should be rastered.
+        """
+        if not self.args.predict_pages or len(output_files) != 1:
+            return None
+
+        output_file = output_files[0]
+        original_pages = self._original_images.get(item.arxiv_id, {}).get(
+            output_file.path
+        )
+        compilation_result = outcome.compilation_result
+        if original_pages is None or compilation_result is None:
+            return None
+        num_pages = len(original_pages)
+        if get_page_count(compilation_result.stdout, output_file.path) != num_pages:
+            return None
+
+        entities_by_id = {e.id_: e for e in item.entities}
+        pages = predict_pages(
+            self._located_pages,
+            [entities_by_id[id_].start for id_ in outcome.batch],
+            num_pages,
+        )
+        if pages is None or pages == (0, num_pages - 1):
+            return None
+        return pages
+
+    def _found_on_pages(
+        self,
+        item: LocationTask,
+        outcome: "BatchOutcome",
+        output_files: List[OutputFile],
+        location_result: LocationResult,
+        pages: Tuple[int, int],
+    ) -> bool:
+        """
+        Check that all entities in a batch were found within a range of pages. Entities found
+        on the first or last page of the range (unless those are the first or last pages of the
+        paper) may continue outside of the range, and are not considered to be within it.
+        """
+        num_pages = len(self._original_images[item.arxiv_id][output_files[0].path])
+        first_page, last_page = pages
+        for entity_id in outcome.batch:
+            boxes = location_result.locations.get(entity_id, [])
+            if len(boxes) == 0:
+                return False
+            for box in boxes:
+                if (box.page == first_page and first_page > 0) or (
+                    box.page == last_page and last_page < num_pages - 1
+                ):
+                    return False
+        return True
+
+    def _get_cache_key(
+        self, arxiv_id: ArxivId, modified_files: Dict[RelativePath, bytes]
+    ) -> str:
+        " Get the cache key of compiling the normalized sources with 'modified_files' replaced. "
+        return compute_cache_key(
+            self._sources_fingerprints[arxiv_id],
+            modified_files,
+            self._compiler_settings,
+        )
+
+    def _get_cached_rasters_dir(
+        self, outcome: "BatchOutcome", output_path: RelativePath
+    ) -> Optional[str]:
+        if self._compile_cache is None or outcome.cache_key is None:
+            return None
+        return self._compile_cache.get_rasters_dir(
+            outcome.cache_key, get_raster_settings(), output_path
+        )
+
+    def _load_cached_rasters(
+        self, outcome: "BatchOutcome", raster_settings: str, output_path: RelativePath
+    ) -> Optional[PageImages]:
+        if self._compile_cache is None or outcome.cache_key is None:
+            return None
+        return self._compile_cache.load_rasters(
+            outcome.cache_key, raster_settings, output_path
+        )
+
+    def _get_palette(self) -> Palette:
+        " Get the palette entities are colorized with. "
+        if self.get_colorize_func() is not None:
+            return PALETTES["default"]
+        return PALETTES[self.args.palette]
+
+    def _resolve_outcome(
+        self,
+        item: LocationTask,
+        outcome: "BatchOutcome",
+        to_process_alone: Deque[str],
+        to_bisect: Deque[List[str]],
+    ) -> Tuple[List[str], List[str]]:
+        """
+        Inspect the outcome of a batch, and decide what to do with each of the entities in the
+        batch. Entities that should be processed on their own are added to 'to_process_alone'.
+        Parts of batches that should be processed as batches of their own are added to
+        'to_bisect'. Returns a tuple of (1) the IDs of entities that should be processed again in
+        an upcoming batch and (2) the IDs of entities for which locations should be saved.
+        """
+
+        if not outcome.colorized:
+            return [], []
+
+        batch = list(outcome.batch)
+        requeue = list(outcome.skipped)
+
+        compilation_result = outcome.compilation_result
+        if compilation_result is not None:
+            save_compilation_result(
+                "compiled-sources",
+                item.arxiv_id,
+                outcome.dirs.compiled_tex,
+                compilation_result,
+            )
+
+        if compilation_result is not None and not compilation_result.success:
+
+            # Only failures that TeX reported in the log are remembered, as other failures
+            # (e.g., a compilation that timed out) may not happen again.
+            if len(batch) == 1 and _did_tex_report_failure(compilation_result):
+                self._record_fault(item, batch[0], "compilation")
+
+            if self.args.failure_isolation == "bisect":
+                self._bisect_failed_batch(item, outcome, batch, to_bisect)
+                return requeue, []
+
+            # If colorizing a specific entity caused the failure, remove the entity that caused
+            # the problem from the batch and restart with a new batch, minus this entity.
+            last_colorized_entity_id = get_last_colorized_entity(
+                item.arxiv_id, outcome.dirs.compiled_tex
+            )
+            if last_colorized_entity_id is not None:
+                problem_ids = [last_colorized_entity_id]
+                if batch.index(last_colorized_entity_id) < len(batch) - 1:
+                    problem_ids += [batch[batch.index(last_colorized_entity_id) + 1]]
+
+                if len(batch) == 1:
+                    logging.warning(  # pylint: disable=logging-not-lazy
+                        "Failed to compile paper %s with colorized entity %s, even when it was "
+                        + "colorized in isolation. The location of this entity will not be detected.",
                         item.arxiv_id,
-                        iteration_id,
-                        batch,
+                        batch[0],
                     )
-                    continue
+                    return requeue, []
 
-                logging.debug(
-                    "Attempting to diff rastered pages for paper %s iteration %s.",
-                    item.arxiv_id,
-                    iteration_id,
-                )
-                diff_success = diff_images_in_raster_dirs(
-                    output_files, raster_output_dir, diffs_output_dir, item.arxiv_id,
-                )
-                logging.debug(
-                    "Finished diffing attempt for paper %s iteration %s. Success? %s.",
+                logging.warning(  # pylint: disable=logging-not-lazy
+                    "Failed to compile paper %s with colorized entities. The culprit may be "
+                    + "the colorization command for entity %s. The problematic entities will be "
+                    + "colorized on their own, and the rest of the entities will be colorized "
+                    + "together in the next batch.",
                     item.arxiv_id,
-                    iteration_id,
-                    diff_success,
+                    " or ".join(problem_ids),
                 )
-                if not diff_success:
-                    logging.error(  # pylint: disable=logging-not-lazy
-                        "Failed to difference images of original and colorized versions of "
-                        + "papers %s in batch processing iteration %s. The locations for entities with IDs "
-                        + "%s will not be detected.",
-                        item.arxiv_id,
-                        iteration_id,
-                        batch,
-                    )
-                    continue
 
-            # Locate the entities in the diffed images.
-            logging.debug(
-                "Attempting to locate entities using image differences for paper %s iteration %s.",
+                for id_ in problem_ids:
+                    to_process_alone.append(id_)
+                    del batch[batch.index(id_)]
+
+                return batch + requeue, []
+
+            # If there was some other reason for the error, remove just the first entity from the batch.
+            logging.error(  # pylint: disable=logging-not-lazy
+                "Failed to compile paper %s with colorized entities %s. The cause "
+                + "is assumed to be in the first colorized entity. The location for the "
+                + "first entity %s will not be detected. The remainder of the entities in "
+                + "this batch will be processed in another batch.",
                 item.arxiv_id,
-                iteration_id,
+                batch,
+                batch[0],
             )
-            entity_hues = colorized_tex.entity_hues
-            location_result = locate_entities(
-                item.arxiv_id, raster_output_dir, diffs_output_dir, entity_hues
+            return batch[1:] + requeue, []
+
+        location_result = outcome.location_result
+        if location_result is None:
+            logging.warning(  # pylint: disable=logging-not-lazy
+                "Error occurred when locating entities by hue in diffed images "
+                + "for paper %s. None of the entities in batch %s will be detected.",
+                item.arxiv_id,
+                batch,
             )
-            if location_result is None:
+            return requeue, []
+
+        if self.should_sanity_check_images() and location_result.black_pixels_found:
+            logging.warning(  # pylint: disable=logging-not-lazy
+                "Ignoring bounding boxes found for paper %s in batch %s due to "
+                + "black pixels found in the images. This might indicate that the colorization "
+                + "commands introduced subtle shifts of the text.",
+                item.arxiv_id,
+                batch,
+            )
+            return requeue, []
+
+        # If colorizing entities seemed to cause drift in the document...
+        if len(location_result.shifted_entities) > 0:
+
+            logging.warning(  # pylint: disable=logging-not-lazy
+                "Some entities shifted position in the colorized TeX for paper %s batch %s: "
+                + "%s. Attempting to remove the first shifted entity from the batch.",
+                item.arxiv_id,
+                batch,
+                location_result.shifted_entities,
+            )
+
+            first_shifted_entity_id = None
+            for entity_id in batch:
+                if entity_id in location_result.shifted_entities:
+                    first_shifted_entity_id = entity_id
+                    break
+
+            if first_shifted_entity_id is not None:
+                self._record_fault(item, first_shifted_entity_id, "layout")
+                if len(batch) > 1:
+                    logging.info(  # pylint: disable=logging-not-lazy
+                        "Entity %s has been marked as being the potential cause of shifting in "
+                        + "the colorized document for paper %s batch %d-%d. It will be processed "
+                        + "later on its own. The other shifted entities in %s will be queued to "
+                        + "process as a group in an upcoming batch.",
+                        first_shifted_entity_id,
+                        item.arxiv_id,
+                        item.group,
+                        outcome.index,
+                        location_result.shifted_entities,
+                    )
+
+                    # Get the index of the first entity for which the location has shifted
+                    # during colorization.
+                    moved_entity_index = batch.index(first_shifted_entity_id)
+
+                    # Mark all other entities that have shifted after the first one one to be processed
+                    # in a later batch (instead of on their own). It could be that they won't shift
+                    # once the first shifted entity is removed.
+                    shifted_after = []
+                    for i in range(len(batch) - 1, moved_entity_index, -1):
+                        if batch[i] in location_result.shifted_entities:
+                            shifted_after.insert(0, batch[i])
+                            del batch[i]
+                    requeue = shifted_after + requeue
+
+                    # Mark the first entity that shifted to be reprocessed alone, where its position
+                    # might be discoverable, without affecting the positions of other element.
+                    del batch[moved_entity_index]
+                    to_process_alone.append(first_shifted_entity_id)
+
+                elif len(batch) == 1 and self.should_sanity_check_images():
+                    logging.info(  # pylint: disable=logging-not-lazy
+                        "Skipping entity %s for paper %s as it caused "
+                        + "colorization errors even when colorized in isolation.",
+                        first_shifted_entity_id,
+                        item.arxiv_id,
+                    )
+                    return requeue, []
+                elif len(batch) == 1:
+                    logging.info(  # pylint: disable=logging-not-lazy
+                        "Entity %s has been marked as the cause of shifting in "
+                        + "the colorized document for paper %s. Its location will "
+                        + "still be saved (if one was found), though this location should be "
+                        + "considered potentially inaccurate.",
+                        first_shifted_entity_id,
+                        item.arxiv_id,
+                    )
+
+            elif self.args.failure_isolation == "bisect" and len(batch) > 1:
                 logging.warning(  # pylint: disable=logging-not-lazy
-                    "Error occurred when locating entities by hue in diffed images "
-                    + "for paper %s. None of the entities in batch %s will be detected.",
+                    "Could not find a single entity that was likely responsible for shifting in "
+                    + "the colorized version of paper %s batch %d-%d. Batch %s will be split in "
+                    + "two, and each half will be processed as a batch.",
                     item.arxiv_id,
+                    item.group,
+                    outcome.index,
                     batch,
                 )
-                continue
+                half = (len(batch) + 1) // 2
+                to_bisect.extend([batch[:half], batch[half:]])
+                return requeue, []
 
-            if self.should_sanity_check_images() and location_result.black_pixels_found:
+            else:
                 logging.warning(  # pylint: disable=logging-not-lazy
-                    "Ignoring bounding boxes found for paper %s in batch %s due to "
-                    + "black pixels found in the images. This might indicate that the colorization "
-                    + "commands introduced subtle shifts of the text.",
+                    "Could not find a single entity that was likely responsible for shifting in "
+                    + "the colorized version of paper %s batch %d-%d. All entities in batch %s will "
+                    + "be processed on their own.",
                     item.arxiv_id,
+                    item.group,
+                    outcome.index,
                     batch,
                 )
-                continue
+                to_process_alone.extend(batch)
+
+        # The code above is responsible for filtering 'batch' to ensure that it doesn't include
+        # any entity IDs that shouldn't be saved to file, for example if the client has asked that
+        # entity IDs that cause colorization errors be omitted from the results.
+        return requeue, batch
+
+    def _bisect_failed_batch(
+        self,
+        item: LocationTask,
+        outcome: "BatchOutcome",
+        batch: List[str],
+        to_bisect: Deque[List[str]],
+    ) -> None:
+        """
+        Split a batch that failed to compile into two batches. If the compiler log shows which
+        entity was colorized last before the failure, the batch is split right before that entity,
+        as the entities colorized before it are unlikely to have caused the failure. Otherwise, the
+        batch is split in half. A batch of one entity is not split; that entity is skipped.
+        """
+        if len(batch) == 1:
+            logging.warning(  # pylint: disable=logging-not-lazy
+                "Failed to compile paper %s with colorized entity %s, even when it was "
+                + "colorized in isolation. The location of this entity will not be detected.",
+                item.arxiv_id,
+                batch[0],
+            )
+            return
 
-            # If colorizing entities seemed to cause drift in the document...
-            if len(location_result.shifted_entities) > 0:
+        split = (len(batch) + 1) // 2
+        last_colorized_entity_id = get_last_colorized_entity(
+            item.arxiv_id, outcome.dirs.compiled_tex
+        )
+        if (
+            last_colorized_entity_id in batch
+            and batch.index(last_colorized_entity_id) > 0
+        ):
+            split = batch.index(last_colorized_entity_id)
 
-                logging.warning(  # pylint: disable=logging-not-lazy
-                    "Some entities shifted position in the colorized TeX for paper %s batch %s: "
-                    + "%s. Attempting to remove the first shifted entity from the batch.",
-                    item.arxiv_id,
-                    batch,
-                    location_result.shifted_entities,
-                )
+        logging.warning(  # pylint: disable=logging-not-lazy
+            "Failed to compile paper %s with colorized entities %s. The batch will be split "
+            + "into batches %s and %s to find the entities that caused the failure.",
+            item.arxiv_id,
+            batch,
+            batch[:split],
+            batch[split:],
+        )
+        to_bisect.extend([batch[:split], batch[split:]])
 
-                first_shifted_entity_id = None
-                for entity_id in batch:
-                    if entity_id in location_result.shifted_entities:
-                        first_shifted_entity_id = entity_id
-                        break
-
-                if first_shifted_entity_id is not None:
-                    if len(batch) > 1:
-                        logging.info(  # pylint: disable=logging-not-lazy
-                            "Entity %s has been marked as being the potential cause of shifting in "
-                            + "the colorized document for paper %s batch %d-%d. It will be processed "
-                            + "later on its own. The other shifted entities in %s will be queued to "
-                            + "process as a group in an upcoming batch.",
-                            first_shifted_entity_id,
-                            item.arxiv_id,
-                            item.group,
-                            batch_index,
-                            location_result.shifted_entities,
-                        )
+    @staticmethod
+    def _is_faulty(outcome: "BatchOutcome") -> bool:
+        " Determine whether a batch failed to compile, or shifted the layout of the page. "
+        if (
+            outcome.compilation_result is not None
+            and not outcome.compilation_result.success
+        ):
+            return True
+        return (
+            outcome.location_result is not None
+            and len(outcome.location_result.shifted_entities) > 0
+        )
 
-                        # Get the index of the first entity for which the location has shifted
-                        # during colorization.
-                        moved_entity_index = batch.index(first_shifted_entity_id)
-
-                        # Mark all other entities that have shifted after the first one one to be processed
-                        # in a later batch (instead of on their own). It could be that they won't shift
-                        # once the first shifted entity is removed.
-                        for i in range(len(batch) - 1, moved_entity_index, -1):
-                            if batch[i] in location_result.shifted_entities:
-                                to_process.appendleft(batch[i])
-                                del batch[i]
-
-                        # Mark the first entity that shifted to be reprocessed alone, where its position
-                        # might be discoverable, without affecting the positions of other element.
-                        del batch[moved_entity_index]
-                        to_process_alone.append(first_shifted_entity_id)
-
-                    elif len(batch) == 1 and self.should_sanity_check_images():
-                        logging.info(  # pylint: disable=logging-not-lazy
-                            "Skipping entity %s for paper %s as it caused "
-                            + "colorization errors even when colorized in isolation.",
-                            first_shifted_entity_id,
-                            item.arxiv_id,
-                        )
-                        continue
-                    elif len(batch) == 1:
-                        logging.info(  # pylint: disable=logging-not-lazy
-                            "Entity %s has been marked as the cause of shifting in "
-                            + "the colorized document for paper %s. Its location will "
-                            + "still be saved (if one was found), though this location should be "
-                            + "considered potentially inaccurate.",
-                            first_shifted_entity_id,
-                            item.arxiv_id,
-                        )
+    def _get_compiler_settings_hash(self) -> str:
+        return hashlib.sha1(self._compiler_settings.encode("utf-8")).hexdigest()
 
-                else:
-                    logging.warning(  # pylint: disable=logging-not-lazy
-                        "Could not find a single entity that was likely responsible for shifting in "
-                        + "the colorized version of paper %s batch %d-%d. All entities in batch %s will "
-                        + "be processed on their own.",
-                        item.arxiv_id,
-                        item.group,
-                        batch_index,
-                        batch,
-                    )
-                    to_process_alone.extend(batch)
+    def _get_faults_path(self, arxiv_id: ArxivId) -> str:
+        return os.path.join(
+            directories.arxiv_subdir("colorization-faults", arxiv_id),
+            f"{self.get_entity_name()}.csv",
+        )
 
+    def _load_known_faults(
+        self, arxiv_id: ArxivId
+    ) -> Dict[Tuple[str, str], ColorizationFault]:
+        " Load faults recorded for a paper, keeping faults for one paper at a time. "
+        if arxiv_id not in self._known_faults:
+            faults: Dict[Tuple[str, str], ColorizationFault] = {}
+            faults_path = self._get_faults_path(arxiv_id)
+            if file_utils.data_file_exists(faults_path):
+                for fault in file_utils.load_from_csv(faults_path, ColorizationFault):
+                    faults[(fault.tex_path, fault.entity_id)] = fault
+            self._known_faults = {arxiv_id: faults}
+        return self._known_faults[arxiv_id]
+
+    def _apply_known_faults(
+        self, item: LocationTask, to_process: Deque[str]
+    ) -> Tuple[Deque[str], Deque[str]]:
+        """
+        Remove entities that are known to fail to compile from the queue of entities to process,
+        and move entities that are known to shift the layout to a queue of entities to process
+        on their own. Returns the two queues.
+        """
+        faults = self._load_known_faults(item.arxiv_id)
+        entities_by_id = {e.id_: e for e in item.entities}
+        remaining: Deque[str] = deque()
+        alone: Deque[str] = deque()
+        for id_ in to_process:
+            fault = faults.get((item.tex_path, id_))
+            if (
+                fault is None
+                or fault.entity_hash != _hash_entity(entities_by_id[id_])
+                or fault.compiler_settings_hash != self._get_compiler_settings_hash()
+            ):
+                remaining.append(id_)
+            elif fault.fault == "layout":
+                alone.append(id_)
+            else:
+                logging.info(  # pylint: disable=logging-not-lazy
+                    "Skipping entity %s for paper %s, as it failed to compile when it was "
+                    + "colorized on its own the last time the paper was processed.",
+                    id_,
+                    item.arxiv_id,
+                )
+
+        if len(alone) > 0:
             logging.debug(
-                "Finished attempt at locating entities with image diffs for paper %s iteration %s.",
+                "Entities %s of paper %s are known to shift the layout, and will be "
+                + "processed on their own.",
+                list(alone),
                 item.arxiv_id,
-                iteration_id,
             )
+        return remaining, alone
+
+    def _record_fault(self, item: LocationTask, entity_id: str, fault: str) -> None:
+        " Remember that an entity caused a fault, so it can be avoided when reprocessing the paper. "
+        if not self.args.remember_faults:
+            return
+
+        faults = self._load_known_faults(item.arxiv_id)
+        entity = next(e for e in item.entities if e.id_ == entity_id)
+        record = ColorizationFault(
+            item.tex_path,
+            entity_id,
+            _hash_entity(entity),
+            self._get_compiler_settings_hash(),
+            fault,
+        )
+        if faults.get((item.tex_path, entity_id)) == record:
+            return
 
-            # The code above is responsible for filtering 'batch' to ensure that it doesn't include
-            # any entity IDs that shouldn't be saved to file, for example if the client has asked that
-            # entity IDs that cause colorization errors be omitted from the results.
-            for entity_id in batch:
-                for box in location_result.locations[entity_id]:
-                    yield HueLocationInfo(
-                        tex_path=item.tex_path,
-                        iteration=iteration_id,
-                        hue=entity_hues[entity_id],
-                        entity_id=entity_id,
-                        page=box.page,
-                        left=box.left,
-                        top=box.top,
-                        width=box.width,
-                        height=box.height,
-                    )
+        faults[(item.tex_path, entity_id)] = record
+        file_utils.append_to_csv(self._get_faults_path(item.arxiv_id), record)
+
+    def _get_checkpoints_path(self, arxiv_id: ArxivId) -> str:
+        return os.path.join(
+            directories.arxiv_subdir(
+                self.output_base_dirs["entity-locations"], arxiv_id
+            ),
+            "checkpoints.csv",
+        )
 
-        _cleanup_from_last_batch()
+    def _load_checkpoints(
+        self, arxiv_id: ArxivId
+    ) -> Dict[Tuple[str, str], LocationCheckpoint]:
+        " Load checkpoints recorded for a paper, keeping checkpoints for one paper at a time. "
+        if arxiv_id not in self._checkpoints:
+            checkpoints: Dict[Tuple[str, str], LocationCheckpoint] = {}
+            checkpoints_path = self._get_checkpoints_path(arxiv_id)
+            if file_utils.data_file_exists(checkpoints_path):
+                for checkpoint in file_utils.load_from_csv(
+                    checkpoints_path, LocationCheckpoint
+                ):
+                    checkpoints[
+                        (checkpoint.tex_path, checkpoint.entity_id)
+                    ] = checkpoint
+            self._checkpoints = {arxiv_id: checkpoints}
+        return self._checkpoints[arxiv_id]
+
+    def _prepare_to_resume(
+        self, arxiv_id: ArxivId, entities: List[SerializableEntity]
+    ) -> None:
+        """
+        Remove saved locations for entities that aren't checkpointed (i.e., entities in batches
+        that were interrupted, or that changed since they were checkpointed), as these entities
+        will be located again.
+        """
+        self._checkpoints.pop(arxiv_id, None)
+        checkpoints = self._load_checkpoints(arxiv_id)
+        hashes = {(e.tex_path, e.id_): _hash_entity(e) for e in entities}
+        for key, checkpoint in list(checkpoints.items()):
+            if hashes.get(key) != checkpoint.entity_hash:
+                del checkpoints[key]
+
+        locations_path = os.path.join(
+            directories.arxiv_subdir(
+                self.output_base_dirs["entity-locations"], arxiv_id
+            ),
+            "entity_locations.csv",
+        )
+        if not file_utils.data_file_exists(locations_path):
+            return
+        locations = list(file_utils.load_from_csv(locations_path, HueLocationInfo))
+        kept = [
+            location
+            for location in locations
+            if (location.tex_path, location.entity_id) in checkpoints
+        ]
+        if len(kept) < len(locations):
+            file_utils.delete_data_file(locations_path)
+            for location in kept:
+                file_utils.append_to_csv(locations_path, location)
+
+        logging.info(  # pylint: disable=logging-not-lazy
+            "Resuming locating entities for paper %s. %d entities were checkpointed, with %d "
+            + "saved location(s). %d location(s) of entities that weren't checkpointed were "
+            + "removed.",
+            arxiv_id,
+            len(checkpoints),
+            len(kept),
+            len(locations) - len(kept),
+        )
+
+    def _skip_checkpointed(
+        self, item: LocationTask, to_process: Deque[str], to_process_alone: Deque[str]
+    ) -> Tuple[Deque[str], Deque[str], int]:
+        """
+        Remove checkpointed entities from the queues of entities to process. Returns the two
+        queues, and the index of the last batch that was checkpointed (or -1 if none were), so
+        that new batches get new indexes.
+        """
+        checkpoints = self._load_checkpoints(item.arxiv_id)
+        entities_by_id = {e.id_: e for e in item.entities}
+        last_batch_index = max(
+            (
+                c.batch_index
+                for c in checkpoints.values()
+                if c.tex_path == item.tex_path and c.group == item.group
+            ),
+            default=-1,
+        )
+
+        def is_checkpointed(id_: str) -> bool:
+            checkpoint = checkpoints.get((item.tex_path, id_))
+            return checkpoint is not None and checkpoint.entity_hash == _hash_entity(
+                entities_by_id[id_]
+            )
+
+        return (
+            deque(id_ for id_ in to_process if not is_checkpointed(id_)),
+            deque(id_ for id_ in to_process_alone if not is_checkpointed(id_)),
+            last_batch_index,
+        )
+
+    def _record_checkpoints(
+        self, item: LocationTask, outcome: "BatchOutcome", pending: Set[str]
+    ) -> None:
+        """
+        Checkpoint the entities in a batch that don't need to be processed in another batch
+        (i.e., aren't in 'pending'). Locations saved for the batch are written to disk first, so
+        that checkpointed entities never lose their locations.
+        """
+        checkpoints = self._load_checkpoints(item.arxiv_id)
+        entities_by_id = {e.id_: e for e in item.entities}
+        checkpoints_path = self._get_checkpoints_path(item.arxiv_id)
+        os.makedirs(os.path.dirname(checkpoints_path), exist_ok=True)
+        with file_utils.csv_writer_session() as session:
+            session.flush()
+            for id_ in outcome.batch + outcome.skipped:
+                if id_ in pending or (item.tex_path, id_) in checkpoints:
+                    continue
+                checkpoint = LocationCheckpoint(
+                    item.tex_path,
+                    item.group,
+                    outcome.index,
+                    id_,
+                    _hash_entity(entities_by_id[id_]),
+                )
+                checkpoints[(item.tex_path, id_)] = checkpoint
+                file_utils.append_to_csv(checkpoints_path, checkpoint)
+            session.flush(checkpoints_path)
+
+    def _make_location_records(
+        self, item: LocationTask, outcome: "BatchOutcome", entity_ids: List[str]
+    ) -> Iterator[HueLocationInfo]:
+        location_result = outcome.location_result
+        if location_result is None:
+            return
+        for entity_id in entity_ids:
+            for box in location_result.locations[entity_id]:
+                yield HueLocationInfo(
+                    tex_path=item.tex_path,
+                    iteration=outcome.iteration_id,
+                    hue=outcome.entity_hues[entity_id],
+                    entity_id=entity_id,
+                    page=box.page,
+                    left=box.left,
+                    top=box.top,
+                    width=box.width,
+                    height=box.height,
+                )
+
+    def _cleanup_batch(self, item: LocationTask, outcome: "BatchOutcome") -> None:
+        " Clean up the scratch directories used by a batch. "
+        if self.args.keep_intermediate_files:
+            return
+
+        logging.debug(  # pylint: disable=logging-not-lazy
+            "Deleting intermediate files used to locate entities (i.e., colorized "
+            + "sources, compilation results, and rasters) for paper %s iteration %s",
+            item.arxiv_id,
+            outcome.iteration_id or "''",
+        )
+        keep_patterns = self.args.retain_batch_files or None
+        for dir_ in outcome.dirs.all():
+            if os.path.exists(dir_):
+                file_utils.clean_directory(dir_, keep_patterns)
+                if not os.listdir(dir_):
+                    os.rmdir(dir_)
+
+    def _save_timings(self, item: LocationTask, outcome: "BatchOutcome") -> None:
+        " Save the time spent in each stage of a batch, next to the entity locations. "
+        if len(outcome.timer.durations) == 0:
+            return
+
+        output_dir = directories.arxiv_subdir(
+            self.output_base_dirs["entity-locations"], item.arxiv_id
+        )
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        timings_path = os.path.join(output_dir, "timings.csv")
+
+        for stage, duration in outcome.timer.durations.items():
+            file_utils.append_to_csv(
+                timings_path,
+                StageTiming(
+                    arxiv_id=item.arxiv_id,
+                    entity_type=self.get_entity_name(),
+                    iteration=outcome.iteration_id,
+                    batch_index=outcome.index,
+                    stage=stage,
+                    duration=duration,
+                    pages=outcome.timer.pages.get(stage),
+                    entities=len(outcome.batch) + len(outcome.skipped),
+                ),
+            )
 
     def save(self, item: LocationTask, result: HueLocationInfo) -> None:
         logging.debug(
@@ -631,6 +1721,22 @@ class LocateEntitiesCommand(ArxivBatchCommand[LocationTask, HueLocationInfo], AB
 EntityId = str
 
 
+def _hash_entity(entity: SerializableEntity) -> str:
+    " Hash the position and TeX of an entity, to detect whether it has changed. "
+    return hashlib.sha1(
+        f"{entity.start}:{entity.end}:{entity.tex}".encode("utf-8", "surrogateescape")
+    ).hexdigest()
+
+
+def _did_tex_report_failure(compilation_result: CompilationResult) -> bool:
+    " Determine whether a failed compilation stopped because of an error reported by TeX. "
+    autotex_log = compilation_result.stdout.decode("utf-8", errors="ignore")
+    compiler_name = get_last_autotex_compiler(autotex_log)
+    if compiler_name is None:
+        return False
+    return did_compilation_fail(autotex_log, compiler_name)
+
+
 def get_last_colorized_entity(
     arxiv_id: ArxivId, compilation_path: RelativePath
 ) -> Optional[EntityId]:
@@ -715,16 +1821,25 @@ def save_colorized_tex(
     tex: str,
     encoding: str,
     entity_hues: Dict[str, float],
+    copy_sources: bool = True,
 ) -> bool:
+    """
+    Save colorized TeX to 'output_sources_path'. If 'copy_sources' is set, the directory will be
+    a full copy of the normalized sources, with the colorized TeX file rewritten. Otherwise, the
+    directory will only contain the colorized TeX file.
+    """
     logging.debug("Outputting colorized TeX to %s.", output_sources_path)
 
     # Each colorization batch gets a new sources directory.
-    shutil.copytree(
-        directories.arxiv_subdir("normalized-sources", arxiv_id), output_sources_path,
-    )
+    if copy_sources:
+        shutil.copytree(
+            directories.arxiv_subdir("normalized-sources", arxiv_id),
+            output_sources_path,
+        )
 
     # Rewrite the TeX with the colorized TeX.
     tex_path = os.path.join(output_sources_path, tex_path)
+    os.makedirs(os.path.dirname(tex_path), exist_ok=True)
     with open(tex_path, "w", encoding=encoding) as tex_file:
         tex_file.write(tex)
 
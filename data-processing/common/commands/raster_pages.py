@@ -4,12 +4,13 @@ import logging
 import os.path
 import subprocess
 from dataclasses import dataclass
-from typing import Dict, Iterator
+from typing import Iterator, List, Optional, Tuple
 
 from common import directories, file_utils
 from common.commands.base import ArxivBatchCommand
 from common.compile import get_output_files
-from common.types import ArxivId, RelativePath
+from common.page_images import PageImages, parse_ppm_stream
+from common.types import ArxivId, Path, RelativePath
 
 """
 Load commands for rastering TeX outputs.
@@ -87,33 +88,170 @@ def raster_pages(
     if not os.path.exists(raster_output_dir):
         os.makedirs(raster_output_dir)
 
-    config = configparser.ConfigParser()
-    config.read(RASTER_CONFIG)
-
-    raster_commands: Dict[str, str] = {}
-    if "rasterers" in config:
-        raster_commands = dict(config["rasterers"])
-
-    try:
-        raster_command = raster_commands[compiled_file_type]
-    except KeyError:
-        logging.warning(  # pylint: disable=logging-not-lazy
-            (
-                "Could not find a rastering command for file %s in directory %s "
-                + "of type %s. This file will not be rastered."
-            ),
-            compiled_file_path,
-            compiled_tex_dir,
-            compiled_file_type,
+    raster_command = _get_raster_command("rasterers", compiled_file_type)
+    if raster_command is None:
+        _warn_no_raster_command(
+            compiled_tex_dir, compiled_file_path, compiled_file_type
         )
         return False
 
-    args = ast.literal_eval(raster_command)
     resolved_compiled_file_path = os.path.join(compiled_tex_dir, compiled_file_path)
     args_resolved = [
         arg.format(output_dir=raster_output_dir, file=resolved_compiled_file_path)
-        for arg in args
+        for arg in raster_command
     ]
+    return _run_raster_command(resolved_compiled_file_path, args_resolved) is not None
+
+
+GHOSTSCRIPT_STREAMING_ARGS = [
+    "-q",
+    "-dSAFER",
+    "-dBATCH",
+    "-dNOPAUSE",
+    "-sDEVICE=ppmraw",
+    "-sOutputFile=-",
+]
+"""
+Arguments that make Ghostscript write pages to standard output as a stream of binary PPM images.
+These replace the output arguments of a Ghostscript command in the 'rasterers' section of the
+config file to make the streaming rasterer for a type of file (see 'get_streaming_raster_command').
+"""
+
+
+def raster_pages_to_images(
+    compiled_tex_dir: RelativePath,
+    compiled_file_path: RelativePath,
+    compiled_file_type: str,
+    pages: Optional[Tuple[int, int]] = None,
+) -> Optional[PageImages]:
+    """
+    Raster the pages of a compiled file straight into memory, without writing images to disk.
+    Returns 'None' if the pages could not be rastered. If 'pages' is set to the first and last
+    page to raster (numbered from 0), only the pages in that range are rastered, provided that the
+    rasterer is Ghostscript. Other rasterers raster all pages.
+    """
+    raster_command = get_streaming_raster_command(compiled_file_type)
+    if raster_command is None:
+        _warn_no_raster_command(
+            compiled_tex_dir, compiled_file_path, compiled_file_type
+        )
+        return None
+
+    first_page = 0
+    if pages is not None and _is_ghostscript(raster_command):
+        first_page, last_page = pages
+        raster_command = (
+            raster_command[:1]
+            + [f"-dFirstPage={first_page + 1}", f"-dLastPage={last_page + 1}"]
+            + raster_command[1:]
+        )
+
+    resolved_compiled_file_path = os.path.join(compiled_tex_dir, compiled_file_path)
+    args_resolved = [
+        arg.format(file=resolved_compiled_file_path) for arg in raster_command
+    ]
+    stdout = _run_raster_command(resolved_compiled_file_path, args_resolved)
+    if stdout is None:
+        return None
+
+    try:
+        images = parse_ppm_stream(stdout)
+    except ValueError as e:
+        logging.error(
+            "Could not read rastered pages of file %s from output of command %s: %s",
+            resolved_compiled_file_path,
+            args_resolved,
+            e,
+        )
+        return None
+
+    return {first_page + page_number: image for page_number, image in enumerate(images)}
+
+
+def get_streaming_raster_command(compiled_file_type: str) -> Optional[List[str]]:
+    """
+    Get the command for rastering a type of file to a stream of binary PPM images on standard
+    output. The command can be set in the 'streaming-rasterers' section of the config file. If it
+    isn't, it's derived from the command in the 'rasterers' section, so that streamed rasters have
+    the same resolution and rendering as the rasters of the original paper saved to disk. Returns
+    'None' if there is no command in 'streaming-rasterers', and the command in 'rasterers' isn't
+    a Ghostscript command it can be derived from.
+    """
+    raster_command = _get_raster_command("streaming-rasterers", compiled_file_type)
+    if raster_command is not None:
+        return raster_command
+
+    disk_raster_command = _get_raster_command("rasterers", compiled_file_type)
+    if disk_raster_command is None or not _is_ghostscript(disk_raster_command):
+        return None
+
+    # Keep all arguments that affect rendering (e.g., resolution), replacing the arguments that
+    # set the output device and output file.
+    kept_args = []
+    args = iter(disk_raster_command[1:])
+    for arg in args:
+        if arg in ["-o", "-sOutputFile"]:
+            next(args, None)
+        elif arg in GHOSTSCRIPT_STREAMING_ARGS or arg.startswith(
+            ("-sDEVICE=", "-sOutputFile=")
+        ):
+            continue
+        else:
+            kept_args.append(arg)
+    return disk_raster_command[:1] + GHOSTSCRIPT_STREAMING_ARGS + kept_args
+
+
+def _is_ghostscript(raster_command: List[str]) -> bool:
+    return os.path.basename(raster_command[0]).startswith("gs")
+
+
+def get_raster_settings(streaming: bool = False) -> str:
+    """
+    Describe the commands used to raster each type of compiled file, either to disk (as used by
+    'raster_pages') or to memory (as used by 'raster_pages_to_images'). Rasters made with
+    different settings may differ, so this can be used to tell them apart.
+    """
+    return repr(
+        {
+            file_type: get_streaming_raster_command(file_type)
+            if streaming
+            else _get_raster_command("rasterers", file_type)
+            for file_type in ["pdf", "ps"]
+        }
+    )
+
+
+def _get_raster_command(
+    config_section: str, compiled_file_type: str
+) -> Optional[List[str]]:
+    config = configparser.ConfigParser()
+    config.read(RASTER_CONFIG)
+
+    if config_section in config and compiled_file_type in config[config_section]:
+        return list(ast.literal_eval(config[config_section][compiled_file_type]))
+    return None
+
+
+def _warn_no_raster_command(
+    compiled_tex_dir: RelativePath,
+    compiled_file_path: RelativePath,
+    compiled_file_type: str,
+) -> None:
+    logging.warning(  # pylint: disable=logging-not-lazy
+        (
+            "Could not find a rastering command for file %s in directory %s "
+            + "of type %s. This file will not be rastered."
+        ),
+        compiled_file_path,
+        compiled_tex_dir,
+        compiled_file_type,
+    )
+
+
+def _run_raster_command(
+    resolved_compiled_file_path: Path, args_resolved: List[str]
+) -> Optional[bytes]:
+    " Run a raster command. Returns the command's output, or 'None' if the command failed. "
 
     logging.debug(
         "Attempting to raster pages for file %s.", resolved_compiled_file_path
@@ -132,9 +270,9 @@ def raster_pages(
             "Error rastering file %s using command %s: (Stdout: %s), (Stderr: %s).",
             resolved_compiled_file_path,
             args_resolved,
-            result.stdout,
+            result.stdout[:1000],
             result.stderr,
         )
-        return False
+        return None
 
-    return True
+    return result.stdout
@@ -8,7 +8,7 @@ from dataclasses import dataclass
 from tempfile import TemporaryDirectory
 from typing import Iterator, List
 
-from common import directories
+from common import directories, file_utils, sqlite_tables
 from common.commands.base import ArxivBatchCommand
 from common.types import ArxivId
 
@@ -124,6 +124,15 @@ class StoreResults(ArxivBatchCommand[ArxivId, None]):
                     spec.glob,
                 )
                 paths = glob.glob(glob_pattern)
+                if spec.glob.endswith(".csv"):
+                    # Data saved to SQLite files (see '--storage-format') is uploaded as CSV.
+                    sqlite_paths = glob.glob(
+                        sqlite_tables.get_sqlite_path(glob_pattern)
+                    )
+                    paths = sorted(
+                        set(paths)
+                        | {sqlite_tables.get_csv_path(p) for p in sqlite_paths}
+                    )
                 if len(paths) == 0:
                     logging.warning(  # pylint: disable=logging-not-lazy
                         (
@@ -144,7 +153,10 @@ class StoreResults(ArxivBatchCommand[ArxivId, None]):
                     logging.debug(
                         "Staging %s to temporary directory %s", path, dest_path
                     )
-                    shutil.copy(path, dest_path)
+                    if spec.glob.endswith(".csv"):
+                        file_utils.export_to_csv(path, dest_path)
+                    else:
+                        shutil.copy(path, dest_path)
 
             upload_path = f"s3://{self.args.s3_bucket}/{self.args.s3_prefix}/results"
             command_args = ["aws", "s3", "sync", staging_dir_path, upload_path]
@@ -1,4 +1,3 @@
-import glob
 import logging
 import os.path
 from abc import abstractmethod
@@ -57,7 +56,9 @@ class UploadEntitiesCommand(DatabaseUploadCommand[PaperProcessingResult, None]):
                 f"detected-{self.get_entity_name()}", arxiv_id
             )
             entities: List[SerializableEntity] = []
-            for entities_path in glob.glob(os.path.join(entities_dir, "entities*.csv")):
+            for entities_path in file_utils.glob_data_files(
+                entities_dir, "entities*.csv"
+            ):
                 entities.extend(
                     file_utils.load_from_csv(
                         entities_path,
@@ -72,7 +73,7 @@ class UploadEntitiesCommand(DatabaseUploadCommand[PaperProcessingResult, None]):
                 ),
                 "entity_locations.csv",
             )
-            if not os.path.exists(locations_path):
+            if not file_utils.data_file_exists(locations_path):
                 logging.warning(  # pylint: disable=logging-not-lazy
                     "No locations have been saved for entities in command '%s' for paper %s. No entities "
                     + "will be uploaded for this paper.",
@@ -94,7 +95,7 @@ class UploadEntitiesCommand(DatabaseUploadCommand[PaperProcessingResult, None]):
                     ),
                     "contexts.csv",
                 )
-                if os.path.exists(contexts_path):
+                if file_utils.data_file_exists(contexts_path):
                     contexts = file_utils.load_from_csv(contexts_path, Context)
                     contexts_by_entity = {c.entity_id: c for c in contexts}
                     contexts_loaded = True
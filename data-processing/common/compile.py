@@ -121,6 +121,26 @@ def get_compiled_tex_files_from_autotex_output(
     ]
 
 
+def get_page_count(
+    tex_engine_output: bytes, output_path: RelativePath
+) -> Optional[int]:
+    """
+    Get the number of pages in a compiled output file from the last message that the TeX engine
+    printed about writing it (e.g., 'Output written on main.pdf (12 pages, 34567 bytes).').
+    PostScript files are matched to the messages about the DVI files they were made from.
+    Returns 'None' if no message was found for the file.
+    """
+    output_stem = os.path.splitext(os.path.basename(output_path))[0]
+    page_count = None
+    for filename, count in re.findall(
+        rb"Output written on (.*?) \((\d+) pages?", tex_engine_output
+    ):
+        stem = os.path.splitext(os.path.basename(filename.decode("utf-8", "ignore")))[0]
+        if stem == output_stem:
+            page_count = int(count)
+    return page_count
+
+
 def get_errors(tex_engine_output: bytes, context: int = 5) -> Iterator[bytes]:
     """
     Extract a list of TeX errors from the TeX compiler's output. 'context' is the number of
@@ -224,7 +244,7 @@ def get_output_files(compiled_tex_dir: RelativePath) -> List[OutputFile]:
         output_files_path = os.path.join(
             _get_compilation_results_dir(compiled_tex_dir), "output_files.csv"
         )
-        if not os.path.exists(output_files_path):
+        if not file_utils.data_file_exists(output_files_path):
             logging.warning(  # pylint: disable=logging-not-lazy
                 "Although compilation succeeded for TeX compilation in directory %s, no "
                 + "output files were produced. Something unexpected must have happened during "
@@ -244,7 +264,7 @@ def get_compiled_tex_files(compiled_tex_dir: RelativePath) -> List[CompiledTexFi
         compiled_tex_files_path = os.path.join(
             _get_compilation_results_dir(compiled_tex_dir), "compiled_tex_files.csv"
         )
-        if not os.path.exists(compiled_tex_files_path):
+        if not file_utils.data_file_exists(compiled_tex_files_path):
             logging.warning(  # pylint: disable=logging-not-lazy
                 "Although compilation succeeded for TeX compilation in directory %s, no "
                 + "specific TeX files were logged as having been compiled. Something "
@@ -0,0 +1,327 @@
+"""
+A cache of the outputs of compiling and rastering colorized TeX sources. Entity location
+compiles a paper once for every batch of entities, and the same batch is often compiled again
+when a paper is reprocessed (e.g., after a crash, or when only a later stage of the pipeline has
+changed). Cache entries are keyed by a hash of the sources that were compiled and of the settings
+of the compiler, so a cached result can be reused whenever the exact same sources would be
+compiled again with the same tools.
+
+Each entry is a directory containing:
+* 'result.json', 'stdout', and 'stderr': the 'CompilationResult' of the compilation
+* 'files/': the files that compilation added to or changed in the sources directory
+* 'rasters/<raster settings hash>/<output file>/': page images rastered from each output file.
+  Images rastered in memory are saved as uncompressed arrays ('page-<n>.npy'), so that saving
+  them doesn't add the cost of encoding images that rastering in memory avoids.
+
+Only successful compilations are cached, so that a compilation that failed (e.g., because it
+timed out) is tried again when the paper is processed again.
+
+Entries are written to a temporary directory and then renamed into place, so that a partially
+written entry is never read, even if several batches are cached at the same time.
+"""
+
+import configparser
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import uuid
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from common import directories
+from common.compile import COMPILE_CONFIG
+from common.manifest import hash_file
+from common.page_images import PageImages
+from common.types import (
+    CompilationResult,
+    CompiledTexFile,
+    OutputFile,
+    Path,
+    RelativePath,
+)
+
+CACHE_VERSION = "1"
+" Change this to invalidate all existing cache entries (e.g., if the entry layout changes). "
+
+COMPILE_SCRIPT = os.path.join("perl", "compile_tex.pl")
+
+ARRAY_PAGE_PATTERN = re.compile(r"page-(\d+)\.npy$")
+" Filenames of page images saved by 'save_rasters', where pages are numbered from 1. "
+
+FileSnapshot = Dict[RelativePath, Tuple[int, int]]
+" Map from paths of files in a directory to their size and modification time. "
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+
+
+def fingerprint_directory(dir_: Path) -> str:
+    " Compute a hash of the paths and contents of all files in a directory. "
+    hasher = hashlib.sha256()
+    for relative_path in sorted(_list_files(dir_)):
+        hasher.update(relative_path.encode("utf-8", errors="surrogateescape") + b"\0")
+        hasher.update(hash_file(os.path.join(dir_, relative_path)).encode() + b"\0")
+    return hasher.hexdigest()
+
+
+def get_compiler_settings() -> str:
+    """
+    Describe the settings that the output of 'compile_tex' depends on, besides the sources: the
+    TeX and Perl installations set in the config file, and the compilation script itself.
+    """
+    config = configparser.ConfigParser()
+    config.read(COMPILE_CONFIG)
+    settings = {
+        section: dict(config[section]) if section in config else {}
+        for section in ["tex", "perl"]
+    }
+    if os.path.exists(COMPILE_SCRIPT):
+        settings["script"] = {"sha256": hash_file(COMPILE_SCRIPT)}
+    return json.dumps(settings, sort_keys=True)
+
+
+def compute_cache_key(
+    sources_fingerprint: str,
+    modified_files: Dict[RelativePath, bytes],
+    compiler_settings: str,
+) -> str:
+    """
+    Compute a cache key for compiling a copy of sources with fingerprint 'sources_fingerprint'
+    (see 'fingerprint_directory') in which 'modified_files' (a map from relative paths to new
+    contents) have been replaced.
+    """
+    hasher = hashlib.sha256()
+    for part in [CACHE_VERSION, sources_fingerprint, compiler_settings]:
+        hasher.update(part.encode("utf-8") + b"\0")
+    for path in sorted(modified_files, key=os.path.normpath):
+        hasher.update(os.path.normpath(path).encode("utf-8") + b"\0")
+        hasher.update(hashlib.sha256(modified_files[path]).hexdigest().encode() + b"\0")
+    return hasher.hexdigest()
+
+
+def snapshot_directory(dir_: Path) -> FileSnapshot:
+    """
+    Record the size and modification time of all files in a directory. Take a snapshot before
+    compiling, and pass it to 'CompileCache.save_compilation' so that only the files that
+    compilation produced are cached.
+    """
+    snapshot: FileSnapshot = {}
+    for relative_path in _list_files(dir_):
+        stat = os.stat(os.path.join(dir_, relative_path))
+        snapshot[relative_path] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+
+class CompileCache:
+    """
+    A cache of compilation results and page rasters stored in 'cache_dir'. Counts of cache hits
+    and misses are kept for compilations and rasters in 'compile_stats' and 'raster_stats'. The
+    cache can be used from several threads at once.
+    """
+
+    def __init__(self, cache_dir: Path) -> None:
+        self.cache_dir = cache_dir
+        self.compile_stats = CacheStats()
+        self.raster_stats = CacheStats()
+        self._lock = threading.Lock()
+
+    def load_compilation(
+        self, key: str, compiled_tex_dir: Path
+    ) -> Optional[CompilationResult]:
+        """
+        Look up the result of a compilation. On a hit, the files that compilation produced are
+        restored to 'compiled_tex_dir', and the cached result is returned.
+        """
+        entry_dir = os.path.join(self.cache_dir, key)
+        result_path = os.path.join(entry_dir, "result.json")
+        if not os.path.exists(result_path):
+            self._count(self.compile_stats, hit=False)
+            return None
+
+        with open(result_path, encoding="utf-8") as result_file:
+            data = json.load(result_file)
+        if not data["success"]:
+            self._count(self.compile_stats, hit=False)
+            return None
+        with open(os.path.join(entry_dir, "stdout"), "rb") as stdout_file:
+            stdout = stdout_file.read()
+        with open(os.path.join(entry_dir, "stderr"), "rb") as stderr_file:
+            stderr = stderr_file.read()
+
+        files_dir = os.path.join(entry_dir, "files")
+        for relative_path in _list_files(files_dir):
+            output_path = os.path.join(compiled_tex_dir, relative_path)
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            shutil.copy2(os.path.join(files_dir, relative_path), output_path)
+
+        self._count(self.compile_stats, hit=True)
+        logging.debug(
+            "Restored cached compilation %s to %s.", key, compiled_tex_dir,
+        )
+        return CompilationResult(
+            success=data["success"],
+            compiled_tex_files=[CompiledTexFile(p) for p in data["compiled_tex_files"]],
+            output_files=[OutputFile(t, p) for t, p in data["output_files"]],
+            stdout=stdout,
+            stderr=stderr,
+        )
+
+    def save_compilation(
+        self,
+        key: str,
+        compiled_tex_dir: Path,
+        result: CompilationResult,
+        snapshot: FileSnapshot,
+    ) -> None:
+        """
+        Save the result of a compilation of 'compiled_tex_dir'. 'snapshot' should be a snapshot of
+        the directory from before it was compiled (see 'snapshot_directory'). Results of failed
+        compilations are not saved.
+        """
+        if not result.success:
+            return
+
+        temp_dir = self._make_temp_dir()
+        files_dir = os.path.join(temp_dir, "files")
+        os.makedirs(files_dir)
+
+        for relative_path, file_info in snapshot_directory(compiled_tex_dir).items():
+            if snapshot.get(relative_path) == file_info:
+                continue
+            output_path = os.path.join(files_dir, relative_path)
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            shutil.copy2(os.path.join(compiled_tex_dir, relative_path), output_path)
+
+        with open(os.path.join(temp_dir, "stdout"), "wb") as stdout_file:
+            stdout_file.write(result.stdout)
+        with open(os.path.join(temp_dir, "stderr"), "wb") as stderr_file:
+            stderr_file.write(result.stderr)
+        with open(
+            os.path.join(temp_dir, "result.json"), "w", encoding="utf-8"
+        ) as result_file:
+            json.dump(
+                {
+                    "success": result.success,
+                    "compiled_tex_files": [f.path for f in result.compiled_tex_files],
+                    "output_files": [
+                        [f.output_type, f.path] for f in result.output_files
+                    ],
+                },
+                result_file,
+            )
+
+        self._commit(temp_dir, os.path.join(self.cache_dir, key))
+
+    def load_rasters(
+        self, key: str, raster_settings: str, output_path: RelativePath
+    ) -> Optional[PageImages]:
+        """
+        Look up page images rastered in memory from output file 'output_path' of a compilation
+        (i.e., images saved with 'save_rasters').
+        """
+        images_dir = self.get_rasters_dir(key, raster_settings, output_path)
+        if images_dir is None:
+            return None
+        images: PageImages = {}
+        for filename in os.listdir(images_dir):
+            match = ARRAY_PAGE_PATTERN.match(filename)
+            if match is not None:
+                images[int(match.group(1)) - 1] = np.load(
+                    os.path.join(images_dir, filename)
+                )
+        return images
+
+    def get_rasters_dir(
+        self, key: str, raster_settings: str, output_path: RelativePath
+    ) -> Optional[Path]:
+        """
+        Look up the directory of page images rastered from output file 'output_path' of a
+        compilation. 'raster_settings' should describe the commands used to raster pages, so that
+        rasters made with different commands are cached separately.
+        """
+        images_dir = self._get_rasters_path(key, raster_settings, output_path)
+        hit = os.path.isdir(images_dir)
+        self._count(self.raster_stats, hit=hit)
+        return images_dir if hit else None
+
+    def save_rasters(
+        self,
+        key: str,
+        raster_settings: str,
+        output_path: RelativePath,
+        images: PageImages,
+    ) -> None:
+        temp_dir = self._make_temp_dir()
+        for page_number, image in images.items():
+            np.save(os.path.join(temp_dir, f"page-{page_number + 1}.npy"), image)
+        self._commit(
+            temp_dir, self._get_rasters_path(key, raster_settings, output_path)
+        )
+
+    def save_rasters_dir(
+        self,
+        key: str,
+        raster_settings: str,
+        output_path: RelativePath,
+        images_dir: Path,
+    ) -> None:
+        " Save a copy of a directory of page images, like those written by 'raster_pages'. "
+        temp_dir = self._make_temp_dir()
+        shutil.rmtree(temp_dir)
+        shutil.copytree(images_dir, temp_dir)
+        self._commit(
+            temp_dir, self._get_rasters_path(key, raster_settings, output_path)
+        )
+
+    def _get_rasters_path(
+        self, key: str, raster_settings: str, output_path: RelativePath
+    ) -> Path:
+        settings_hash = hashlib.sha256(raster_settings.encode("utf-8")).hexdigest()
+        return os.path.join(
+            self.cache_dir,
+            key,
+            "rasters",
+            settings_hash[:16],
+            directories.escape_slashes(output_path),
+        )
+
+    def _count(self, stats: CacheStats, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                stats.hits += 1
+            else:
+                stats.misses += 1
+
+    def _make_temp_dir(self) -> Path:
+        temp_dir = os.path.join(self.cache_dir, f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(temp_dir)
+        return temp_dir
+
+    def _commit(self, temp_dir: Path, entry_dir: Path) -> None:
+        " Move a fully written entry into place. "
+        os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+        try:
+            os.rename(temp_dir, entry_dir)
+        except OSError:
+            # Another batch with the same key saved this entry first. The two are the same.
+            logging.debug("Cache entry %s already exists. Discarding copy.", entry_dir)
+            shutil.rmtree(temp_dir)
+
+
+def _list_files(dir_: Path) -> List[RelativePath]:
+    relative_paths = []
+    for dirpath, _, filenames in os.walk(dir_, followlinks=True):
+        for filename in filenames:
+            relative_paths.append(
+                os.path.relpath(os.path.join(dirpath, filename), dir_)
+            )
+    return relative_paths
@@ -1,5 +1,5 @@
 import os
-from typing import Dict, Iterator, List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 
 from common.types import RelativePath
 
@@ -56,6 +56,10 @@ register("normalized-sources")
 register("compiled-normalized-sources")
 register("paper-images")
 register("bounding-box-accuracies")
+register("compile-cache")
+register("colorization-faults")
+register("manifests")
+register("checkpoints")
 
 
 # Helpers for converting paths with arXiv IDs to valid path names
@@ -105,6 +109,22 @@ def arxiv_subdir(dirkey: str, arxiv_id: str) -> str:
     return os.path.join(relative_path, escape_slashes(arxiv_id))
 
 
+def find_arxiv_subdir(path: str) -> Optional[Tuple[str, str, RelativePath]]:
+    """
+    Find which paper's subdirectory of a data directory a path is in. Returns the key of the data
+    directory, the arXiv ID, and the path relative to the paper's subdirectory, or 'None' if the
+    path isn't in a paper's subdirectory of a registered data directory.
+    """
+    relative_path = os.path.relpath(os.path.abspath(path), os.path.abspath(DATA_DIR))
+    parts = relative_path.split(os.sep)
+    if len(parts) < 3 or parts[0] == os.pardir:
+        return None
+    for dirkey, directory_path in _directory_paths.items():
+        if os.path.basename(directory_path) == parts[0]:
+            return dirkey, unescape_slashes(parts[1]), os.path.join(*parts[2:])
+    return None
+
+
 def iteration(dirkey: str, arxiv_id: str, iteration_name: str) -> str:
     return os.path.join(arxiv_subdir(dirkey, arxiv_id), iteration_name)
 
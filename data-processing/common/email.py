@@ -6,7 +6,7 @@ from email.header import Header
 from email.mime.text import MIMEText
 from typing import List, Optional
 
-from common.types import PipelineDigest
+from common.types import EntityProcessingDigest, PipelineDigest
 
 EMAIL_CONFIG = "config.ini"
 
@@ -41,6 +41,8 @@ def _format_digest(digest: PipelineDigest) -> str:
                 metrics_messages.append(
                     f"<b>{entity_digest.num_entities_located}</b> entity(ies) located"
                 )
+            if entity_digest.location_seconds_by_stage is not None:
+                metrics_messages.append(_format_location_timings(entity_digest))
 
             if metrics_messages:
                 message += ", ".join(metrics_messages)
@@ -57,6 +59,19 @@ def _format_digest(digest: PipelineDigest) -> str:
     return message
 
 
+def _format_location_timings(entity_digest: EntityProcessingDigest) -> str:
+    " Summarize how long entities took to locate, listing the slowest stages first. "
+    seconds_by_stage = entity_digest.location_seconds_by_stage or {}
+    stages = sorted(seconds_by_stage.items(), key=lambda item: item[1], reverse=True)
+    message = (
+        f"<b>{sum(seconds_by_stage.values()):.1f}s</b> spent locating entities in "
+        + f"{entity_digest.num_location_batches} batch(es)"
+    )
+    if stages:
+        message += " (" + ", ".join(f"{s} {t:.1f}s" for s, t in stages) + ")"
+    return message
+
+
 def send_digest_email(
     digest: PipelineDigest,
     to: List[str],
@@ -6,15 +6,32 @@ used by multiple scripts or modules.
 import ast
 import csv
 import dataclasses
+import fnmatch
+import glob
 import json
 import logging
 import os
 import re
 import shutil
+import sqlite3
+import threading
 from collections import defaultdict
-from typing import Any, Dict, Iterator, List, Optional, Type, TypeVar
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    TextIO,
+    Tuple,
+    Type,
+    TypeVar,
+)
 
-from common import directories
+from common import directories, manifest, sqlite_tables
 from common.colorize_tex import EntityId
 from common.string import JournaledString
 from common.types import (
@@ -79,6 +96,93 @@ def read_tex(arxiv_id: str) -> Dict[str, FileContents]:
 Dataclass = TypeVar("Dataclass")
 
 
+STORAGE_FORMATS = ["csv", "sqlite"]
+"""
+Formats that 'append_to_csv' can save data in. Data is saved in CSV files by default. Data can
+instead be saved to SQLite files (see 'sqlite_tables'), which are smaller and faster to read when
+files have many rows. Appending rows one at a time outside of a writer session is slower for SQLite
+files; within a session, rows are written in batches and both formats are about as fast to write. Code that reads and writes data keeps referring to
+files by their '.csv' paths; use 'get_data_path' to find where the data for a path is stored.
+"""
+
+_storage_format = "csv"
+
+
+def set_storage_format(storage_format: str) -> None:
+    """
+    Set the format in which new files will be written by 'append_to_csv'. Rows appended to files
+    that already exist are always written to the existing file. 'load_from_csv' reads files in
+    either format.
+    """
+    if storage_format not in STORAGE_FORMATS:
+        raise ValueError(f"Unknown storage format {storage_format}.")
+    global _storage_format  # pylint: disable=global-statement
+    _storage_format = storage_format
+
+
+def get_data_path(csv_path: Path) -> Path:
+    """
+    Get the path of the file that data for the CSV file at 'csv_path' is stored in. This is
+    'csv_path' itself unless the data is in an SQLite file instead. If neither file exists, this is
+    the path of the file that 'append_to_csv' would create in the current storage format.
+    """
+    if os.path.exists(csv_path):
+        return csv_path
+    sqlite_path = sqlite_tables.get_sqlite_path(csv_path)
+    if _storage_format == "sqlite" or os.path.exists(sqlite_path):
+        return sqlite_path
+    return csv_path
+
+
+def data_file_exists(csv_path: Path) -> bool:
+    " Check whether data has been saved for the CSV file at 'csv_path' in either format. "
+    return os.path.exists(csv_path) or os.path.exists(
+        sqlite_tables.get_sqlite_path(csv_path)
+    )
+
+
+def glob_data_files(directory: Path, pattern: str) -> List[Path]:
+    """
+    Find the data files in 'directory' with names that match the glob 'pattern' for CSV files
+    (e.g., 'entities*.csv'). Data files are returned by their CSV paths, whichever format they
+    are stored in. Files are listed from the paper's manifest if possible (see
+    'manifest.list_files'), and otherwise by listing the directory.
+    """
+    patterns = [pattern, sqlite_tables.get_sqlite_path(pattern)]
+    listed = manifest.list_files(directory, patterns)
+    if listed is None:
+        listed = [
+            path for p in patterns for path in glob.glob(os.path.join(directory, p))
+        ]
+    return sorted({sqlite_tables.get_csv_path(p) for p in listed})
+
+
+def delete_data_file(csv_path: Path) -> None:
+    " Delete the data saved for the CSV file at 'csv_path', in whichever format it is stored. "
+    session = _writer_session
+    if session is not None and session.pid == os.getpid():
+        session.flush(get_data_path(csv_path))
+    for path in [csv_path, sqlite_tables.get_sqlite_path(csv_path)]:
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def export_to_csv(csv_path: Path, output_path: Path) -> None:
+    """
+    Write the data saved for the CSV file at 'csv_path' to a CSV file at 'output_path', for tools
+    outside of this package that read CSV files (e.g., the equation parser, or readers of uploaded
+    results). Data that is already stored as CSV is copied.
+    """
+    path = get_data_path(csv_path)
+    session = _writer_session
+    if session is not None and session.pid == os.getpid():
+        session.flush(path)
+    if sqlite_tables.is_sqlite_path(path):
+        sqlite_tables.export_to_csv(path, output_path)
+    else:
+        shutil.copy2(path, output_path)
+
+
 def append_to_csv(csv_path: Path, data_obj: Dataclass, encoding: str = "utf-8") -> None:
     """
     Append a data object to a CSV file. This function makes the following assumptions:
@@ -100,50 +204,368 @@ def append_to_csv(csv_path: Path, data_obj: Dataclass, encoding: str = "utf-8")
             type(data_obj),
         )
 
+    try:
+        data_dict = dataclasses.asdict(data_obj)
+    except RecursionError:
+        logging.warning(  # pylint: disable=logging-not-lazy
+            "Couldn't serialize data %s due to recursion error. "
+            + "Make sure that there are no cyclic references in data. ",
+            data_obj,
+        )
+        return
+
+    # Because the CSV writer outputs null values as empty strings, all 'None's need to be
+    # replaced with a unique string indicating the value is null, so that the string can
+    # be replaced with 'None' again when the data is loaded back in.
+    try:
+        for k, v in data_dict.items():
+            if v is None:
+                data_dict[k] = "<!NULL!>"
+            if isinstance(v, JournaledString):
+                data_dict[k] = json.dumps(v.to_json())
+            # Lists are saved as JSON, which is faster to decode than Python literals.
+            if isinstance(v, list):
+                data_dict[k] = json.dumps(v)
+    except Exception as exception:  # pylint: disable=broad-except
+        logging.warning(
+            "Couldn't write row containing data %s to CSV file. Reason: %s.",
+            data_obj,
+            exception,
+        )
+        return
+
+    path = get_data_path(csv_path)
+    session = _writer_session
+    if session is not None and session.pid == os.getpid():
+        session.append(path, data_obj, data_dict, encoding)
+        return
+
+    if sqlite_tables.is_sqlite_path(path):
+        try:
+            sqlite_tables.append_rows(
+                path,
+                [{k: sqlite_tables.to_sqlite_value(v) for k, v in data_dict.items()}],
+            )
+        except sqlite3.Error as exception:
+            logging.warning(
+                "Couldn't write row containing data %s to SQLite file. Reason: %s.",
+                data_obj,
+                exception,
+            )
+        return
+
     # Check to see whether the file is empty
     try:
-        file_empty = os.stat(csv_path).st_size == 0
+        file_empty = os.stat(path).st_size == 0
     except FileNotFoundError:
         file_empty = True
 
-    with open(csv_path, "a", encoding=encoding) as csv_file:
+    with open(path, "a", encoding=encoding) as csv_file:
+        writer = csv.DictWriter(
+            # QUOTE_NONNUMERIC is used in both the writer and the reader to ensure that numbers
+            # (e.g., indexes, hues, positions) are decoded as numbers.
+            csv_file,
+            fieldnames=data_dict.keys(),
+            quoting=csv.QUOTE_MINIMAL,
+        )
+
+        # Only write the header the first time a record is added to the file
         try:
-            data_dict = dataclasses.asdict(data_obj)
-        except RecursionError:
-            logging.warning(  # pylint: disable=logging-not-lazy
-                "Couldn't serialize data %s due to recursion error. "
-                + "Make sure that there are no cyclic references in data. ",
+            if file_empty:
+                writer.writeheader()
+            writer.writerow(data_dict)
+        except Exception as exception:  # pylint: disable=broad-except
+            logging.warning(
+                "Couldn't write row containing data %s to CSV file. Reason: %s.",
                 data_obj,
+                exception,
             )
-        else:
-            # Because the CSV writer outputs null values as empty strings, all 'None's need to be
-            # replaced with a unique string indicating the value is null, so that the string can
-            # be replaced with 'None' again when the data is loaded back in.
-            for k, v in data_dict.items():
-                if v is None:
-                    data_dict[k] = "<!NULL!>"
-                if isinstance(v, JournaledString):
-                    data_dict[k] = json.dumps(v.to_json())
-            writer = csv.DictWriter(
-                # QUOTE_NONNUMERIC is used in both the writer and the reader to ensure that numbers
-                # (e.g., indexes, hues, positions) are decoded as numbers.
-                csv_file,
-                fieldnames=data_dict.keys(),
-                quoting=csv.QUOTE_MINIMAL,
-            )
 
-            # Only write the header the first time a record is added to the file
+
+@dataclass
+class _SessionFile:
+    file_id: Optional[Tuple[int, int]]
+    " Device and inode of the file, to detect when the file has been deleted or replaced. "
+
+    csv_file: Optional[TextIO] = None
+    " Open CSV file. SQLite files aren't kept open; their rows are buffered instead. "
+
+    write_header: bool = False
+    writer: Optional[csv.DictWriter] = None
+    rows: List[Dict[str, Any]] = dataclasses.field(default_factory=list)
+    " Rows that have not yet been written to an SQLite file. "
+
+
+def _get_file_id(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_dev, stat.st_ino)
+
+
+class CsvWriterSession:
+    """
+    Appends rows to files for 'append_to_csv' while a session is active (see
+    'csv_writer_session'). Rather than opening and closing a file for every row, CSV files are
+    kept open, and rows for SQLite files are written in batches. Rows are written to disk when
+    'flush' is called, and files that were deleted or replaced since they were opened are
+    reopened. Rows can be appended from any thread. Files that rows were appended to are
+    recorded in their papers' manifests (see 'manifest') when all files are flushed.
+    """
+
+    def __init__(self, max_buffered_rows: int = 1000, max_open_files: int = 64) -> None:
+        self.pid = os.getpid()
+        " Process the session belongs to. Processes forked from it write files directly. "
+
+        self.max_buffered_rows = max_buffered_rows
+        self.max_open_files = max_open_files
+        self._files: Dict[Path, _SessionFile] = {}
+        self._appends: Dict[Path, manifest.FileAppends] = {}
+        self._lock = threading.Lock()
+
+    def append(
+        self,
+        csv_path: Path,
+        data_obj: Any,
+        data_dict: Dict[str, Any],
+        encoding: str = "utf-8",
+    ) -> None:
+        with self._lock:
             try:
-                if file_empty:
-                    writer.writeheader()
-                writer.writerow(data_dict)
-            except Exception as exception:  # pylint: disable=broad-except
+                file_ = self._open(csv_path, encoding)
+                if file_.csv_file is None:
+                    file_.rows.append(
+                        {
+                            k: sqlite_tables.to_sqlite_value(v)
+                            for k, v in data_dict.items()
+                        }
+                    )
+                    self._appends[csv_path].rows += 1
+                    if len(file_.rows) >= self.max_buffered_rows:
+                        self._write_rows(csv_path, file_)
+                    return
+
+                if file_.writer is None:
+                    file_.writer = csv.DictWriter(
+                        file_.csv_file,
+                        fieldnames=data_dict.keys(),
+                        quoting=csv.QUOTE_MINIMAL,
+                    )
+                    if file_.write_header:
+                        file_.writer.writeheader()
+                file_.writer.writerow(data_dict)
+                self._appends[csv_path].rows += 1
+            except (OSError, csv.Error, sqlite3.Error, ValueError) as exception:
                 logging.warning(
-                    "Couldn't write row containing data %s to CSV file. Reason: %s.",
+                    "Couldn't write row containing data %s to file %s. Reason: %s.",
                     data_obj,
+                    csv_path,
                     exception,
                 )
 
+    def _open(self, csv_path: Path, encoding: str) -> _SessionFile:
+        file_ = self._files.get(csv_path)
+        if file_ is not None:
+            if file_.file_id == _get_file_id(csv_path):
+                return file_
+            # The file was deleted or replaced, so its buffered rows have nowhere to go.
+            if file_.csv_file is not None:
+                file_.csv_file.close()
+            del self._files[csv_path]
+            del self._appends[csv_path]
+
+        # Close the file that was opened first to avoid running out of file descriptors.
+        if len(self._files) >= self.max_open_files:
+            self._close(next(iter(self._files)))
+
+        if csv_path not in self._appends:
+            self._appends[csv_path] = manifest.FileAppends(
+                manifest.get_file_stat(csv_path)
+            )
+
+        if sqlite_tables.is_sqlite_path(csv_path):
+            file_ = _SessionFile(_get_file_id(csv_path))
+        else:
+            try:
+                write_header = os.stat(csv_path).st_size == 0
+            except FileNotFoundError:
+                write_header = True
+            csv_file = open(  # pylint: disable=consider-using-with
+                csv_path, "a", encoding=encoding
+            )
+            file_ = _SessionFile(_get_file_id(csv_path), csv_file, write_header)
+        self._files[csv_path] = file_
+        return file_
+
+    def _write_rows(self, path: Path, file_: _SessionFile) -> None:
+        rows = file_.rows
+        file_.rows = []
+        sqlite_tables.append_rows(path, rows)
+        file_.file_id = _get_file_id(path)
+
+    def _close(self, csv_path: Path) -> None:
+        file_ = self._files.pop(csv_path, None)
+        if file_ is None:
+            return
+        try:
+            if file_.csv_file is not None:
+                file_.csv_file.close()
+            elif file_.rows and file_.file_id == _get_file_id(csv_path):
+                self._write_rows(csv_path, file_)
+        except (OSError, sqlite3.Error) as exception:
+            logging.warning(
+                "Couldn't write rows to file %s. Reason: %s.", csv_path, exception
+            )
+
+    def flush(self, csv_path: Optional[Path] = None) -> None:
+        """
+        Write all rows appended so far to disk, and close the files that were open. If 'csv_path'
+        is provided, only write the rows for that file.
+        """
+        with self._lock:
+            paths = [csv_path] if csv_path is not None else list(self._files.keys())
+            for path in paths:
+                self._close(path)
+            if csv_path is None:
+                appends = self._appends
+                self._appends = {}
+                manifest.record_appends(appends)
+
+
+_writer_session: Optional[CsvWriterSession] = None
+
+
+@contextmanager
+def csv_writer_session() -> Iterator[CsvWriterSession]:
+    """
+    Keep files written to with 'append_to_csv' open until the end of this context, when all rows
+    are written to disk, even if an exception was raised. If a session is already active, it is
+    used instead of starting a new one. Files read with 'load_from_csv' are written to disk
+    before they are read, so that all appended rows are loaded.
+    """
+    global _writer_session  # pylint: disable=global-statement
+    if _writer_session is not None and _writer_session.pid == os.getpid():
+        yield _writer_session
+        return
+
+    session = CsvWriterSession()
+    _writer_session = session
+    try:
+        yield session
+    finally:
+        _writer_session = None
+        session.flush()
+
+
+@dataclass(frozen=True)
+class _FieldDecoder:
+    name: str
+    type_: Any
+    optional: bool
+    " Whether the field is optional, and can be saved as the special null value. "
+
+    decode: Optional[Callable[[Any], Any]]
+    " Function that casts a value read from a file to the field's type, if the type is supported. "
+
+
+def _decode_bool(value: Any) -> bool:
+    # Support casting of '0' and '1' or the strings 'True' and 'False'. 'True' and 'False' are the
+    # default output of CSV writer.
+    if value == "True":
+        return True
+    if value == "False":
+        return False
+    return bool(ast.literal_eval(value))
+
+
+def _decode_list(value: str) -> List[Any]:
+    # Lists are saved as JSON. Files written before that have lists as Python literals.
+    try:
+        return json.loads(value)  # type: ignore
+    except json.JSONDecodeError:
+        return ast.literal_eval(value)  # type: ignore
+
+
+def _decode_float_list(value: str) -> List[float]:
+    return [float(_) for _ in _decode_list(value)]
+
+
+def _decode_journaled_string(value: str) -> JournaledString:
+    return JournaledString.from_json(json.loads(value))
+
+
+def _make_field_decoder(field: "dataclasses.Field[Any]") -> _FieldDecoder:
+    type_ = field.type
+    is_optional = False
+
+    # If the field is optional, determine which primitive type the value should be cast to when
+    # it isn't the special null value. See note for List[str] for cautions about using dynamic
+    # type-checks like this for mypy types like Optional types.
+    if type_ in [
+        Optional[bool],
+        Optional[int],
+        Optional[float],
+        Optional[str],
+    ]:
+        is_optional = True
+        type_ = (
+            bool  # type: ignore
+            if type_ == Optional[bool]
+            else int
+            if type_ == Optional[int]
+            else float
+            if type_ == Optional[float]
+            else str
+            if type_ == Optional[str]
+            else Type[Any]
+        )
+
+    decode: Optional[Callable[[Any], Any]] = None
+    # Journaled strings should be loaded from JSON.
+    if type_ == JournaledString:
+        decode = _decode_journaled_string
+    elif type_ == bool:
+        decode = _decode_bool
+    # Handle other primitive values.
+    elif type_ in [int, float, str]:
+        decode = type_
+    # XXX(andrewhead): It's not guaranteed that type-checks like the following will work
+    # as the 'typing' library evolves.
+    # 1. Lists: At the time of writing, it looked like calls
+    # to the '__eq__' method of classes that extend GenericMeta (like List, Tuple)
+    # should work (i.e., comparing a type with '=='). See:
+    # https://github.com/python/typing/blob/c85016137eab6d0784b76252460235638087f468/src/typing.py#L1093-L1098
+    # See also this test for equality in the Tuple class.
+    # https://github.com/python/typing/blob/c85016137eab6d0784b76252460235638087f468/src/test_typing.py#L400
+    # If at some point this comparison stops working, perhaps we can define a custom
+    # type for types of interest (like StrList) and compare the ID of the newly defined type.
+    elif field.type == List[str]:
+        decode = _decode_list
+    elif field.type == List[float]:
+        decode = _decode_float_list
+    # 2. String literals. This check is based on the '__repr__' string representation of
+    # the literal, and checks that all options for the literal are strings. Based
+    # on the unit tests for the Literal type at:
+    # https://github.com/python/typing/blob/a522554e2551b2d1ad46d287b428b2e3856d4c70/python2/test_typing.py#L1952-L1953
+    elif re.match(r".*Literal\[('[^']*')(, '[^']*')*\]", repr(type_)):
+        decode = str
+
+    return _FieldDecoder(field.name, field.type, is_optional, decode)
+
+
+_field_decoders: Dict[Type[Any], List[_FieldDecoder]] = {}
+
+
+def _get_field_decoders(D: Type[Any]) -> List[_FieldDecoder]:
+    """
+    Get decoders for each of the fields of dataclass 'D'. Decoders are only made once for each
+    dataclass, rather than inspecting the types of fields for every row that is loaded.
+    """
+    if D not in _field_decoders:
+        _field_decoders[D] = [_make_field_decoder(f) for f in dataclasses.fields(D)]
+    return _field_decoders[D]
+
 
 def load_from_csv(
     csv_path: Path, D: Type[Dataclass], encoding: str = "utf-8",
@@ -153,8 +575,60 @@ def load_from_csv(
     This method assumes that the CSV file was written by 'append_to_csv'. Key to this assumption is
     that each row of the CSV file has all of the data needed to populate an object of type 'D'. The
     headers in the CSV file must exactly match the property names of 'D'. There can, however,
-    be extra columns in the CSV file that don't correspond to the dataclass.
+    be extra columns in the CSV file that don't correspond to the dataclass. If the data was saved
+    to an SQLite file instead (see 'set_storage_format'), rows are loaded from that file.
     """
+    path = get_data_path(csv_path)
+    session = _writer_session
+    if session is not None and session.pid == os.getpid():
+        session.flush(path)
+
+    rows: Iterator[Dict[str, Any]]
+    if sqlite_tables.is_sqlite_path(path):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No data saved for {csv_path}.")
+        rows = sqlite_tables.read_rows(path)
+    else:
+        rows = _read_csv_rows(path, encoding)
+    decoders = _get_field_decoders(D)
+    for row in rows:
+        data: Dict[str, Any] = {}
+        # Transfer data from the row into a dictionary of arguments. By only including the
+        # fields for D, we skip over columns that can't be used to initialize D. At the
+        # same time, cast each column to the intended data type.
+        invalid = False
+        for decoder in decoders:
+            value = row[decoder.name]
+            try:
+                if decoder.optional and value == "<!NULL!>":
+                    data[decoder.name] = None
+                elif decoder.decode is not None:
+                    data[decoder.name] = decoder.decode(value)
+                else:
+                    logging.warning(  # pylint: disable=logging-not-lazy
+                        "Could not decode data for field %s of type %s . "
+                        + "This may mean that the rules for reading CSV files need to "
+                        + "be extended to support this data type.",
+                        decoder.name,
+                        decoder.type_,
+                    )
+            except ValueError as e:
+                logging.warning(  # pylint: disable=logging-not-lazy
+                    "Could not read value '%s' for field '%s' of expected type %s from CSV. "
+                    + "Error: %s. This row will be skipped. This value probably had an "
+                    + "invalid type when the data for the row was created.",
+                    value,
+                    decoder.name,
+                    decoder.type_,
+                    e,
+                )
+                invalid = True
+
+        if not invalid:
+            yield D(**data)  # type: ignore
+
+
+def _read_csv_rows(csv_path: Path, encoding: str) -> Iterator[Dict[str, str]]:
     with open(csv_path, encoding=encoding, newline="") as csv_file:
         reader = csv.DictReader(csv_file, quoting=csv.QUOTE_MINIMAL)
 
@@ -176,105 +650,21 @@ def load_from_csv(
             except StopIteration:
                 break
 
-            data: Dict[str, Any] = {}
-            # Transfer data from the row into a dictionary of arguments. By only including the
-            # fields for D, we skip over columns that can't be used to initialize D. At the
-            # same time, cast each column to the intended data type.
-            invalid = False
-            for field in dataclasses.fields(D):
-
-                try:
-                    type_ = field.type
-                    is_optional = False
-
-                    # If the field is optional, check for the special null value. If it's not
-                    # present, determine which primitive type the value should be cast to. See
-                    # note for List[str] for cautions about using dynamic type-checks like this
-                    # for mypy types like Optional types.
-                    if type_ in [
-                        Optional[bool],
-                        Optional[int],
-                        Optional[float],
-                        Optional[str],
-                    ]:
-                        is_optional = True
-                        type_ = (
-                            bool  # type: ignore
-                            if type_ == Optional[bool]
-                            else int
-                            if type_ == Optional[int]
-                            else float
-                            if type_ == Optional[float]
-                            else str
-                            if type_ == Optional[str]
-                            else Type[Any]
-                        )
-                    if is_optional and row[field.name] == "<!NULL!>":
-                        data[field.name] = None
-
-                    # Journaled strings should be loaded from JSON.
-                    elif type_ == JournaledString:
-                        data[field.name] = JournaledString.from_json(
-                            json.loads(row[field.name])
-                        )
-                    # Rules for reading Booleans. Support casting of '0' and '1' or the strings
-                    # 'True' and 'False'. 'True' and 'False' are the default output of CSV writer.
-                    elif type_ == bool:
-                        data[field.name] = bool(ast.literal_eval(row[field.name]))
-                    # Handle other primitive values.
-                    elif type_ in [int, float, str]:
-                        data[field.name] = type_(row[field.name])
-                    # XXX(andrewhead): It's not guaranteed that type-checks like the following will work
-                    # as the 'typing' library evolves.
-                    # 1. Lists: At the time of writing, it looked like calls
-                    # to the '__eq__' method of classes that extend GenericMeta (like List, Tuple)
-                    # should work (i.e., comparing a type with '=='). See:
-                    # https://github.com/python/typing/blob/c85016137eab6d0784b76252460235638087f468/src/typing.py#L1093-L1098
-                    # See also this test for equality in the Tuple class.
-                    # https://github.com/python/typing/blob/c85016137eab6d0784b76252460235638087f468/src/test_typing.py#L400
-                    # If at some point this comparison stops working, perhaps we can define a custom
-                    # type for types of interest (like StrList) and compare the ID of the newly defined type.
-                    elif field.type == List[str]:
-                        data[field.name] = ast.literal_eval(row[field.name])
-                    elif field.type == List[float]:
-                        data[field.name] = [
-                            float(_) for _ in ast.literal_eval(row[field.name])
-                        ]
-                    # 2. String literals. This check is based on the '__repr__' string representation of
-                    # the literal, and checks that all options for the literal are strings. Based
-                    # on the unit tests for the Literal type at:
-                    # https://github.com/python/typing/blob/a522554e2551b2d1ad46d287b428b2e3856d4c70/python2/test_typing.py#L1952-L1953
-                    elif re.match(r".*Literal\[('[^']*')(, '[^']*')*\]", repr(type_)):
-                        data[field.name] = str(row[field.name])
-                    else:
-                        logging.warning(  # pylint: disable=logging-not-lazy
-                            "Could not decode data for field %s of type %s . "
-                            + "This may mean that the rules for reading CSV files need to "
-                            + "be extended to support this data type.",
-                            field.name,
-                            field.type,
-                        )
-                except (ValueError, json.JSONDecodeError) as e:
-                    logging.warning(  # pylint: disable=logging-not-lazy
-                        "Could not read value '%s' for field '%s' of expected type %s from CSV. "
-                        + "Error: %s. This row will be skipped. This value probably had an "
-                        + "invalid type when the data for the row was created.",
-                        row[field.name],
-                        field.name,
-                        field.type,
-                        e,
-                    )
-                    invalid = True
-
-            if not invalid:
-                yield D(**data)  # type: ignore
+            yield row
 
 
-def clean_directory(directory: str) -> None:
-    " Remove all files and subdirectories from a directory; leave the directory. "
+def clean_directory(directory: str, keep_patterns: Optional[List[str]] = None) -> None:
+    """
+    Remove all files and subdirectories from a directory; leave the directory. If 'keep_patterns'
+    is given, files with paths (relative to 'directory') that match any of the glob patterns are
+    kept, along with the subdirectories that contain them.
+    """
     if not os.path.exists(directory):
         return
     logging.debug("Cleaning directory %s", directory)
+    if keep_patterns is not None:
+        _clean_directory_keeping(directory, keep_patterns)
+        return
     for filename in os.listdir(directory):
         path = os.path.join(directory, filename)
         try:
@@ -288,6 +678,27 @@ def clean_directory(directory: str) -> None:
             )
 
 
+def _clean_directory_keeping(directory: str, keep_patterns: List[str]) -> None:
+    for dirpath, dirnames, filenames in os.walk(directory, topdown=False):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            relative_path = os.path.relpath(path, directory)
+            if any(fnmatch.fnmatch(relative_path, p) for p in keep_patterns):
+                continue
+            try:
+                os.unlink(path)
+            except OSError as e:
+                logging.warning(
+                    "Could not remove path %s from directory %s: %s", path, directory, e
+                )
+        for dirname in dirnames:
+            path = os.path.join(dirpath, dirname)
+            if os.path.islink(path):
+                os.unlink(path)
+            elif not os.listdir(path):
+                os.rmdir(path)
+
+
 def delete_data(arxiv_id: ArxivId) -> None:
     """
     Remove all data produced in the data directories when processing an arXiv ID. Note that this
@@ -313,6 +724,18 @@ def delete_data(arxiv_id: ArxivId) -> None:
                 )
 
 
+def get_disk_usage(path: Path) -> int:
+    " Get the number of bytes taken up by the files in a directory. "
+    usage = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                usage += os.lstat(os.path.join(dirpath, filename)).st_size
+            except FileNotFoundError:
+                pass
+    return usage
+
+
 def find_files(
     dir_: str, extensions: List[str], relative: bool = False
 ) -> Iterator[str]:
@@ -331,7 +754,7 @@ def load_equations(arxiv_id: ArxivId) -> Optional[Dict[EquationId, Equation]]:
     equations_path = os.path.join(
         directories.arxiv_subdir("detected-equations", arxiv_id), "entities.csv"
     )
-    if not os.path.exists(equations_path):
+    if not data_file_exists(equations_path):
         logging.warning("No equation data found for paper %s. Skipping.", arxiv_id)
         return None
 
@@ -346,7 +769,7 @@ def load_tokens(arxiv_id: ArxivId) -> Optional[List[SerializableToken]]:
     tokens_path = os.path.join(
         directories.arxiv_subdir("detected-equation-tokens", arxiv_id), "entities.csv"
     )
-    if not os.path.exists(tokens_path):
+    if not data_file_exists(tokens_path):
         logging.warning(
             "No equation token data found for paper %s. Skipping.", arxiv_id
         )
@@ -366,16 +789,16 @@ def load_symbols(arxiv_id: ArxivId) -> Optional[List[SymbolWithId]]:
     symbol_children_path = os.path.join(symbols_dir, "symbol_children.csv")
 
     file_not_found = False
-    if not os.path.exists(tokens_path):
+    if not data_file_exists(tokens_path):
         logging.info("Tokens data missing for paper %s. Skipping.", arxiv_id)
         file_not_found = True
-    if not os.path.exists(symbols_path):
+    if not data_file_exists(symbols_path):
         logging.info("Symbols data missing for paper %s. Skipping.", arxiv_id)
         file_not_found = True
-    if not os.path.exists(symbol_tokens_path):
+    if not data_file_exists(symbol_tokens_path):
         logging.info("Symbol tokens data missing for paper %s. Skipping.", arxiv_id)
         file_not_found = True
-    if not os.path.exists(symbol_children_path):
+    if not data_file_exists(symbol_children_path):
         logging.info("No symbol children data found for paper %s.", arxiv_id)
         file_not_found = True
 
@@ -503,7 +926,7 @@ def load_locations(
         directories.arxiv_subdir(f"{entity_name}-locations", arxiv_id),
         "entity_locations.csv",
     )
-    if not os.path.exists(bounding_boxes_path):
+    if not data_file_exists(bounding_boxes_path):
         logging.warning(
             "Could not find bounding boxes information for entity of type %s for paper %s. Skipping.",
             entity_name,
@@ -539,7 +962,7 @@ def load_equation_token_locations(
         directories.arxiv_subdir("equation-tokens-locations", arxiv_id),
         "entity_locations.csv",
     )
-    if not os.path.exists(token_locations_path):
+    if not data_file_exists(token_locations_path):
         logging.warning(
             "Could not find bounding boxes information for %s. Skipping", arxiv_id,
         )
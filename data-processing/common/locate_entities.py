@@ -1,15 +1,21 @@
 import logging
+import math
 import os.path
+from bisect import bisect_left, bisect_right
 from collections import defaultdict
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Set
+from typing import Dict, List, Optional, Sequence, Set, Tuple
 
 import cv2
 import numpy as np
 
 from common import directories
-from common.bounding_box import extract_bounding_boxes
+from common.bounding_box import HueIndex, extract_bounding_boxes
+from common.colorize_tex import PALETTES, Palette
 from common.compile import get_output_files
+from common.diff_images import diff_images
+from common.page_images import PageImages, save_page_images
+from common.timing import StageTimer
 from common.types import ArxivId, BoundingBox, RelativePath
 
 
@@ -25,7 +31,11 @@ def locate_entities(
     modified_images_dir: RelativePath,
     diffed_images_dir: RelativePath,
     entity_hues: Dict[str, float],
+    entity_values: Optional[Dict[str, float]] = None,
+    palette: Palette = PALETTES["default"],
+    timer: Optional[StageTimer] = None,
 ) -> Optional[LocationResult]:
+    timer = timer or StageTimer()
 
     # Get output file names from results of compiling the uncolorized TeX sources.
     output_files = get_output_files(
@@ -41,7 +51,7 @@ def locate_entities(
         diffed_images_file_path = os.path.join(diffed_images_dir, relative_file_path)
 
         # Locate bounding boxes for each hue in the diffs.
-        diff_images = {}
+        diffed_page_images = {}
         if not os.path.exists(diffed_images_file_path):
             logging.warning(  # pylint: disable=logging-not-lazy
                 "Expected but could not find a directory %s from the image diffs. "
@@ -53,26 +63,160 @@ def locate_entities(
 
         for img_name in os.listdir(diffed_images_file_path):
             img_path = os.path.join(diffed_images_file_path, img_name)
-            page_image = cv2.imread(img_path)
+            with timer.time("diff", pages=1):
+                page_image = cv2.imread(img_path)
 
-            if contains_black_pixels(page_image):
-                logging.warning("Black pixels found in image diff %s", img_path)
-                black_pixels_found = True
+                if contains_black_pixels(page_image):
+                    logging.warning("Black pixels found in image diff %s", img_path)
+                    black_pixels_found = True
 
             page_number = int(os.path.splitext(img_name)[0].replace("page-", "")) - 1
-            diff_images[page_number] = page_image
+            diffed_page_images[page_number] = page_image
+
+        with timer.time("extract_boxes", pages=len(diffed_page_images)):
+            hue_indexes = {
+                page_number: HueIndex.for_saturated_pixels(image)
+                for page_number, image in diffed_page_images.items()
+            }
+            for entity_id, hue in entity_hues.items():
+                for page_number, image in diffed_page_images.items():
+                    boxes = extract_bounding_boxes(
+                        image,
+                        page_number,
+                        hue,
+                        hue_index=hue_indexes[page_number],
+                        tolerance=palette.hue_tolerance,
+                        value_range=_get_value_range(entity_id, entity_values, palette),
+                    )
+                    for box in boxes:
+                        entity_locations[entity_id].append(box)
+
+        with timer.time("check_shifts", pages=len(diffed_page_images)):
+            shifted_entity_ids.update(
+                find_shifted_entities(
+                    arxiv_id,
+                    modified_images_dir,
+                    relative_file_path,
+                    entity_hues,
+                    palette.shift_tolerance,
+                    entity_values,
+                    palette,
+                )
+            )
 
-        for entity_id, hue in entity_hues.items():
-            for page_number, image in diff_images.items():
-                boxes = extract_bounding_boxes(image, page_number, hue)
-                for box in boxes:
-                    entity_locations[entity_id].append(box)
-
-        shifted_entity_ids.update(
-            find_shifted_entities(
-                arxiv_id, modified_images_dir, relative_file_path, entity_hues
+    return LocationResult(
+        locations=entity_locations,
+        shifted_entities=list(shifted_entity_ids),
+        black_pixels_found=black_pixels_found,
+    )
+
+
+def locate_entities_in_images(
+    original_images: Dict[RelativePath, PageImages],
+    modified_images: Dict[RelativePath, PageImages],
+    entity_hues: Dict[str, float],
+    diffed_images_dir: Optional[RelativePath] = None,
+    entity_values: Optional[Dict[str, float]] = None,
+    palette: Palette = PALETTES["default"],
+    pages: Optional[Tuple[int, int]] = None,
+    timer: Optional[StageTimer] = None,
+) -> Optional[LocationResult]:
+    """
+    Locate entities by comparing rasters of the original paper to rasters of the colorized paper
+    that are already held in memory. This does the same work as 'diff_images_in_raster_dirs',
+    'locate_entities', and 'find_shifted_entities', without reading or writing images to disk.
+    Both maps of images are keyed by the path of the compiled output file the pages come from.
+    If 'diffed_images_dir' is set, image diffs are also saved to that directory for debugging.
+    'entity_values' and 'palette' describe the colors entities were colored with (see
+    'colorize_entities'). If 'pages' is set to the first and last page (numbered from 0) to
+    compare, pages outside of that range are ignored (see 'predict_pages'). If a 'timer' is
+    provided, the time spent differencing pages, extracting boxes, and checking for shifted
+    entities is added to it.
+    """
+    timer = timer or StageTimer()
+
+    for relative_file_path in modified_images:
+        if relative_file_path not in original_images:
+            logging.warning(  # pylint: disable=logging-not-lazy
+                "Could not find images from the compiled original sources for output file %s. "
+                + "The colorized sources may have produced a different main output file than "
+                + "the original sources. Hues will not be searched for in this output file.",
+                relative_file_path,
             )
-        )
+            return None
+
+    black_pixels_found = False
+    shifted_entity_ids: Set[str] = set()
+    entity_locations: Dict[str, List[BoundingBox]] = defaultdict(list)
+
+    for relative_file_path, original_pages in original_images.items():
+        modified_pages = modified_images.get(relative_file_path)
+        if modified_pages is None:
+            logging.warning(  # pylint: disable=logging-not-lazy
+                "Expected but could not find rasters of output file %s from the colorized "
+                + "sources. This suggests that the colorized paper failed to compile. Hues "
+                + "will not be searched for in this output file.",
+                relative_file_path,
+            )
+            return None
+
+        for page_number, original in original_pages.items():
+            if pages is not None and not pages[0] <= page_number <= pages[1]:
+                continue
+            modified = modified_pages.get(page_number)
+            if modified is None or modified.shape != original.shape:
+                logging.warning(
+                    "Could not find a raster of page %d of %s with the same dimensions as the "
+                    + "original. Skipping diff for this paper.",
+                    page_number + 1,
+                    relative_file_path,
+                )
+                return None
+
+            # Colorized images is the first parameter: this means that original_images will be
+            # subtracted from colorized_images where the two are the same.
+            with timer.time("diff", pages=1):
+                diff = diff_images(modified, original)
+                if diffed_images_dir is not None:
+                    save_page_images(
+                        {page_number: diff},
+                        os.path.join(diffed_images_dir, relative_file_path),
+                    )
+
+                if contains_black_pixels(diff):
+                    logging.warning(
+                        "Black pixels found in image diff of page %d of %s",
+                        page_number + 1,
+                        relative_file_path,
+                    )
+                    black_pixels_found = True
+
+            # Index the page once, rather than once for each hue.
+            with timer.time("extract_boxes", pages=1):
+                hue_index = HueIndex.for_saturated_pixels(diff)
+                for entity_id, hue in entity_hues.items():
+                    boxes = extract_bounding_boxes(
+                        diff,
+                        page_number,
+                        hue,
+                        hue_index=hue_index,
+                        tolerance=palette.hue_tolerance,
+                        value_range=_get_value_range(entity_id, entity_values, palette),
+                    )
+                    entity_locations[entity_id].extend(boxes)
+
+            with timer.time("check_shifts", pages=1):
+                shift_index = index_fill_changes(original, modified)
+                for entity_id, hue in entity_hues.items():
+                    if has_hue_shifted(
+                        original,
+                        modified,
+                        hue,
+                        tolerance=palette.shift_tolerance,
+                        shift_index=shift_index,
+                        value_range=_get_value_range(entity_id, entity_values, palette),
+                    ):
+                        shifted_entity_ids.add(entity_id)
 
     return LocationResult(
         locations=entity_locations,
@@ -81,6 +225,67 @@ def locate_entities(
     )
 
 
+LocatedPages = Sequence[Tuple[int, int, int]]
+"""
+Pages where entities were found, as tuples of (1) the character offset of the entity in the TeX,
+(2) the first page, and (3) the last page the entity was found on. Sorted by character offset.
+"""
+
+
+def predict_pages(
+    located_pages: LocatedPages,
+    entity_starts: Sequence[int],
+    num_pages: int,
+    margin: int = 1,
+) -> Optional[Tuple[int, int]]:
+    """
+    Predict the range of pages (numbered from 0) that will contain a batch of entities that start
+    at character offsets 'entity_starts' in the TeX, based on the pages where entities from
+    earlier batches were found. The range extends from the page of the closest located entity
+    that appears before the batch to the page of the closest one that appears after it. If no
+    located entity appears after the batch, the end of the range is extrapolated from the
+    average number of pages per character of TeX. The range is padded by 'margin' pages on each
+    side. If entities are found on the padding pages, the prediction was likely wrong. Returns
+    'None' if there is not enough information to make a prediction.
+    """
+    if len(located_pages) == 0 or len(entity_starts) == 0 or min(entity_starts) < 0:
+        return None
+
+    offsets = [offset for offset, _, _ in located_pages]
+    before = bisect_right(offsets, min(entity_starts)) - 1
+    after = bisect_left(offsets, max(entity_starts))
+    if before < 0:
+        return None
+
+    first_page = located_pages[before][1]
+    if after < len(located_pages):
+        last_page = located_pages[after][2]
+    else:
+        first_offset, first_located_page, _ = located_pages[0]
+        last_offset, _, last_located_page = located_pages[-1]
+        pages_per_character = 0.0
+        if last_offset > first_offset:
+            pages_per_character = (last_located_page - first_located_page) / (
+                last_offset - first_offset
+            )
+        last_page = located_pages[before][2] + math.ceil(
+            pages_per_character * (max(entity_starts) - located_pages[before][0])
+        )
+
+    return (
+        max(0, first_page - margin),
+        min(num_pages - 1, max(first_page, last_page) + margin),
+    )
+
+
+def _get_value_range(
+    entity_id: str, entity_values: Optional[Dict[str, float]], palette: Palette
+) -> Optional[Tuple[float, float]]:
+    if entity_values is None or entity_id not in entity_values:
+        return None
+    return palette.value_range(entity_values[entity_id])
+
+
 def contains_black_pixels(img: np.ndarray) -> bool:
 
     # Black pixels will have value and saturation near 0. Still consider pixels with
@@ -105,6 +310,9 @@ def find_shifted_entities(
     modified_images_base_dir: RelativePath,
     output_path: RelativePath,
     entity_hues: Dict[str, float],
+    tolerance: float = 0.02,
+    entity_values: Optional[Dict[str, float]] = None,
+    palette: Palette = PALETTES["default"],
 ) -> List[str]:
     original_images_dir = os.path.join(
         directories.arxiv_subdir("paper-images", arxiv_id), output_path
@@ -140,24 +348,51 @@ def find_shifted_entities(
         original = cv2.imread(original_img_path)
         modified = cv2.imread(modified_img_path)
 
+        shift_index = index_fill_changes(original, modified)
         for entity_id, hue in entity_hues.items():
-            if has_hue_shifted(original, modified, hue):
+            if has_hue_shifted(
+                original,
+                modified,
+                hue,
+                tolerance=tolerance,
+                shift_index=shift_index,
+                value_range=_get_value_range(entity_id, entity_values, palette),
+            ):
                 shifted_entity_ids.add(entity_id)
 
     return list(shifted_entity_ids)
 
 
 def has_hue_shifted(
-    before: np.ndarray, after: np.ndarray, hue: float, tolerance: float = 0.02
+    before: np.ndarray,
+    after: np.ndarray,
+    hue: float,
+    tolerance: float = 0.02,
+    shift_index: Optional[HueIndex] = None,
+    value_range: Optional[Tuple[float, float]] = None,
 ) -> bool:
     """
     Detect whether pixels of a specified 'hue' have shifted away from where pixels were in a
     baseline image. Used to detect whether rasters of pages with colorized images had
     contain accidental layout changes. See 'extract_bounding_boxes' for a description of the 'hue'
-    and 'tolerance' arguments.
+    and 'tolerance' arguments. When checking many hues for the same pair of images, pass in a
+    'shift_index' built with 'index_fill_changes', so that the images are only compared once.
+    If entities were colored with colors of the same hue but different brightness, pass the
+    'value_range' of the entity's color (see 'find_boxes_with_color'), so that only pixels
+    of the entity's brightness are considered.
     """
+    if shift_index is None:
+        shift_index = index_fill_changes(before, after)
 
-    CV2_MAXIMUM_HUE = 180
+    # Determine whether the hue at any of the locations where the fill changed matches the hue.
+    return shift_index.contains_hue(hue, tolerance, value_range)
+
+
+def index_fill_changes(before: np.ndarray, after: np.ndarray) -> HueIndex:
+    """
+    Index the hues and values in 'after' of all pixels that went from blank to filled (or from
+    filled to blank) between 'before' and 'after'. See 'has_hue_shifted'.
+    """
 
     # A pixel with a value above 230 and a saturation below 10 is considered blank.
     VALUE_THRESHOLD = 230  # out of 255
@@ -179,13 +414,5 @@ def has_hue_shifted(
     )
     fill_changes = np.logical_xor(blank_before, blank_after)
 
-    # Compute hues at all location where saturation changed.
-    HUE_CHANNEL = 0
-    after_hues = after_hsv[:, :, HUE_CHANNEL]
-
-    # Determine whether the hue at any of the locations matches the input hue.
-    cv2_hue = hue * CV2_MAXIMUM_HUE
-    cv2_tolerance = tolerance * CV2_MAXIMUM_HUE
-    distance_to_hue = np.abs(after_hues.astype(np.int16) - cv2_hue)
-    abs_distance_to_hue = np.minimum(distance_to_hue, CV2_MAXIMUM_HUE - distance_to_hue)
-    return bool(np.any((abs_distance_to_hue <= cv2_tolerance) & fill_changes))
+    # Index the hues in 'after' at all locations where the fill changed.
+    return HueIndex(after_hsv, fill_changes)
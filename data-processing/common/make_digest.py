@@ -1,13 +1,14 @@
 import os
-from typing import Iterable, Optional
+from typing import Dict, Iterable, Optional, Tuple
 
-from common import directories, file_utils
+from common import directories, file_utils, manifest
 from common.types import (
     ArxivId,
     EntityLocationInfo,
     EntityProcessingDigest,
     PaperProcessingDigest,
     SerializableEntity,
+    StageTiming,
 )
 from scripts.pipelines import EntityPipeline
 
@@ -55,8 +56,15 @@ def make_default_paper_digest(
     hue_locations_dirkey = f"{entity_name}-locations"
     num_hues_located = count_hues_located(arxiv_id, hue_locations_dirkey)
 
+    num_location_batches, location_seconds_by_stage = sum_location_timings(
+        arxiv_id, hue_locations_dirkey
+    )
+
     return EntityProcessingDigest(
-        num_extracted=num_entities_detected, num_hues_located=num_hues_located
+        num_extracted=num_entities_detected,
+        num_hues_located=num_hues_located,
+        num_location_batches=num_location_batches,
+        location_seconds_by_stage=location_seconds_by_stage,
     )
 
 
@@ -72,12 +80,17 @@ def count_detected_entities(
             directories.arxiv_subdir(detected_entities_dirkey, arxiv_id),
             entities_filename,
         )
-        if os.path.exists(detected_entities_path):
-            num_entities_detected = len(
-                list(
-                    file_utils.load_from_csv(detected_entities_path, SerializableEntity)
+        if file_utils.data_file_exists(detected_entities_path):
+            # Read the count from the paper's manifest if possible to avoid parsing the file.
+            num_entities_detected = manifest.count_rows(detected_entities_path)
+            if num_entities_detected is None:
+                num_entities_detected = len(
+                    list(
+                        file_utils.load_from_csv(
+                            detected_entities_path, SerializableEntity
+                        )
+                    )
                 )
-            )
 
     return num_entities_detected
 
@@ -94,9 +107,40 @@ def count_hues_located(
             directories.arxiv_subdir(hue_locations_dirkey, arxiv_id),
             hue_locations_filename,
         )
-        if os.path.exists(hue_locations_path):
-            num_hues_located = len(
-                list(file_utils.load_from_csv(hue_locations_path, EntityLocationInfo))
-            )
+        if file_utils.data_file_exists(hue_locations_path):
+            num_hues_located = manifest.count_rows(hue_locations_path)
+            if num_hues_located is None:
+                num_hues_located = len(
+                    list(
+                        file_utils.load_from_csv(hue_locations_path, EntityLocationInfo)
+                    )
+                )
 
     return num_hues_located
+
+
+def sum_location_timings(
+    arxiv_id: ArxivId, hue_locations_dirkey: str, timings_filename: str = "timings.csv",
+) -> Tuple[Optional[int], Optional[Dict[str, float]]]:
+    """
+    Count the batches that were processed to locate entities, and add up the time spent in each
+    stage of processing them. Returns a tuple of 'None's if no timings were saved.
+    """
+
+    if not directories.registered(hue_locations_dirkey):
+        return None, None
+    timings_path = os.path.join(
+        directories.arxiv_subdir(hue_locations_dirkey, arxiv_id), timings_filename
+    )
+    if not file_utils.data_file_exists(timings_path):
+        return None, None
+
+    iterations = set()
+    seconds_by_stage: Dict[str, float] = {}
+    for timing in file_utils.load_from_csv(timings_path, StageTiming):
+        iterations.add(timing.iteration)
+        seconds_by_stage[timing.stage] = (
+            seconds_by_stage.get(timing.stage, 0.0) + timing.duration
+        )
+
+    return len(iterations), seconds_by_stage
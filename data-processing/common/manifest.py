@@ -0,0 +1,276 @@
+"""
+Manifests of the data files that have been saved for each paper. A paper's manifest records, for
+each file that commands have appended rows to, the number of rows in the file and its size. This
+lets code find out how many rows a file has (e.g., when making digests) without reading and parsing
+the file, and which data files a paper has in a directory (see 'list_files') without listing the
+directory. A hash of a file's contents is only computed when it is first requested with
+'get_sha256', as files are recorded each time rows are flushed to them, and hashing a whole file on
+each flush would take time that grows with the square of the file's length.
+
+Manifests are updated by 'file_utils.CsvWriterSession' each time it writes its rows to disk. An
+entry is only returned if the file's size and modification time still match the entry, so files
+changed by other means (e.g., by 'append_to_csv' outside of a session) are never reported with
+stale information. Callers should fall back to reading the file when no entry is returned.
+"""
+
+import csv
+import fnmatch
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, replace
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from common import directories, sqlite_tables
+from common.types import ArxivId, Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # type: ignore # pylint: disable=invalid-name
+
+MANIFEST_VERSION = 1
+
+FileStat = Tuple[int, int]
+" Size and modification time (in nanoseconds) of a file. "
+
+
+@dataclass(frozen=True)
+class ManifestEntry:
+    dirkey: str
+    rows: int
+    size: int
+    mtime_ns: int
+    sha256: Optional[str] = None
+    " Hash of the file's contents, or 'None' if the file hasn't been hashed since it changed. "
+
+
+@dataclass
+class FileAppends:
+    " Rows appended to a file since it was last recorded in a manifest. "
+
+    base: Optional[FileStat]
+    " Stat of the file before rows were appended, or 'None' if the file didn't exist. "
+
+    rows: int = 0
+
+
+Manifest = Dict[str, ManifestEntry]
+" Map from paths of files relative to the data directory to the manifest entries for the files. "
+
+
+def get_manifest_path(arxiv_id: ArxivId) -> Path:
+    return os.path.join(
+        directories.arxiv_subdir("manifests", arxiv_id), "manifest.json"
+    )
+
+
+def get_file_stat(path: Path) -> Optional[FileStat]:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def _get_key(path: Path) -> str:
+    return os.path.relpath(os.path.abspath(path), os.path.abspath(directories.DATA_DIR))
+
+
+def load_manifest(arxiv_id: ArxivId) -> Manifest:
+    manifest_path = get_manifest_path(arxiv_id)
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, encoding="utf-8") as manifest_file:
+            data = json.load(manifest_file)
+    except (OSError, ValueError) as e:
+        logging.warning("Could not read manifest %s: %s", manifest_path, e)
+        return {}
+    if data.get("version") != MANIFEST_VERSION:
+        return {}
+    return {key: ManifestEntry(**entry) for key, entry in data["files"].items()}
+
+
+def get_entry(path: Path) -> Optional[ManifestEntry]:
+    " Get the manifest entry for the file at 'path', if it is up to date with the file. "
+    location = directories.find_arxiv_subdir(path)
+    if location is None:
+        return None
+    _, arxiv_id, _ = location
+    entry = load_manifest(arxiv_id).get(_get_key(path))
+    if entry is None or get_file_stat(path) != (entry.size, entry.mtime_ns):
+        return None
+    return entry
+
+
+def count_rows(path: Path) -> Optional[int]:
+    " Get the number of rows in the file at 'path' from its paper's manifest, if it's there. "
+    entry = get_entry(path)
+    return entry.rows if entry is not None else None
+
+
+def list_files(directory: Path, patterns: List[str]) -> Optional[List[Path]]:
+    """
+    List the files in 'directory' (a directory in a paper's subdirectory of a data directory, or
+    the subdirectory itself) with names that match any of the glob 'patterns', from the paper's
+    manifest. Returns 'None' if the manifest can't be relied on to list the files: if it has no
+    entries for the directory, or if any of the matching files changed since they were recorded
+    (e.g., because the directory was cleaned). Callers should then list the directory instead.
+    Files are only recorded when saved in writer sessions, so this should only be used for
+    directories whose files are all saved in writer sessions, like the outputs of commands.
+    """
+    location = directories.find_arxiv_subdir(os.path.join(directory, "_"))
+    if location is None:
+        return None
+    _, arxiv_id, _ = location
+
+    directory_key = _get_key(directory)
+    paths = []
+    for key, entry in load_manifest(arxiv_id).items():
+        dirname, filename = os.path.split(key)
+        if dirname != directory_key:
+            continue
+        if not any(fnmatch.fnmatchcase(filename, p) for p in patterns):
+            continue
+        path = os.path.join(directory, filename)
+        if get_file_stat(path) != (entry.size, entry.mtime_ns):
+            return None
+        paths.append(path)
+    return sorted(paths) if paths else None
+
+
+_thread_lock = threading.Lock()
+
+
+@contextmanager
+def _lock_manifest(arxiv_id: ArxivId) -> Iterator[None]:
+    """
+    Hold a lock on a paper's manifest, so that processes (e.g., processes running different
+    entity pipelines at once) don't overwrite each other's updates.
+    """
+    manifest_dir = directories.arxiv_subdir("manifests", arxiv_id)
+    os.makedirs(manifest_dir, exist_ok=True)
+    with _thread_lock, open(os.path.join(manifest_dir, "lock"), "w") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        yield
+
+
+def _count_file_rows(path: Path) -> int:
+    if sqlite_tables.is_sqlite_path(path):
+        return sqlite_tables.count_rows(path)
+    with open(path, encoding="utf-8", newline="") as csv_file:
+        num_lines = sum(1 for _ in csv.reader(csv_file))
+    # Don't count the header.
+    return max(num_lines - 1, 0)
+
+
+def hash_file(path: Path) -> str:
+    " Compute the SHA-256 hash of a file, reading it in chunks. "
+    hasher = hashlib.sha256()
+    with open(path, "rb") as file_:
+        for chunk in iter(lambda: file_.read(1 << 20), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def get_sha256(path: Path) -> Optional[str]:
+    """
+    Get the hash of the contents of the file at 'path', if the file is up to date in its paper's
+    manifest. The file is only hashed if it hasn't been hashed since it last changed. The hash is
+    then saved to the manifest.
+    """
+    entry = get_entry(path)
+    if entry is None:
+        return None
+    if entry.sha256 is not None:
+        return entry.sha256
+
+    sha256 = hash_file(path)
+    location = directories.find_arxiv_subdir(path)
+    if location is None:
+        return sha256
+    _, arxiv_id, _ = location
+    try:
+        with _lock_manifest(arxiv_id):
+            manifest = load_manifest(arxiv_id)
+            key = _get_key(path)
+            # Only save the hash if the file didn't change while it was being hashed.
+            if manifest.get(key) == entry and get_file_stat(path) == (
+                entry.size,
+                entry.mtime_ns,
+            ):
+                manifest[key] = replace(entry, sha256=sha256)
+                _save_manifest(arxiv_id, manifest)
+    except OSError as e:
+        logging.warning("Could not update manifest for paper %s: %s", arxiv_id, e)
+    return sha256
+
+
+def _make_entry(
+    dirkey: str, path: Path, appends: FileAppends, previous: Optional[ManifestEntry]
+) -> Optional[ManifestEntry]:
+    stat = get_file_stat(path)
+    if stat is None:
+        return None
+
+    # Count the rows from the rows that were appended if the file hasn't changed in any other
+    # way since it was last recorded.
+    if appends.base is None:
+        rows: Optional[int] = appends.rows
+    elif previous is not None and appends.base == (previous.size, previous.mtime_ns):
+        rows = previous.rows + appends.rows
+    else:
+        rows = None
+    if rows is None:
+        rows = _count_file_rows(path)
+
+    return ManifestEntry(dirkey, rows, stat[0], stat[1])
+
+
+def record_appends(appends: Dict[Path, FileAppends]) -> None:
+    """
+    Update the manifests of papers with the files that rows were appended to. Files that aren't
+    in a paper's subdirectory of a data directory are skipped. Each manifest is replaced
+    atomically, so a manifest is never left partially written.
+    """
+    appends_by_paper: Dict[ArxivId, Dict[Path, Tuple[str, FileAppends]]] = {}
+    for path, file_appends in appends.items():
+        location = directories.find_arxiv_subdir(path)
+        if location is None or location[0] == "manifests":
+            continue
+        dirkey, arxiv_id, _ = location
+        appends_by_paper.setdefault(arxiv_id, {})[path] = (dirkey, file_appends)
+
+    for arxiv_id, paper_appends in appends_by_paper.items():
+        try:
+            with _lock_manifest(arxiv_id):
+                manifest = load_manifest(arxiv_id)
+                for path, (dirkey, file_appends) in paper_appends.items():
+                    key = _get_key(path)
+                    entry = _make_entry(dirkey, path, file_appends, manifest.get(key))
+                    if entry is not None:
+                        manifest[key] = entry
+                    elif key in manifest:
+                        del manifest[key]
+                _save_manifest(arxiv_id, manifest)
+        except OSError as e:
+            logging.warning("Could not update manifest for paper %s: %s", arxiv_id, e)
+
+
+def _save_manifest(arxiv_id: ArxivId, manifest: Manifest) -> None:
+    manifest_path = get_manifest_path(arxiv_id)
+    data = {
+        "version": MANIFEST_VERSION,
+        "files": {key: asdict(entry) for key, entry in manifest.items()},
+    }
+    with tempfile.NamedTemporaryFile(
+        "w", dir=os.path.dirname(manifest_path), delete=False, encoding="utf-8"
+    ) as temporary_file:
+        json.dump(data, temporary_file, indent=2)
+    os.replace(temporary_file.name, manifest_path)
@@ -0,0 +1,95 @@
+"""
+Utilities for holding rasters of the pages of a paper in memory. Page images are indexed by
+page number (starting at 0), and are stored as OpenCV images (i.e., arrays of BGR pixels).
+"""
+
+import logging
+import os.path
+import re
+from typing import Dict, List
+
+import cv2
+import numpy as np
+
+from common.types import Path
+
+PageImages = Dict[int, np.ndarray]
+" Map from page number (starting at 0) to the image of that page. "
+
+PAGE_IMAGE_PATTERN = re.compile(r"page-(\d+)\.png$")
+" Filenames of page images written by the default rasterers, where pages are numbered from 1. "
+
+
+def load_page_images(images_dir: Path) -> PageImages:
+    " Load all page images from a directory of rasters written by 'raster_pages'. "
+    images: PageImages = {}
+    for img_name in os.listdir(images_dir):
+        match = PAGE_IMAGE_PATTERN.match(img_name)
+        if match is None:
+            logging.debug(
+                "Skipping file %s in %s that is not a page image.", img_name, images_dir
+            )
+            continue
+        page_number = int(match.group(1)) - 1
+        images[page_number] = cv2.imread(os.path.join(images_dir, img_name))
+    return images
+
+
+def save_page_images(images: PageImages, images_dir: Path) -> None:
+    " Save page images to a directory, with the same file names as 'raster_pages' uses. "
+    if not os.path.exists(images_dir):
+        os.makedirs(images_dir)
+    for page_number, image in images.items():
+        cv2.imwrite(os.path.join(images_dir, f"page-{page_number + 1}.png"), image)
+
+
+def parse_ppm_stream(data: bytes) -> List[np.ndarray]:
+    """
+    Parse a stream of concatenated binary PPM ('P6') images, like the one Ghostscript writes to
+    standard output when rastering a document with the 'ppmraw' device. Returns one image
+    per page, with channels in BGR order, like images loaded with 'cv2.imread'.
+    """
+    images = []
+    position = _skip_whitespace_and_comments(data, 0)
+    while position < len(data):
+        if data[position : position + 2] != b"P6":
+            raise ValueError(f"Expected a binary PPM image at byte {position}.")
+        position += 2
+
+        fields = []
+        while len(fields) < 3:
+            position = _skip_whitespace_and_comments(data, position)
+            start = position
+            while position < len(data) and data[position] in b"0123456789":
+                position += 1
+            if position == start:
+                raise ValueError(f"Malformed PPM header at byte {start}.")
+            fields.append(int(data[start:position]))
+
+        width, height, max_value = fields
+        if max_value > 255:
+            raise ValueError("Only PPM images with 8 bits per channel are supported.")
+
+        # Exactly one whitespace character separates the header from the pixel data.
+        position += 1
+        size = width * height * 3
+        if position + size > len(data):
+            raise ValueError("PPM stream ended before the end of an image.")
+
+        rgb = np.frombuffer(data, dtype=np.uint8, count=size, offset=position)
+        images.append(cv2.cvtColor(rgb.reshape(height, width, 3), cv2.COLOR_RGB2BGR))
+        position = _skip_whitespace_and_comments(data, position + size)
+
+    return images
+
+
+def _skip_whitespace_and_comments(data: bytes, position: int) -> int:
+    while position < len(data):
+        if data[position] in b" \t\r\n":
+            position += 1
+        elif data[position] == ord("#"):
+            while position < len(data) and data[position] not in b"\r\n":
+                position += 1
+        else:
+            break
+    return position
@@ -3,7 +3,7 @@ import re
 import string
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from typing import Dict, Iterator, List, Optional, Union
+from typing import Dict, Iterator, List, Optional, Set, Tuple, Union
 
 from TexSoup import TexSoup
 
@@ -15,7 +15,7 @@ from common.scan_tex import (
     has_balanced_braces,
     scan_tex,
 )
-from common.string import JournaledString
+from common.string import Edit, JournaledString
 from common.types import (
     BeginDocument,
     CharacterRange,
@@ -347,13 +347,9 @@ def delimit_equations(s: JournaledString, equations: List[Equation]) -> Journale
             end_replacement = end_replacement + " "
         replacements[end_replacement_range] = end_replacement
 
-    for replacement_range in sorted(
-        replacements.keys(), key=lambda r: r.start, reverse=True
-    ):
-        replacement_text = replacements[replacement_range]
-        s = s.edit(replacement_range.start, replacement_range.end, replacement_text)
-
-    return s
+    return s.edit_many(
+        [Edit(range_.start, range_.end, text) for range_, text in replacements.items()]
+    )
 
 
 def extract_plaintext(tex_path: str, tex: str) -> JournaledString:
@@ -439,26 +435,32 @@ def extract_plaintext(tex_path: str, tex: str) -> JournaledString:
     # If some span of text is not returned by the scanner, then it is a comment,
     # or some other text that the scanner ignores. That text should be removed from the
     # plain text as if it was a pattern to skip.
-    # Iterate over matches in reverse so as not to mess up character offsets for
-    # earlier matches when replacing TeX in the string.
+    # Iterate over matches in reverse to find the spans of text between the matches, and then
+    # make all of the edits to the string at once.
+    edits: List[Edit] = []
     keep_after = len(plaintext)
     for match in reversed(list(scanner)):
         if match.end < keep_after:
-            plaintext = plaintext.edit(match.end, keep_after, "")
+            edits.append(Edit(match.end, keep_after, ""))
             keep_after = match.end
         if match.pattern in REPLACE_PATTERNS:
-            plaintext = plaintext.edit(
-                match.start,
-                match.end,
-                re.sub(
-                    match.pattern.regex, REPLACE_PATTERNS[match.pattern], match.text
-                ),
+            edits.append(
+                Edit(
+                    match.start,
+                    match.end,
+                    re.sub(
+                        match.pattern.regex,
+                        REPLACE_PATTERNS[match.pattern],
+                        match.text,
+                    ),
+                )
             )
         if match.pattern not in SKIP_PATTERNS:
             keep_after = match.start
 
     if keep_after > 0:
-        plaintext = plaintext.edit(0, keep_after, "")
+        edits.append(Edit(0, keep_after, ""))
+    plaintext = plaintext.edit_many(edits)
 
     # Finally, remove adjacent periods (which interfere with the pysbd sentence
     # segmenter), which may only be adjacent because the TeX grouping has been removed.
@@ -466,8 +468,12 @@ def extract_plaintext(tex_path: str, tex: str) -> JournaledString:
     # to change as little of the original TeX as possible, to make it easier to map
     # back from the original period position (which will often occur at the end of
     # an extracted sentence) to its precise position in the original TeX.
-    for m in reversed(list(re.finditer(r"[\s\.]+(?=\.)", str(plaintext)))):
-        plaintext = plaintext.edit(m.start(), m.end(), "")
+    plaintext = plaintext.edit_many(
+        [
+            Edit(m.start(), m.end(), "")
+            for m in re.finditer(r"[\s\.]+(?=\.)", str(plaintext))
+        ]
+    )
 
     return plaintext
 
@@ -572,24 +578,65 @@ class PhraseExtractor(EntityExtractor):
         self.phrases = phrases
         self.max_phrase_len = max_phrase_len
 
+        # Phrases are looked up in a set, so that checking whether a candidate is a known phrase
+        # takes the same time however many phrases there are. As the text of a candidate for a
+        # shingle of 'size' tokens always has 'size - 1' spaces, shingles are only made in sizes
+        # that known phrases come in.
+        self._phrase_set: Set[str] = set(phrases)
+        self._shingle_sizes = sorted(
+            {p.count(" ") + 1 for p in phrases if p.count(" ") < max_phrase_len}
+        )
+
+    @staticmethod
+    def get_tokens(text: str) -> List[Tuple[str, int, int]]:
+        " Get the tokens in the text that shingles are made from, with their offsets. "
+        return [
+            (match.group(0), match.start(), match.end())
+            for match in re.finditer(r"[^\.!,?()\[\]{}\s]+", text)
+        ]
+
     @staticmethod
-    def get_shingles(text: str, size: int) -> Iterator[Shingle]:
-        tokens = []
-        for match in re.finditer(r"[^\.!,?()\[\]{}\s]+", text):
-            tokens.append((match.group(0), match.start(), match.end()))
+    def get_shingles(
+        text: str, size: int, tokens: Optional[List[Tuple[str, int, int]]] = None
+    ) -> Iterator[Shingle]:
+        """
+        Get the shingles of 'size' tokens in the text. To avoid tokenizing the text again when
+        getting shingles of many sizes, pass in the 'tokens' from 'get_tokens'.
+        """
+        if tokens is None:
+            tokens = PhraseExtractor.get_tokens(text)
         for i in range(0, len(tokens) - size + 1):
             shingle_tokens = tokens[i : i + size]
             yield Shingle(
                 text=" ".join([t[0] for t in shingle_tokens]),
-                start=min([t[1] for t in shingle_tokens]),
-                end=max([t[2] for t in shingle_tokens]),
+                start=shingle_tokens[0][1],
+                end=shingle_tokens[-1][2],
             )
 
+    def _has_known_phrase(self, shingle_text: str) -> bool:
+        """
+        Determine whether any candidate for a shingle with the text 'shingle_text' is a known
+        phrase. Candidates are made from the shingle by stripping punctuation, lowercasing, and
+        removing a trailing 's' (see 'parse').
+        """
+        stripped = shingle_text.strip(string.punctuation)
+        for text in [shingle_text, stripped, shingle_text.lower(), stripped.lower()]:
+            if text in self._phrase_set:
+                return True
+            if text.endswith("s") and text[:-1] in self._phrase_set:
+                return True
+        return False
+
     def parse(self, tex_path: str, tex: str) -> Iterator[Phrase]:
         plaintext = extract_plaintext(tex_path, tex)
+        tokens = PhraseExtractor.get_tokens(str(plaintext))
         phrase_count = 0
-        for size in range(1, self.max_phrase_len + 1):
-            for shingle in PhraseExtractor.get_shingles(str(plaintext), size):
+        for size in self._shingle_sizes:
+            for shingle in PhraseExtractor.get_shingles(str(plaintext), size, tokens):
+                # Most shingles aren't known phrases. Check the texts of a shingle's candidates
+                # before making candidates, which are only needed to report matches.
+                if not self._has_known_phrase(shingle.text):
+                    continue
                 cands = [shingle]
                 for cand in list(cands):
                     cands.append(
@@ -604,7 +651,7 @@ class PhraseExtractor(EntityExtractor):
                         cands.append(Shingle(cand.text[:-1], cand.start, cand.end))
                 final_cands = set(cands)
                 for cand in final_cands:
-                    if cand.text in self.phrases:
+                    if cand.text in self._phrase_set:
                         start, end = plaintext.initial_offsets(cand.start, cand.end)
                         if start is not None and end is not None:
                             yield Phrase(
@@ -0,0 +1,152 @@
+"""
+Policies for deleting the data produced for papers while the pipeline is still running. Most of
+the disk space a paper takes up is used by a few kinds of artifacts (e.g., page rasters and the
+outputs of compiling batches of colorized entities) that are only read by a few commands. With the
+'lean' policy, these artifacts are deleted as soon as the last command that reads them has
+finished, and small result files (e.g., CSV files) are kept so that they can still be uploaded.
+With the 'batches' policy (the default), artifacts are kept until the paper's data is deleted,
+and only the intermediate files made for each batch of entities are deleted.
+
+The disk space taken up by papers' data is measured after each command finishes, to report the
+peak usage for each paper, and to enforce a disk budget if one is set.
+"""
+
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Type
+
+from common import directories, file_utils
+from common.commands.base import CommandList
+from common.commands.locate_entities import LocateEntitiesCommand
+from common.commands.raster_pages import RasterPages
+from common.types import ArxivId, Path
+
+RETENTION_POLICIES = ["batches", "lean"]
+
+RETAINED_FILE_PATTERNS = ["*.csv", "*.sqlite", "*.log", "*compilation_results/result"]
+" Glob patterns of small result files that are kept when artifacts are deleted. "
+
+
+@dataclass(frozen=True)
+class ArtifactRule:
+    dirkey: str
+    " Data directory that holds the artifacts for each paper. "
+
+    is_consumer: Callable[[Type[Any]], bool]
+    " Whether a command reads the artifacts. Takes a command class. "
+
+    droppable: bool = False
+    """
+    Whether the artifacts can be deleted even if consumers have yet to run (e.g., because the
+    artifacts are a cache). Droppable artifacts are deleted when a paper is over its disk budget.
+    """
+
+
+ARTIFACT_RULES = [
+    ArtifactRule(
+        "paper-images", lambda C: issubclass(C, (RasterPages, LocateEntitiesCommand)),
+    ),
+    ArtifactRule(
+        "compile-cache", lambda C: issubclass(C, LocateEntitiesCommand), droppable=True,
+    ),
+]
+
+
+class DiskBudgetExceededException(Exception):
+    pass
+
+
+@dataclass
+class DiskUsage:
+    peak: int = 0
+    " Most bytes taken up by the paper's data after any command. "
+
+    peak_command: Optional[str] = None
+    " Name of the command after which the data took up the most space. "
+
+
+def get_paper_disk_usage(arxiv_id: ArxivId) -> int:
+    " Get the number of bytes taken up by a paper's data in all data directories. "
+    return sum(
+        file_utils.get_disk_usage(directories.arxiv_subdir(dirkey, arxiv_id))
+        for dirkey in directories.dirkeys()
+    )
+
+
+class DataRetention:
+    """
+    Apply a retention policy (one of 'RETENTION_POLICIES') to the data for papers as a sequence of
+    commands is run for them. Call 'command_finished' after each command finishes running for all
+    of the papers. If 'disk_budget' is set, droppable artifacts are deleted whenever the papers'
+    data takes up more than 'disk_budget' bytes, and if that doesn't free up enough space,
+    'DiskBudgetExceededException' is raised.
+    """
+
+    def __init__(
+        self,
+        policy: str,
+        arxiv_ids: List[ArxivId],
+        commands: CommandList,
+        disk_budget: Optional[int] = None,
+    ) -> None:
+        self.policy = policy
+        self.arxiv_ids = arxiv_ids
+        self.disk_budget = disk_budget
+        self.usage: Dict[ArxivId, DiskUsage] = {
+            arxiv_id: DiskUsage() for arxiv_id in arxiv_ids
+        }
+        self._remaining_commands = list(commands)
+        self.finished_commands: List[str] = []
+        " Names of the commands that have finished running, in the order they finished. "
+
+    def command_finished(self, CommandCls: Type[Any]) -> None:
+        self.finished_commands.append(CommandCls.get_name())
+        if CommandCls in self._remaining_commands:
+            self._remaining_commands.remove(CommandCls)
+
+        total_usage = 0
+        for arxiv_id in self.arxiv_ids:
+            paper_usage = get_paper_disk_usage(arxiv_id)
+            usage = self.usage[arxiv_id]
+            if paper_usage > usage.peak:
+                usage.peak = paper_usage
+                usage.peak_command = CommandCls.get_name()
+            total_usage += paper_usage
+
+        if self.policy == "lean":
+            for rule in ARTIFACT_RULES:
+                if not any(rule.is_consumer(C) for C in self._remaining_commands):
+                    self._delete_artifacts(rule)
+            if self.disk_budget is not None and total_usage > self.disk_budget:
+                total_usage = sum(get_paper_disk_usage(id_) for id_ in self.arxiv_ids)
+
+        if self.disk_budget is not None and total_usage > self.disk_budget:
+            for rule in ARTIFACT_RULES:
+                if rule.droppable:
+                    self._delete_artifacts(rule)
+            total_usage = sum(get_paper_disk_usage(id_) for id_ in self.arxiv_ids)
+            if total_usage > self.disk_budget:
+                raise DiskBudgetExceededException(
+                    f"Data for papers {self.arxiv_ids} takes up {total_usage} bytes after "
+                    + f"command {CommandCls.get_name()}, more than the disk budget of "
+                    + f"{self.disk_budget} bytes."
+                )
+
+    def log_usage(self) -> None:
+        for arxiv_id, usage in self.usage.items():
+            logging.info(
+                "Peak disk usage for paper %s: %.1f MB (after command %s).",
+                arxiv_id,
+                usage.peak / 1e6,
+                usage.peak_command,
+            )
+
+    def _delete_artifacts(self, rule: ArtifactRule) -> None:
+        for arxiv_id in self.arxiv_ids:
+            artifacts_dir = directories.arxiv_subdir(rule.dirkey, arxiv_id)
+            if os.path.isdir(artifacts_dir):
+                logging.debug(
+                    "Deleting artifacts in %s for paper %s.", rule.dirkey, arxiv_id
+                )
+                file_utils.clean_directory(artifacts_dir, RETAINED_FILE_PATTERNS)
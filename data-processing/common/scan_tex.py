@@ -1,7 +1,31 @@
+"""
+Scanning of TeX for tokens matching sets of patterns. Scans of whole TeX files are cached as token
+streams (see 'get_token_stream'), keyed by the TeX and by the set of patterns scanned for.
+
+Note that a stream is only shared by extractors that scan for the same set of patterns (e.g.,
+detecting equations, and finding equations when extracting plaintext). Extractors that scan for
+different patterns (e.g., for equations, macros, bibitems, and documentclass) each scan the file
+themselves. One scan for the union of their patterns can't be filtered down to each extractor's
+tokens: the scanner takes the leftmost match of any pattern and continues after it, so a token for
+one extractor's pattern can consume text where another extractor's token starts (e.g., the
+'required_arg' pattern of 'DocumentclassExtractor' matches any '{...}'). The unmatched text
+reported with 'include_unmatched' also depends on which patterns are scanned for.
+"""
+
+import functools
 import logging
 import re
-from dataclasses import dataclass
-from typing import Iterable, Iterator, List, Optional
+import threading
+from dataclasses import dataclass, replace
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Pattern as RegexPattern,
+    Tuple,
+)
 
 
 @dataclass(frozen=True)
@@ -11,7 +35,10 @@ class Pattern:
     " Names must be valid Python names. "
 
     regex: str
-    " Regular expression should contain *no* capturing groups. "
+    """
+    Regular expression should contain no *named* groups. It may contain unnamed groups: patterns
+    are matched by the name of the group each pattern is wrapped in (see 'TexScanner.next').
+    """
 
     disallow_leading_backslash: bool = True
     """
@@ -38,8 +65,32 @@ COMMENT = Pattern("comment", "%[^\n]*(\n|$)")
 PRIVATE_PATTERNS = [COMMENT]
 
 
+MIN_CACHED_TEX_LENGTH = 4096
+"""
+TeX shorter than this is scanned without caching its tokens. Short TeX (e.g., the TeX of one
+equation) is cheap to scan, and caching its tokens would evict the tokens of whole files.
+"""
+
+TOKEN_STREAM_CACHE_SIZE = 32
+" Number of token streams to keep in the cache. "
+
+
 def scan_tex(
     tex: str, patterns: List[Pattern], include_unmatched: bool = False
+) -> Iterator[Match]:
+    """
+    Scan 'tex' for the 'patterns'. The tokens found in TeX files are cached (see 'TokenStream'),
+    so that extractors that scan the same file for the same patterns share one scan of the file.
+    Scans for different sets of patterns are not shared (see the note at the top of this module).
+    """
+    if len(tex) < MIN_CACHED_TEX_LENGTH:
+        return _scan(tex, patterns, include_unmatched)
+    stream = get_token_stream(tex, tuple(patterns), include_unmatched)
+    return stream.iterate(patterns)
+
+
+def _scan(
+    tex: str, patterns: Iterable[Pattern], include_unmatched: bool = False
 ) -> Iterator[Match]:
     scanner = TexScanner(tex)
     while True:
@@ -56,6 +107,82 @@ def scan_tex(
         yield step.match
 
 
+class TokenStream:
+    """
+    The tokens found by scanning a TeX file for a set of patterns. Tokens are scanned lazily, as
+    they are requested, and are kept once they have been scanned. Many iterators can read the
+    stream at once, and each one reads the tokens from the start of the file, so that an extractor
+    that only needs the first few tokens (e.g., 'BeginDocumentExtractor') doesn't cause the whole
+    file to be scanned. If scanning fails, the error is raised to every iterator that reaches the
+    point where it failed, rather than only to the iterator that was scanning at the time.
+    """
+
+    def __init__(
+        self, tex: str, patterns: Tuple[Pattern, ...], include_unmatched: bool
+    ) -> None:
+        self.patterns = patterns
+        self._tokens: List[Match] = []
+        self._scanner: Optional[Iterator[Match]] = _scan(
+            tex, patterns, include_unmatched
+        )
+        self._error: Optional[Exception] = None
+        self._lock = threading.Lock()
+
+    def iterate(self, patterns: Iterable[Pattern]) -> Iterator[Match]:
+        """
+        Iterate over the tokens. 'patterns' should be equal to the patterns the stream was made
+        for. The tokens are returned with the caller's own pattern objects, as callers may check
+        which of their patterns was matched with 'is'.
+        """
+        own_patterns: Optional[Dict[str, Pattern]] = None
+        if any(p is not q for p, q in zip(patterns, self.patterns)):
+            own_patterns = {p.name: p for p in patterns}
+
+        i = 0
+        while True:
+            token = self._get_token(i)
+            if token is None:
+                return
+            if own_patterns is not None and token.pattern.name in own_patterns:
+                token = replace(token, pattern=own_patterns[token.pattern.name])
+            yield token
+            i += 1
+
+    def _get_token(self, i: int) -> Optional[Match]:
+        if i < len(self._tokens):
+            return self._tokens[i]
+        with self._lock:
+            while i >= len(self._tokens):
+                if self._error is not None:
+                    raise self._error
+                if self._scanner is None:
+                    return None
+                try:
+                    self._tokens.append(next(self._scanner))
+                except StopIteration:
+                    self._scanner = None
+                    return None
+                except Exception as e:  # pylint: disable=broad-except
+                    self._scanner = None
+                    self._error = e
+                    raise
+            return self._tokens[i]
+
+
+@functools.lru_cache(maxsize=TOKEN_STREAM_CACHE_SIZE)
+def get_token_stream(
+    tex: str, patterns: Tuple[Pattern, ...], include_unmatched: bool = False
+) -> TokenStream:
+    """
+    Get the stream of tokens for a TeX file. Streams are cached by the contents of the TeX (i.e.,
+    by the string's hash, falling back to comparing contents), so a file is only scanned once for
+    each distinct set of patterns, however many extractors scan it. A file is still scanned once
+    for each distinct set: a stream for one set of patterns can't be reused for a different set,
+    not even a subset of it, as the tokens found depend on every pattern in the set.
+    """
+    return TokenStream(tex, patterns, include_unmatched)
+
+
 @dataclass(frozen=True)
 class ScanStep:
 
@@ -69,6 +196,46 @@ class ScanStep:
     """
 
 
+@dataclass(frozen=True)
+class PatternSet:
+    " A set of patterns combined into one regular expression, with one named group per pattern. "
+
+    regex: RegexPattern[str]
+    indexes_by_name: Dict[str, int]
+    " Index of the pattern for each group name, in the tuple of patterns the set was made from. "
+
+
+@functools.lru_cache(maxsize=256)
+def compile_patterns(patterns: Tuple[Pattern, ...]) -> PatternSet:
+    """
+    Combine patterns into one regular expression. Scanners often switch back and forth between a
+    few sets of patterns (e.g., one set outside of equations and one set inside them), so pattern
+    sets are cached, and each distinct set of patterns is only compiled once. This saves little
+    time in practice, as the 're' module caches compiled expressions too (see
+    'scripts/benchmark_scan_tex.py').
+    """
+
+    # Create a universal regular expression pattern for all input patterns.
+    indexes_by_name = {p.name: i for i, p in enumerate(patterns)}
+    regexes = []
+    for p in patterns:
+        p_regex = p.regex
+        if p.disallow_leading_backslash:
+            # XXX(andrewhead): Ignore the pattern if it is preceded by one backslash,
+            # but not two (two backslashes indicates a newline). To be more robust, this
+            # checker should instead count the backslashes backward from the pattern to
+            # make sure there is only an even number of backslashes before the pattern if
+            # there are backslashes. However, such a rule can't be written as a negative
+            # lookahead, as negative lookaheads need to be fixed width. Instead, a more
+            # sophisticated scanning loop could be implemented that checks if a pattern is
+            # preceding by an odd number of backslashes and, if so, removing it from the
+            # list of scan patterns for that iteration of scanning.
+            p_regex = r"(?<!(?<![\\])[\\])" + p_regex
+        regexes.append(f"(?P<{p.name}>{p_regex})")
+    regex = re.compile("|".join(regexes), flags=re.DOTALL)
+    return PatternSet(regex, indexes_by_name)
+
+
 class EndOfInput(Exception):
     def __init__(self, skipped: Optional[List[Match]]):
         super().__init__()
@@ -95,26 +262,12 @@ class TexScanner:
         the returned result will include an ordered list of skipped, uncommented tokens.
         Raises 'StopIteration' after the last match has been found.
         """
-        scan_patterns = PRIVATE_PATTERNS + list(patterns)
-
-        # Create a universal regular expression pattern for all input patterns.
-        patterns_by_name = {p.name: p for p in scan_patterns}
-        regexes = []
-        for p in scan_patterns:
-            p_regex = p.regex
-            if p.disallow_leading_backslash:
-                # XXX(andrewhead): Ignore the pattern if it is preceded by one backslash,
-                # but not two (two backslashes indicates a newline). To be more robust, this
-                # checker should instead count the backslashes backward from the pattern to
-                # make sure there is only an even number of backslashes before the pattern if
-                # there are backslashes. However, such a rule can't be written as a negative
-                # lookahead, as negative lookaheads need to be fixed width. Instead, a more
-                # sophisticated scanning loop could be implemented that checks if a pattern is
-                # preceding by an odd number of backslashes and, if so, removing it from the
-                # list of scan patterns for that iteration of scanning.
-                p_regex = r"(?<!(?<![\\])[\\])" + p_regex
-            regexes.append(f"(?P<{p.name}>{p_regex})")
-        regex = re.compile("|".join(regexes), flags=re.DOTALL)
+        # Patterns are looked up in the patterns passed in rather than in the cached pattern set,
+        # as callers may check which of their pattern objects was matched with 'is'.
+        scan_patterns = tuple(PRIVATE_PATTERNS) + tuple(patterns)
+        pattern_set = compile_patterns(scan_patterns)
+        regex = pattern_set.regex
+        indexes_by_name = pattern_set.indexes_by_name
 
         skipped: List[Match] = []
         match = None
@@ -136,17 +289,16 @@ class TexScanner:
                     )
                 raise EndOfInput(skipped)
 
-            # Get the pattern that produced the next match in the TeX.
-            group_dict = re_match.groupdict()
-            pattern_names = [
-                name for name, text in group_dict.items() if text is not None
-            ]
-            if len(pattern_names) != 1:
+            # Get the pattern that produced the next match in the TeX. 'lastgroup' is the group
+            # that was closed last. Each pattern is wrapped in its own named group, which closes
+            # after any groups inside the pattern (e.g., the '(\n|$)' in COMMENT), so the group
+            # closed last is always the group of the pattern that matched.
+            pattern_name = re_match.lastgroup
+            if pattern_name is None or pattern_name not in indexes_by_name:
                 logging.warning("TeX scanner produced an invalid match: %s", re_match)
                 raise ValueError("TeX scanner produced an invalid match: %s" % re_match)
 
-            pattern_name = pattern_names[0]
-            pattern = patterns_by_name[pattern_name]
+            pattern = scan_patterns[indexes_by_name[pattern_name]]
 
             # If characters were skipped between the last match and this one, get those characters.
             # Note that comments are not considered skipped TeX, and will not be returned.
@@ -164,7 +316,7 @@ class TexScanner:
             # that there was a match and return the match.
             if pattern is not COMMENT:
                 match = Match(
-                    pattern, group_dict[pattern_name], re_match.start(), re_match.end(),
+                    pattern, re_match.group(), re_match.start(), re_match.end(),
                 )
 
             # Update the position of the scanner in the TeX so that the next search for a pattern
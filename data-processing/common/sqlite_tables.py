@@ -0,0 +1,160 @@
+"""
+Storage for tables of intermediate data in SQLite files, as an alternative to CSV files (see
+'file_utils.set_storage_format'). Each file holds one table of rows, just as a CSV file would.
+An SQLite file is saved next to the path of the CSV file it stands in for, with the extension
+'.sqlite' instead of '.csv', so that tools that read CSV files are never handed an SQLite file.
+
+Values are stored as they would be written to a CSV file, except for numbers, which are stored as
+numbers, so that the same code can decode rows from either kind of file. Files are written without
+waiting for data to be synced to disk, as intermediate data can be recreated by running the
+pipeline again.
+"""
+
+import csv
+import os
+import sqlite3
+import threading
+from contextlib import closing
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from common.types import Path
+
+SQLITE_EXTENSION = ".sqlite"
+TABLE_NAME = "rows"
+
+
+def get_sqlite_path(csv_path: Path) -> Path:
+    " Get the path of the SQLite file that stands in for the CSV file at 'csv_path'. "
+    root, ext = os.path.splitext(csv_path)
+    if ext == ".csv":
+        return root + SQLITE_EXTENSION
+    return csv_path + SQLITE_EXTENSION
+
+
+def get_csv_path(sqlite_path: Path) -> Path:
+    " Get the path of the CSV file that the SQLite file at 'sqlite_path' stands in for. "
+    root, ext = os.path.splitext(sqlite_path)
+    if ext == SQLITE_EXTENSION:
+        return root + ".csv"
+    return sqlite_path
+
+
+def is_sqlite_path(path: Path) -> bool:
+    return path.endswith(SQLITE_EXTENSION)
+
+
+def to_sqlite_value(value: Any) -> Any:
+    """
+    Prepare a value to be saved to an SQLite file. Numbers are saved as numbers. Everything else
+    is saved as the string that would be written to a CSV file, so it can be decoded the same way.
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return value if isinstance(value, str) else str(value)
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+class _OpenTable(threading.local):
+    """
+    The file that a thread last appended rows to, kept open for the next append, as rows are
+    usually appended to the same file many times in a row. Every append is committed right away,
+    so there is nothing to flush when the process exits.
+    """
+
+    path: Optional[Path] = None
+    file_id: Optional[Tuple[int, int, int]] = None
+    " Process, device, and inode of the file, to detect when the file has been replaced. "
+
+    connection: Optional[sqlite3.Connection] = None
+
+
+_open_table = _OpenTable()
+
+
+def _get_file_id(path: Path) -> Optional[Tuple[int, int, int]]:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (os.getpid(), stat.st_dev, stat.st_ino)
+
+
+def _connect(path: Path, columns: str) -> sqlite3.Connection:
+    if _open_table.path == path and _open_table.file_id == _get_file_id(path):
+        return _open_table.connection  # type: ignore
+
+    # Connections from a parent process are left for the parent to close.
+    if _open_table.connection is not None and _open_table.file_id is not None:
+        if _open_table.file_id[0] == os.getpid():
+            _open_table.connection.close()
+    _open_table.connection = None
+
+    connection = sqlite3.connect(path, timeout=60)
+    connection.execute("PRAGMA synchronous = OFF")
+    with connection:
+        connection.execute(f"CREATE TABLE IF NOT EXISTS {TABLE_NAME} ({columns})")
+    _open_table.path = path
+    _open_table.file_id = _get_file_id(path)
+    _open_table.connection = connection
+    return connection
+
+
+def append_rows(path: Path, rows: List[Dict[str, Any]]) -> None:
+    """
+    Append rows to the table in the file at 'path', creating the file if it doesn't exist. All
+    rows must have the same keys, which are used as the columns of the table. Values should
+    already have been prepared with 'to_sqlite_value'.
+    """
+    if not rows:
+        return
+
+    columns = ", ".join(_quote(k) for k in rows[0].keys())
+    placeholders = ", ".join("?" for _ in rows[0])
+    connection = _connect(path, columns)
+    with connection:
+        connection.executemany(
+            f"INSERT INTO {TABLE_NAME} ({columns}) VALUES ({placeholders})",
+            [tuple(row.values()) for row in rows],
+        )
+
+
+def read_rows(path: Path) -> Iterator[Dict[str, Any]]:
+    " Read rows from the table in the file at 'path' in the order they were added. "
+    with closing(sqlite3.connect(path, timeout=60)) as connection:
+        try:
+            cursor = connection.execute(f"SELECT * FROM {TABLE_NAME} ORDER BY rowid")
+        except sqlite3.OperationalError:
+            # The table will be missing if the file was created but no rows were added.
+            return
+        columns = [d[0] for d in cursor.description]
+        for row in cursor:
+            yield dict(zip(columns, row))
+
+
+def count_rows(path: Path) -> int:
+    with closing(sqlite3.connect(path, timeout=60)) as connection:
+        try:
+            return int(
+                connection.execute(f"SELECT COUNT(*) FROM {TABLE_NAME}").fetchone()[0]
+            )
+        except sqlite3.OperationalError:
+            return 0
+
+
+def export_to_csv(path: Path, csv_path: Path, encoding: str = "utf-8") -> None:
+    """
+    Write the rows of the table in the SQLite file at 'path' to a CSV file at 'csv_path', in the
+    format that 'file_utils.append_to_csv' writes, for tools that only read CSV files.
+    """
+    with open(csv_path, "w", encoding=encoding, newline="") as csv_file:
+        writer: Optional[csv.DictWriter] = None
+        for row in read_rows(path):
+            if writer is None:
+                writer = csv.DictWriter(
+                    csv_file, fieldnames=row.keys(), quoting=csv.QUOTE_MINIMAL
+                )
+                writer.writeheader()
+            writer.writerow(row)
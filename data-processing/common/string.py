@@ -1,8 +1,10 @@
+import bisect
 import dataclasses
+import itertools
 import logging
 from collections import UserString
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
 
 @dataclass
@@ -12,6 +14,15 @@ class Segment:
     changed: bool
 
 
+@dataclass(frozen=True)
+class Edit:
+    " A replacement of the substring from 'start' to 'end' with 'replacement'. "
+
+    start: int
+    end: int
+    replacement: str
+
+
 class JournaledString(UserString):  # pylint: disable=too-many-ancestors
     """
     A string that keeps a record of the edits made to it. It preserves a record
@@ -49,13 +60,22 @@ class JournaledString(UserString):  # pylint: disable=too-many-ancestors
         # the string value will be computed dynamically from the segments (see below).
         super(JournaledString, JournaledString).__init__(self, "")
 
+        # The current and initial values of the string, and the offsets at which each segment
+        # starts in them, are computed the first time they are needed (see '_index'). Like the
+        # string, the list of segments should not be changed after the string is created.
+        self._current: Optional[str] = None
+        self._current_starts: Optional[List[int]] = None
+        self._initial_starts: Optional[List[int]] = None
+
     @property  # type: ignore
     def data(self) -> str:  # type: ignore
         # 'UserString''s underlying representation of the string is in the 'data' attribute.
         # To avoid having two sources of truth for the value of the string, the 'data'
-        # attribute is overwritten, so that the value of 'data' is always dynamically determined
-        # from the contents of the 'segments'.
-        return "".join([s.current for s in self.segments])
+        # attribute is overwritten, so that the value of 'data' is always determined from the
+        # contents of the 'segments'.
+        if self._current is None:
+            self._current = "".join([s.current for s in self.segments])
+        return self._current
 
     @data.setter
     def data(self, _: Any) -> None:
@@ -68,6 +88,25 @@ class JournaledString(UserString):  # pylint: disable=too-many-ancestors
         " Get the initial value of the string, before it was mutated. "
         return "".join([s.initial for s in self.segments])
 
+    def __len__(self) -> int:
+        return self._index()[0][-1]
+
+    def _index(self) -> Tuple[List[int], List[int]]:
+        """
+        Get the offsets at which each segment starts in the current value of the string, and in
+        the initial value of the string. Each list has one more offset than there are segments,
+        the length of the current (or initial) value of the string. These offsets let segments be
+        looked up by binary search, rather than by walking over all segments.
+        """
+        if self._current_starts is None or self._initial_starts is None:
+            self._current_starts = [0] + list(
+                itertools.accumulate(len(s.current) for s in self.segments)
+            )
+            self._initial_starts = [0] + list(
+                itertools.accumulate(len(s.initial) for s in self.segments)
+            )
+        return (self._current_starts, self._initial_starts)
+
     def edit(self, start: int, end: int, replacement: str) -> "JournaledString":
         """
         Replace a substring of the string (from 'start' to 'end') with a new substring.
@@ -105,39 +144,88 @@ class JournaledString(UserString):  # pylint: disable=too-many-ancestors
         )
 
         # Detect whether the replacement bisects segments on its left or right side.
-        left_cut = False
-        right_cut = False
-        s_start = 0
-        for s in self.segments:
-            if s_start < start < s_start + len(s.current):
-                left_cut = True
-            if s_start < end < s_start + len(s.current):
-                right_cut = True
-            s_start += len(s.current)
+        left_cut = self._bisects_segment(start)
+        right_cut = self._bisects_segment(end)
+        left_segments = list(left.segments)
+        right_segments = list(right.segments)
 
         # If a segment on the left was bisected, and it has been changed
         # in the past, it needs to be merged with the middle as the call to
         # 'substring' will have duplicated the 'initial' property in both the middle
         # substring and the one on the side, which needs to be deduplicated.
-        if left_cut and left.segments[-1].changed:
-            last_left = left.segments[-1]
+        if left_cut and left_segments[-1].changed:
+            last_left = left_segments[-1]
             merged_middle.current = last_left.current + merged_middle.current
-            del left.segments[-1]
+            del left_segments[-1]
 
         # Do the same check on the right.
-        if right_cut and right.segments[0].changed:
-            first_right = right.segments[0]
+        if right_cut and right_segments[0].changed:
+            first_right = right_segments[0]
             merged_middle.current = merged_middle.current + first_right.current
-            del right.segments[0]
+            del right_segments[0]
 
         # Create a new string by combining all the segments.
         new_segments = []
-        for segment_list in [left.segments, [merged_middle], right.segments]:
+        for segment_list in [left_segments, [merged_middle], right_segments]:
             for s in segment_list:
                 if not (s.initial == "" and s.current == ""):
                     new_segments.append(s)
         return JournaledString(new_segments)
 
+    def edit_many(self, edits: Iterable[Edit]) -> "JournaledString":
+        """
+        Make many edits to the string at once. The edits must not overlap, and their offsets are
+        all relative to this string. The edited string (including its journal) is the same as the
+        one that would be made by calling 'edit' for each edit, from the last edit in the string
+        to the first (edits with the same offsets are made in the reverse of the order they are
+        given in). Return a changed copy (do not modify this object).
+        """
+
+        sorted_edits = sorted(edits, key=lambda e: (e.start, e.end))
+        last_end = 0
+        for e in sorted_edits:
+            if e.start < last_end or e.end < e.start or e.end > len(self):
+                raise ValueError(
+                    f"Could not apply edit {e} to string of length {len(self)}. Edits must "
+                    + "be within the string and must not overlap."
+                )
+            last_end = e.end
+
+        # Apply the edits from last to first. An edit only changes the segments that touch the
+        # span it replaces. As the segments before that span are unchanged by the edit, the
+        # segments that the next (earlier) edit touches can be found from the offsets of this
+        # string's segments, and edited without rebuilding the rest of the string.
+        segments = list(self.segments)
+        current_starts, _ = self._index()
+        changed = False
+        for e in reversed(sorted_edits):
+            first = bisect.bisect_left(current_starts, e.start, 1) - 1
+            offset = current_starts[first]
+            last = first
+            s_start = offset
+            while last < len(segments) and s_start <= e.end:
+                s_start += len(segments[last].current)
+                last += 1
+
+            window = JournaledString(segments[first:last])
+            edited = window.edit(e.start - offset, e.end - offset, e.replacement)
+            if edited.segments is not window.segments:
+                segments[first:last] = edited.segments
+                changed = True
+
+        # 'edit' drops empty segments from the string when it changes the string.
+        if changed:
+            segments = [
+                s for s in segments if not (s.initial == "" and s.current == "")
+            ]
+        return JournaledString(segments)
+
+    def _bisects_segment(self, offset: int) -> bool:
+        " Determine whether 'offset' falls strictly within a segment of the current string. "
+        current_starts, _ = self._index()
+        i = bisect.bisect_right(current_starts, offset, 0, len(self.segments)) - 1
+        return i >= 0 and current_starts[i] < offset < current_starts[i + 1]
+
     def substring(
         self,
         start: int,
@@ -154,11 +242,32 @@ class JournaledString(UserString):  # pylint: disable=too-many-ancestors
         * the contents of 'initial' for bisected segments.
         """
 
+        segments = self.segments
+        current_starts, _ = self._index()
+
+        # Only the segments that touch the span from 'start' to 'end' can be part of the
+        # substring. The first of these is the first segment that ends at or after 'start', and
+        # the last is the last segment that starts at or before 'end'.
+        first = bisect.bisect_left(current_starts, start, 1) - 1
+        last = bisect.bisect_right(current_starts, end, 0, len(segments)) - 1
+
         new_segments: List[Segment] = []
-        s_start = 0
-        for s in self.segments:
+        i = first
+        while i <= last:
+
+            s_start = current_starts[i]
+            s_end = current_starts[i + 1]
 
-            s_end = s_start + len(s.current)
+            # Segments that lie strictly within 'start' and 'end' are included in their entirety.
+            # Add the run of segments that does so all at once.
+            if start < s_start and s_end < end:
+                run_end = bisect.bisect_left(current_starts, end, i + 1) - 1
+                new_segments.extend(segments[i:run_end])
+                i = run_end
+                continue
+
+            s = segments[i]
+            i += 1
 
             # Simplest case: 'start' and 'end' surround a segment, so that entire segment
             # will be included in the new string.
@@ -205,8 +314,6 @@ class JournaledString(UserString):  # pylint: disable=too-many-ancestors
                 if overlaps:
                     new_segments.append(Segment(initial, current, s.changed))
 
-            s_start = s_end
-
         return JournaledString(new_segments)
 
     def initial_offsets(
@@ -219,57 +326,38 @@ class JournaledString(UserString):  # pylint: disable=too-many-ancestors
         been mutated.
         """
 
-        # Search for the start position. Search from the end of the current
-        # string backwards, to find the last possible segment that could
-        # map to the initial offsets, to provide a tight mapping.
-        current_segment_end = sum([len(s.current) for s in self.segments])
-        initial_segment_end = sum([len(s.initial) for s in self.segments])
-        start_in_initial: Optional[int] = initial_segment_end
-
-        for s in reversed(self.segments):
-
-            current_segment_start = current_segment_end - len(s.current)
-            initial_segment_start = initial_segment_end - len(s.initial)
-            if current_segment_start <= start <= current_segment_end:
-                if s.changed:
-                    start_in_initial = (
-                        initial_segment_end
-                        if start == current_segment_end
-                        else initial_segment_start
-                    )
-                else:
-                    start_in_initial = initial_segment_start + (
-                        start - current_segment_start
-                    )
-                break
-
-            current_segment_end -= len(s.current)
-            initial_segment_end -= len(s.initial)
-
-        # Repeat the search, this time searching forward to find the end offset.
-        current_segment_start = 0
-        initial_segment_start = 0
-        end_in_initial: Optional[int] = initial_segment_start
-
-        for s in self.segments:
-
-            current_segment_end = current_segment_start + len(s.current)
-            initial_segment_end = initial_segment_start + len(s.initial)
-            if current_segment_start <= end <= current_segment_end:
-                if s.changed and len(s.current) > 0:
-                    end_in_initial = (
-                        initial_segment_start
-                        if end == current_segment_start
-                        else initial_segment_end
-                    )
-                else:
-                    end_in_initial = initial_segment_start + (
-                        end - current_segment_start
-                    )
-                break
-
-            current_segment_start += len(s.current)
-            initial_segment_start += len(s.initial)
+        segments = self.segments
+        current_starts, initial_starts = self._index()
+
+        # Search for the start position. Look for the last segment that could map to the
+        # initial offsets (i.e., the last segment that starts at or before 'start'), to
+        # provide a tight mapping.
+        start_in_initial: Optional[int] = initial_starts[-1]
+        i = bisect.bisect_right(current_starts, start, 0, len(segments)) - 1
+        if i >= 0 and start <= current_starts[i + 1]:
+            if segments[i].changed:
+                start_in_initial = (
+                    initial_starts[i + 1]
+                    if start == current_starts[i + 1]
+                    else initial_starts[i]
+                )
+            else:
+                start_in_initial = initial_starts[i] + (start - current_starts[i])
+
+        # Search for the end position, this time looking for the first segment that could map
+        # to the initial offsets (i.e., the first segment that ends at or after 'end').
+        end_in_initial: Optional[int] = 0
+        i = bisect.bisect_left(current_starts, end, 1) - 1
+        if i < len(segments) and current_starts[i] <= end:
+            s = segments[i]
+            if s.changed and len(s.current) > 0:
+                end_in_initial = (
+                    initial_starts[i]
+                    if end == current_starts[i]
+                    else initial_starts[i + 1]
+                )
+            else:
+                end_in_initial = initial_starts[i] + (end - current_starts[i])
 
         return (start_in_initial, end_in_initial)
 
@@ -282,46 +370,38 @@ class JournaledString(UserString):  # pylint: disable=too-many-ancestors
         limitations of precision in this method.
         """
 
-        current_segment_start = 0
-        initial_segment_start = 0
-
-        start_in_current: Optional[int] = None
-        for s in self.segments:
-
-            initial_segment_end = initial_segment_start + len(s.initial)
-
-            # Search the segment for the start position.
-            if start_in_current is None:
-                if initial_segment_start <= start <= initial_segment_end:
-                    start_in_current = current_segment_start
-                    # If the 'start' offset comes at the end of this segment, return the end.
-                    if s.changed and start == initial_segment_end:
-                        start_in_current = current_segment_start + len(s.current)
-                    # If this segment is still from the initial string, the start index
-                    # can be adjusted to a specific offset in the segment.
-                    if not s.changed:
-                        start_in_current += start - initial_segment_start
-
-            # Only look for the end once the start has been found.
-            if start_in_current is not None:
-                # Search the segment for the end position. This search process is analogous
-                # to the search for 'start' above; see it for comments.
-                if initial_segment_start <= end <= initial_segment_end:
-                    if s.changed:
-                        if end == initial_segment_start:
-                            end_in_current = current_segment_start
-                        else:
-                            end_in_current = current_segment_start + len(s.current)
-                    else:
-                        end_in_current = current_segment_start + (
-                            end - initial_segment_start
-                        )
-                    return (start_in_current, end_in_current)
-
-            current_segment_start += len(s.current)
-            initial_segment_start += len(s.initial)
-
-        return (None, None)
+        segments = self.segments
+        current_starts, initial_starts = self._index()
+
+        # Search for the first segment that the start position could be in.
+        i = bisect.bisect_left(initial_starts, start, 1) - 1
+        if i >= len(segments) or initial_starts[i] > start:
+            return (None, None)
+
+        s = segments[i]
+        start_in_current = current_starts[i]
+        # If the 'start' offset comes at the end of this segment, return the end.
+        if s.changed and start == initial_starts[i + 1]:
+            start_in_current = current_starts[i + 1]
+        # If this segment is still from the initial string, the start index
+        # can be adjusted to a specific offset in the segment.
+        if not s.changed:
+            start_in_current += start - initial_starts[i]
+
+        # Search for the end position, starting at the segment the start position was found in.
+        # This search process is analogous to the search for 'start' above.
+        i = bisect.bisect_left(initial_starts, end, i + 1) - 1
+        if i >= len(segments) or initial_starts[i] > end:
+            return (None, None)
+
+        if segments[i].changed:
+            if end == initial_starts[i]:
+                end_in_current = current_starts[i]
+            else:
+                end_in_current = current_starts[i + 1]
+        else:
+            end_in_current = current_starts[i] + (end - initial_starts[i])
+        return (start_in_current, end_in_current)
 
     def to_json(self) -> Dict[str, Any]:
         return {
@@ -0,0 +1,36 @@
+"""
+Utilities for measuring how much time is spent in each stage of processing a batch of entities.
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+
+class StageTimer:
+    """
+    Accumulates the time spent in named stages of processing. Stages can be timed many times
+    (e.g., once for each page), and the durations are added up. Stages are reported in the order
+    they were first timed. A timer should only be used from one thread at a time.
+    """
+
+    def __init__(self) -> None:
+        self.durations: Dict[str, float] = {}
+        " Time spent in each stage, in seconds. "
+
+        self.pages: Dict[str, int] = {}
+        " Number of pages processed in each stage, for stages that process pages. "
+
+    @contextmanager
+    def time(self, stage: str, pages: Optional[int] = None) -> Iterator[None]:
+        " Time a block of code as part of 'stage'. 'pages' is the number of pages it processes. "
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start, pages)
+
+    def add(self, stage: str, duration: float, pages: Optional[int] = None) -> None:
+        self.durations[stage] = self.durations.get(stage, 0.0) + duration
+        if pages is not None:
+            self.pages[stage] = self.pages.get(stage, 0) + pages
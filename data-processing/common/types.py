@@ -483,6 +483,48 @@ class ColorizationRecord:
     " Should match the ID on a 'SerializableEntity'"
 
 
+@dataclass(frozen=True)
+class ColorizationFault:
+    """
+    A record of an entity that caused a fault when it was colorized: either the colorized TeX
+    failed to compile ('compilation'), or colorizing the entity shifted the layout of other
+    entities ('layout').
+    """
+
+    tex_path: str
+    entity_id: str
+    entity_hash: str
+    " Hash of the entity's position and TeX. A fault is only recalled if the entity is unchanged. "
+
+    compiler_settings_hash: str
+    " Hash of the compiler settings. A fault is only recalled if the settings are unchanged. "
+
+    fault: str
+
+
+@dataclass(frozen=True)
+class LocationCheckpoint:
+    """
+    A record that locating an entity was finished in a batch (either because its locations were
+    saved, or because it won't be located), so that the entity can be skipped if locating the
+    paper's entities is resumed after an interruption.
+    """
+
+    tex_path: str
+    group: int
+    batch_index: int
+    entity_id: str
+    entity_hash: str
+    " Hash of the entity's position and TeX. A checkpoint is only used if the entity is unchanged. "
+
+
+@dataclass(frozen=True)
+class CompletedCommand:
+    " A record that a pipeline command finished running for a paper. "
+
+    command: str
+
+
 """
 SEARCH
 """
@@ -571,6 +613,30 @@ class HueLocationInfo(EntityLocationInfo):
     hue: float
 
 
+@dataclass(frozen=True)
+class StageTiming:
+    """
+    The time spent on one stage (e.g., 'compile', 'raster') of processing one batch of entities
+    when locating entities.
+    """
+
+    arxiv_id: ArxivId
+    entity_type: str
+    iteration: str
+    " ID of the batch's iteration, as saved with the batch's entity locations. "
+
+    batch_index: int
+    stage: str
+    duration: float
+    " Time spent on the stage, in seconds. "
+
+    pages: Optional[int]
+    " Number of pages processed in this stage, if the stage processes pages. "
+
+    entities: int
+    " Number of entities in the batch. "
+
+
 TokenLocations = Dict[TokenId, List[BoundingBox]]
 
 
@@ -701,6 +767,15 @@ class EntityProcessingDigest:
     when supporting a new type of entity for the first time.
     """
 
+    num_location_batches: Optional[int] = None
+    " Number of batches of entities that were colorized and compiled to locate entities. "
+
+    location_seconds_by_stage: Optional[Dict[str, float]] = None
+    """
+    Time spent locating entities, in seconds, for each stage of processing batches (e.g.,
+    'compile', 'raster'). See 'StageTiming'.
+    """
+
 
 PaperProcessingDigest = Dict[str, EntityProcessingDigest]
 " A digest of statistics of how many entities were processed for a paper, by entity type. "
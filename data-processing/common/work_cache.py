@@ -0,0 +1,235 @@
+"""
+A cache of the data that the pipeline produced for papers, shared between runs of the pipeline.
+When papers are processed one at a time, each paper's data is deleted once it has been processed,
+so a later job that processes the same paper again (e.g., to upload results under a new data
+version) would otherwise have to fetch, unpack, compile, and extract entities from it all over.
+With the cache, the data for the paper is restored instead, and the commands that produced it
+are skipped.
+
+Entries are keyed by arXiv ID and by the version of the pipeline's code (see 'get_code_version'),
+so data produced by older code is never reused. Note that an arXiv ID without a version refers to
+the latest version of a paper, so the entry for such an ID may hold data for an older version of
+the paper if a new version has been published since the entry was saved.
+
+Each entry is a directory containing:
+* 'entry.json': the names of the commands that produced the data, and the size of the data
+* 'data/<data directory>/': the paper's subdirectory of each data directory
+
+The cache has a maximum size. When saving an entry makes the cache larger than this, the least
+recently used entries are evicted. Entries are written to a temporary directory and then renamed
+into place, and a lock file is held while entries are restored or evicted, so that the cache can be
+shared by several processes at once.
+"""
+
+import configparser
+import hashlib
+import json
+import logging
+import os
+import shutil
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
+
+from common import directories, file_utils
+from common.compile_cache import get_compiler_settings
+from common.types import ArxivId, Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # type: ignore # pylint: disable=invalid-name
+
+CACHE_VERSION = "1"
+" Change this to invalidate all existing cache entries (e.g., if the entry layout changes). "
+
+CODE_DIRS = ["common", "entities", "scripts", "perl", "node", "resources"]
+" Directories with code that the data saved for a paper depends on. "
+
+UNCACHED_DIRKEYS = ["compile-cache"]
+"""
+Data directories that are not saved in entries. The compile cache is only needed to locate
+entities, which is skipped whenever an entry is restored.
+"""
+
+
+def get_code_version() -> str:
+    """
+    Compute a hash of the pipeline's code and of the settings of the TeX compiler, to key cache
+    entries by. Any change to the code makes a new version, even if the change would not have
+    changed the data produced for a paper.
+    """
+    hasher = hashlib.sha256()
+    hasher.update(CACHE_VERSION.encode("utf-8") + b"\0")
+    for code_dir in CODE_DIRS:
+        for dirpath, dirnames, filenames in os.walk(code_dir):
+            dirnames[:] = sorted(
+                d for d in dirnames if d not in ["__pycache__", "node_modules"]
+            )
+            for filename in sorted(filenames):
+                if filename.endswith(".pyc"):
+                    continue
+                path = os.path.join(dirpath, filename)
+                hasher.update(path.encode("utf-8", errors="surrogateescape") + b"\0")
+                with open(path, "rb") as file_:
+                    hasher.update(hashlib.sha256(file_.read()).digest())
+    try:
+        hasher.update(get_compiler_settings().encode("utf-8"))
+    except configparser.Error as e:
+        logging.warning("Could not read compiler settings for code version: %s", e)
+    return hasher.hexdigest()[:16]
+
+
+@dataclass(frozen=True)
+class CacheEntry:
+    commands: List[str]
+    " Names of the commands that produced the data in the entry. "
+
+    size: int
+    " Total size of the files in the entry, in bytes. "
+
+
+class WorkCache:
+    """
+    A cache of papers' data stored in 'cache_dir', holding at most 'max_size' bytes of data.
+    Entries are only read and written for 'code_version' (see 'get_code_version').
+    """
+
+    def __init__(self, cache_dir: Path, max_size: int, code_version: str) -> None:
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.code_version = code_version
+
+    def get_entry_dir(self, arxiv_id: ArxivId) -> Path:
+        return os.path.join(
+            self.cache_dir, self.code_version, directories.escape_slashes(arxiv_id)
+        )
+
+    def load_entry(self, arxiv_id: ArxivId) -> Optional[CacheEntry]:
+        return _load_entry(self.get_entry_dir(arxiv_id))
+
+    def restore(self, arxiv_id: ArxivId, command_names: List[str]) -> bool:
+        """
+        Restore the data saved for a paper to the data directories, if an entry was saved for the
+        paper by running at least the commands in 'command_names'. Returns whether the data was
+        restored. Existing data for the paper is replaced.
+        """
+        with self._lock(exclusive=False):
+            entry_dir = self.get_entry_dir(arxiv_id)
+            entry = _load_entry(entry_dir)
+            if entry is None or not set(command_names) <= set(entry.commands):
+                return False
+
+            for dirkey in directories.dirkeys():
+                if dirkey in UNCACHED_DIRKEYS:
+                    continue
+                arxiv_data_path = directories.arxiv_subdir(dirkey, arxiv_id)
+                cached_path = os.path.join(
+                    entry_dir, "data", os.path.basename(directories.dirpath(dirkey))
+                )
+                if os.path.isdir(arxiv_data_path):
+                    shutil.rmtree(arxiv_data_path)
+                if os.path.isdir(cached_path):
+                    shutil.copytree(cached_path, arxiv_data_path, symlinks=True)
+
+            # Mark the entry as recently used.
+            os.utime(os.path.join(entry_dir, "entry.json"))
+
+        logging.debug("Restored cached data for paper %s from %s.", arxiv_id, entry_dir)
+        return True
+
+    def save(self, arxiv_id: ArxivId, command_names: List[str]) -> None:
+        """
+        Save the data for a paper that was produced by running the commands in 'command_names',
+        replacing any entry that was saved for the paper before. Then evict the least recently
+        used entries until the cache fits in its maximum size.
+        """
+        temp_dir = os.path.join(self.cache_dir, f".tmp-{uuid.uuid4().hex}")
+        data_dir = os.path.join(temp_dir, "data")
+        os.makedirs(data_dir)
+
+        for dirkey in directories.dirkeys():
+            if dirkey in UNCACHED_DIRKEYS:
+                continue
+            arxiv_data_path = directories.arxiv_subdir(dirkey, arxiv_id)
+            if os.path.isdir(arxiv_data_path):
+                shutil.copytree(
+                    arxiv_data_path,
+                    os.path.join(
+                        data_dir, os.path.basename(directories.dirpath(dirkey))
+                    ),
+                    symlinks=True,
+                )
+
+        size = file_utils.get_disk_usage(data_dir)
+        if size > self.max_size:
+            logging.debug(
+                "Data for paper %s (%d bytes) is larger than the work cache. Not saving it.",
+                arxiv_id,
+                size,
+            )
+            shutil.rmtree(temp_dir)
+            return
+
+        with open(
+            os.path.join(temp_dir, "entry.json"), "w", encoding="utf-8"
+        ) as entry_file:
+            json.dump({"commands": command_names, "size": size}, entry_file)
+
+        with self._lock(exclusive=True):
+            entry_dir = self.get_entry_dir(arxiv_id)
+            if os.path.isdir(entry_dir):
+                shutil.rmtree(entry_dir)
+            os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+            os.rename(temp_dir, entry_dir)
+            self._evict()
+
+        logging.debug("Saved data for paper %s to %s.", arxiv_id, entry_dir)
+
+    def _evict(self) -> None:
+        " Evict least recently used entries until the cache fits. Call with the lock held. "
+
+        entries = []
+        for code_version in os.listdir(self.cache_dir):
+            code_version_dir = os.path.join(self.cache_dir, code_version)
+            if code_version.startswith(".") or not os.path.isdir(code_version_dir):
+                continue
+            for escaped_arxiv_id in os.listdir(code_version_dir):
+                entry_dir = os.path.join(code_version_dir, escaped_arxiv_id)
+                entry = _load_entry(entry_dir)
+                if entry is None:
+                    continue
+                last_used = os.stat(os.path.join(entry_dir, "entry.json")).st_mtime_ns
+                entries.append((last_used, entry.size, entry_dir))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, entry_dir in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            logging.debug("Evicting entry %s from the work cache.", entry_dir)
+            shutil.rmtree(entry_dir)
+            total_size -= size
+
+    @contextmanager
+    def _lock(self, exclusive: bool) -> Iterator[None]:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(os.path.join(self.cache_dir, ".lock"), "w") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(
+                    lock_file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+                )
+            yield
+
+
+def _load_entry(entry_dir: Path) -> Optional[CacheEntry]:
+    entry_path = os.path.join(entry_dir, "entry.json")
+    try:
+        with open(entry_path, encoding="utf-8") as entry_file:
+            data = json.load(entry_file)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logging.warning("Could not read work cache entry %s: %s", entry_path, e)
+        return None
+    return CacheEntry(commands=data["commands"], size=data["size"])
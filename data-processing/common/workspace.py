@@ -0,0 +1,196 @@
+"""
+Utilities for creating scratch copies of TeX source directories. Many stages of the pipeline
+(most notably entity location) need a private copy of a paper's sources in which a few files
+have been modified and which can then be compiled. Copying the full sources for every copy
+can cost more I/O than compiling them, as sources often include large figures. The helpers in
+this module instead create workspaces that share the contents of unmodified files with the
+original sources wherever that can be done safely.
+"""
+
+import errno
+import logging
+import os
+import shutil
+from dataclasses import dataclass
+from typing import Dict, Optional, Set
+
+from common.types import Path, RelativePath
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # type: ignore # pylint: disable=invalid-name
+
+# The 'FICLONE' request from <linux/fs.h>. Clones the contents of one file into another
+# without copying any data on file systems that support copy-on-write (e.g., Btrfs, XFS).
+FICLONE = 0x40049409
+
+WORKSPACE_STRATEGIES = ["copy", "link"]
+"""
+Strategies for creating workspaces:
+* 'copy': copy every file from the original sources.
+* 'link': clone files with copy-on-write reflinks where the file system supports them;
+  otherwise, hard link files that compilation only reads (see 'LINKABLE_EXTENSIONS') and
+  copy the rest.
+"""
+
+LINKABLE_EXTENSIONS = {
+    ".bmp",
+    ".eps",
+    ".gif",
+    ".jpeg",
+    ".jpg",
+    ".pdf",
+    ".png",
+    ".ps",
+    ".svg",
+    ".tif",
+    ".tiff",
+}
+"""
+Extensions of files that TeX compilation reads but never writes in place. Hard links share
+contents with the original file, so they are only safe for files that will not be rewritten. Files
+that share a name with a TeX file (e.g., 'main.pdf' next to 'main.tex') are never hard linked, as
+they may be overwritten by the compiler's output.
+"""
+
+
+@dataclass
+class WorkspaceStats:
+    files_copied: int = 0
+    files_linked: int = 0
+    " Number of files that share contents with the original, through a reflink or hard link. "
+
+    bytes_written: int = 0
+    " Number of bytes of file contents that had to be written to create the workspace. "
+
+
+def create_workspace(
+    sources_dir: Path,
+    workspace_dir: Path,
+    modified_files: Optional[Dict[RelativePath, bytes]] = None,
+    strategy: str = "link",
+) -> WorkspaceStats:
+    """
+    Create a workspace at 'workspace_dir' with the contents of 'sources_dir', where the files
+    in 'modified_files' (a map from paths relative to the workspace to their new contents) are
+    replaced with new contents. See 'WORKSPACE_STRATEGIES' for the available strategies.
+    """
+    if strategy not in WORKSPACE_STRATEGIES:
+        raise ValueError(f"Unknown workspace strategy '{strategy}'.")
+
+    modified_files = modified_files or {}
+    normalized_modified_files = {
+        os.path.normpath(path): contents for path, contents in modified_files.items()
+    }
+
+    stats = WorkspaceStats()
+    try_reflink = strategy == "link"
+    unsafe_to_link = _find_possible_output_files(sources_dir)
+
+    # Like 'shutil.copytree', symbolic links are followed, and the files they point to are copied.
+    for dirpath, _, filenames in os.walk(sources_dir, followlinks=True):
+        relative_dir = os.path.relpath(dirpath, sources_dir)
+        output_dir = os.path.normpath(os.path.join(workspace_dir, relative_dir))
+        os.makedirs(output_dir, exist_ok=True)
+        shutil.copystat(dirpath, output_dir)
+
+        for filename in filenames:
+            relative_path = os.path.normpath(os.path.join(relative_dir, filename))
+            if relative_path in normalized_modified_files:
+                continue
+
+            source_path = os.path.join(dirpath, filename)
+            output_path = os.path.join(output_dir, filename)
+
+            if try_reflink:
+                reflinked = _reflink(source_path, output_path)
+                if reflinked is None:
+                    # Reflinks aren't supported on this file system. Don't try again.
+                    try_reflink = False
+                elif reflinked:
+                    stats.files_linked += 1
+                    continue
+
+            _, ext = os.path.splitext(filename)
+            if (
+                strategy == "link"
+                and ext.lower() in LINKABLE_EXTENSIONS
+                and relative_path not in unsafe_to_link
+            ):
+                try:
+                    os.link(source_path, output_path)
+                    stats.files_linked += 1
+                    continue
+                except OSError as e:
+                    logging.debug(
+                        "Could not hard link %s to %s (%s). The file will be copied.",
+                        source_path,
+                        output_path,
+                        e,
+                    )
+
+            shutil.copy2(source_path, output_path)
+            stats.files_copied += 1
+            stats.bytes_written += os.path.getsize(output_path)
+
+    for relative_path, contents in normalized_modified_files.items():
+        output_path = os.path.join(workspace_dir, relative_path)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        with open(output_path, "wb") as file_:
+            file_.write(contents)
+        stats.files_copied += 1
+        stats.bytes_written += len(contents)
+
+    logging.debug(
+        "Created workspace %s from %s (%d file(s) copied, %d file(s) linked, %d bytes written).",
+        workspace_dir,
+        sources_dir,
+        stats.files_copied,
+        stats.files_linked,
+        stats.bytes_written,
+    )
+    return stats
+
+
+def _find_possible_output_files(sources_dir: Path) -> Set[RelativePath]:
+    " Find files that have the same name as a TeX file, and could be overwritten by a compiler. "
+    tex_stems = set()
+    other_files = []
+    for dirpath, _, filenames in os.walk(sources_dir, followlinks=True):
+        for filename in filenames:
+            relative_path = os.path.normpath(
+                os.path.relpath(os.path.join(dirpath, filename), sources_dir)
+            )
+            stem, ext = os.path.splitext(relative_path)
+            if ext == ".tex":
+                tex_stems.add(stem)
+            else:
+                other_files.append(relative_path)
+
+    return {p for p in other_files if os.path.splitext(p)[0] in tex_stems}
+
+
+def _reflink(source_path: Path, output_path: Path) -> Optional[bool]:
+    """
+    Attempt to clone a file with a copy-on-write reflink. Returns 'True' if the file was
+    cloned, 'False' if this file could not be cloned, and 'None' if the file system (or operating
+    system) does not support reflinks at all.
+    """
+    if fcntl is None:
+        return None
+
+    try:
+        with open(source_path, "rb") as source, open(output_path, "wb") as output:
+            fcntl.ioctl(output.fileno(), FICLONE, source.fileno())
+    except OSError as e:
+        if os.path.exists(output_path):
+            os.unlink(output_path)
+        # EOPNOTSUPP / ENOTTY (no support), EXDEV (different file systems), and EINVAL
+        # (file system doesn't implement the request) all mean reflinks won't work here.
+        if e.errno in (errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL):
+            return None
+        return False
+
+    shutil.copystat(source_path, output_path)
+    return True
@@ -46,7 +46,7 @@ class ResolveBibitems(ArxivBatchCommand[MatchTask, BibitemMatch]):
             metadata_dir = directories.arxiv_subdir("s2-metadata", arxiv_id)
 
             references_path = os.path.join(metadata_dir, "references.csv")
-            if not os.path.exists(references_path):
+            if not file_utils.data_file_exists(references_path):
                 logging.warning(
                     "Could not find %s, skipping reference resolution for paper %s",
                     references_path,
@@ -58,7 +58,7 @@ class ResolveBibitems(ArxivBatchCommand[MatchTask, BibitemMatch]):
             )
 
             bibitems_path = os.path.join(bibitems_dir, "entities.csv")
-            if not os.path.exists(bibitems_path):
+            if not file_utils.data_file_exists(bibitems_path):
                 logging.warning(
                     "Could not find %s, skipping reference resolution for paper %s",
                     bibitems_path,
@@ -48,7 +48,7 @@ class UploadCitations(DatabaseUploadCommand[CitationData, None]):
                 directories.arxiv_subdir("bibitem-resolutions", arxiv_id),
                 "resolutions.csv",
             )
-            if not os.path.exists(key_resolutions_path):
+            if not file_utils.data_file_exists(key_resolutions_path):
                 logging.warning(
                     "Could not find citation resolutions for %s. Skipping", arxiv_id
                 )
@@ -72,7 +72,7 @@ class UploadCitations(DatabaseUploadCommand[CitationData, None]):
             s2_metadata_path = os.path.join(
                 directories.arxiv_subdir("s2-metadata", arxiv_id), "references.csv"
             )
-            if not os.path.exists(s2_metadata_path):
+            if not file_utils.data_file_exists(s2_metadata_path):
                 logging.warning(
                     "Could not find S2 metadata file for citations for %s. Skipping",
                     arxiv_id,
@@ -1,7 +1,7 @@
 import os
 from typing import Optional
 
-from common import directories, file_utils
+from common import directories, file_utils, manifest
 from common.make_digest import make_default_paper_digest
 from common.types import ArxivId, EntityProcessingDigest
 
@@ -15,6 +15,8 @@ def make_digest(entity_name: str, arxiv_id: ArxivId) -> EntityProcessingDigest:
         num_extracted=count_entities_extracted(arxiv_id),
         num_hues_located=default_digest.num_hues_located,
         num_entities_located=count_entities_located(arxiv_id),
+        num_location_batches=default_digest.num_location_batches,
+        location_seconds_by_stage=default_digest.location_seconds_by_stage,
     )
 
 
@@ -43,6 +45,9 @@ def count_entities_extracted(arxiv_id: ArxivId) -> Optional[int]:
     bibitems_path = os.path.join(
         directories.arxiv_subdir("detected-citations", arxiv_id), "entities.csv"
     )
-    if not os.path.exists(bibitems_path):
+    if not file_utils.data_file_exists(bibitems_path):
         return None
+    num_bibitems = manifest.count_rows(bibitems_path)
+    if num_bibitems is not None:
+        return num_bibitems
     return len(list(file_utils.load_from_csv(bibitems_path, Bibitem)))
@@ -35,7 +35,7 @@ def load_located_citations(arxiv_id: ArxivId) -> Optional[Citations]:
         directories.arxiv_subdir("citations-locations", arxiv_id),
         "entity_locations.csv",
     )
-    if not os.path.exists(citation_locations_path):
+    if not file_utils.data_file_exists(citation_locations_path):
         logging.warning("Could not find citation locations for %s. Skipping", arxiv_id)
         return None
 
@@ -80,7 +80,7 @@ class TokenizeSentences(ArxivBatchCommand[Task, TokenizedSentence]):
                 directories.arxiv_subdir("detected-sentences", arxiv_id),
                 "entities.csv",
             )
-            if not os.path.exists(detected_sentences_path):
+            if not file_utils.data_file_exists(detected_sentences_path):
                 logging.warning(  # pylint: disable=logging-not-lazy
                     "No sentences data found for arXiv paper %s. Try re-running the pipeline, "
                     + "this time enabling the processing of sentences. If that doesn't work, "
@@ -1,4 +1,3 @@
-import glob
 import logging
 import os.path
 from abc import abstractmethod
@@ -82,7 +81,9 @@ class ExtractContextsCommand(ArxivBatchCommand[Task, Context]):
                 f"detected-{self.get_entity_name()}", arxiv_id
             )
             entities: List[SerializableEntity] = []
-            for entities_path in glob.glob(os.path.join(entities_dir, "entities*.csv")):
+            for entities_path in file_utils.glob_data_files(
+                entities_dir, "entities*.csv"
+            ):
                 entities.extend(
                     file_utils.load_from_csv(entities_path, self.get_entity_type())
                 )
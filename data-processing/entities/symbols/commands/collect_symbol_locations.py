@@ -38,7 +38,7 @@ class CollectSymbolLocations(ArxivBatchCommand[Locations, None]):
                 directories.arxiv_subdir("composite-symbols-locations", arxiv_id),
                 "symbol_locations.csv",
             )
-            if os.path.exists(composite_symbols_path):
+            if file_utils.data_file_exists(composite_symbols_path):
                 all_locations.extend(
                     file_utils.load_from_csv(composite_symbols_path, EntityLocationInfo)
                 )
@@ -52,7 +52,7 @@ class CollectSymbolLocations(ArxivBatchCommand[Locations, None]):
                 directories.arxiv_subdir("symbols-with-affixes-locations", arxiv_id),
                 "entity_locations.csv",
             )
-            if os.path.exists(symbols_with_affixes_path):
+            if file_utils.data_file_exists(symbols_with_affixes_path):
                 all_locations.extend(
                     file_utils.load_from_csv(
                         symbols_with_affixes_path, EntityLocationInfo
@@ -4,6 +4,7 @@ import os.path
 import subprocess
 from argparse import ArgumentParser
 from dataclasses import dataclass
+from tempfile import TemporaryDirectory
 from typing import Iterator, List, Optional, Set
 
 from common import directories, file_utils
@@ -58,6 +59,10 @@ class ExtractSymbols(ArxivBatchCommand[ArxivId, List[EquationSymbols]]):
     def get_description() -> str:
         return "Extract symbols and the tokens within them from TeX equations."
 
+    @staticmethod
+    def is_parallel_safe() -> bool:
+        return True
+
     @staticmethod
     def init_parser(parser: ArgumentParser) -> None:
         super(ExtractSymbols, ExtractSymbols).init_parser(parser)
@@ -86,21 +91,42 @@ class ExtractSymbols(ArxivBatchCommand[ArxivId, List[EquationSymbols]]):
             yield arxiv_id
 
     def process(self, item: ArxivId) -> Iterator[List[EquationSymbols]]:
-        equations_abs_path = os.path.abspath(
-            os.path.join(
-                directories.arxiv_subdir("detected-equations", item), "entities.csv"
-            )
-        )
-        node_directory_abs_path = os.path.abspath(directories.NODE_DIRECTORY)
-        equations_relative_path = os.path.relpath(
-            equations_abs_path, node_directory_abs_path
+        equations_path = os.path.join(
+            directories.arxiv_subdir("detected-equations", item), "entities.csv"
         )
-        if not os.path.exists(equations_abs_path):
+        if not file_utils.data_file_exists(equations_path):
             logging.warning(
                 "No directory of equations for arXiv ID %s. Skipping.", item
             )
             return
 
+        with TemporaryDirectory() as temp_dir:
+            # The equation parser only reads CSV files. Equations saved in another format (see
+            # '--storage-format') are exported to a CSV file for it.
+            if file_utils.get_data_path(equations_path) != equations_path:
+                exported_path = os.path.join(temp_dir, "entities.csv")
+                file_utils.export_to_csv(equations_path, exported_path)
+                equations_path = exported_path
+            result = self._parse_equations(equations_path)
+
+        if result.returncode == 0:
+            yield _get_symbol_data(item, result.stdout)
+        else:
+            logging.error(
+                "Equation parsing for %s unexpectedly failed.\nStdout: %s\nStderr: %s\n",
+                item,
+                result.stdout,
+                result.stderr,
+            )
+
+    def _parse_equations(
+        self, equations_path: str
+    ) -> "subprocess.CompletedProcess[str]":
+        node_directory_abs_path = os.path.abspath(directories.NODE_DIRECTORY)
+        equations_relative_path = os.path.relpath(
+            os.path.abspath(equations_path), node_directory_abs_path
+        )
+
         command_args = [
             "npm",
             # Suppress boilerplate 'npm' output we don't care about.
@@ -116,7 +142,7 @@ class ExtractSymbols(ArxivBatchCommand[ArxivId, List[EquationSymbols]]):
         command_args += ["--error-color", KATEX_ERROR_COLOR]
 
         logging.debug("Running command with arguments: %s", command_args)
-        result = subprocess.run(
+        return subprocess.run(
             command_args,
             cwd=directories.NODE_DIRECTORY,
             stdout=subprocess.PIPE,
@@ -125,16 +151,6 @@ class ExtractSymbols(ArxivBatchCommand[ArxivId, List[EquationSymbols]]):
             check=False,
         )
 
-        if result.returncode == 0:
-            yield _get_symbol_data(item, result.stdout)
-        else:
-            logging.error(
-                "Equation parsing for %s unexpectedly failed.\nStdout: %s\nStderr: %s\n",
-                item,
-                result.stdout,
-                result.stderr,
-            )
-
     def save(self, item: ArxivId, result: List[EquationSymbols]) -> None:
         tokens_dir = directories.arxiv_subdir("detected-equation-tokens", item)
         if not os.path.exists(tokens_dir):
@@ -46,7 +46,7 @@ def upload_symbols(
         directories.arxiv_subdir("symbol-matches", processing_summary.arxiv_id),
         "matches.csv",
     )
-    if os.path.exists(matches_path):
+    if file_utils.data_file_exists(matches_path):
         for match in file_utils.load_from_csv(matches_path, Match):
             if match.queried_mathml not in matches:
                 matches[match.queried_mathml] = []
@@ -62,7 +62,7 @@ def upload_symbols(
     children_path = os.path.join(
         directories.arxiv_subdir("detected-symbols", arxiv_id), "symbol_children.csv"
     )
-    if os.path.exists(children_path):
+    if file_utils.data_file_exists(children_path):
         for parent in file_utils.load_from_csv(children_path, SerializableChild):
             pid = f"{parent.tex_path}-{parent.equation_index}-{parent.symbol_index}"
             cid = f"{parent.tex_path}-{parent.equation_index}-{parent.child_index}"
@@ -79,7 +79,7 @@ def upload_symbols(
     contexts_path = os.path.join(
         directories.arxiv_subdir("contexts-for-symbols", arxiv_id), "contexts.csv",
     )
-    if not os.path.exists(contexts_path):
+    if not file_utils.data_file_exists(contexts_path):
         logging.warning(  # pylint: disable=logging-not-lazy
             "Contexts have not been found for symbols for arXiv paper %s. "
             + "Symbol data will be uploaded without contexts.",
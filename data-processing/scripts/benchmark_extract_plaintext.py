@@ -0,0 +1,75 @@
+"""
+Benchmark extracting plaintext from a long paper's TeX with 'extract_plaintext', and compare
+making the edits that extraction makes to a 'JournaledString' one at a time (with 'edit') to
+making them all at once (with 'edit_many').
+
+TeX is made from the snippets of TeX in the tests (see 'benchmark_scan_tex'), repeated until
+the TeX is as large as requested.
+
+Example usage:
+
+python -m scripts.benchmark_extract_plaintext --size 50000
+"""
+
+import time
+from argparse import ArgumentParser
+from typing import List
+
+from common.parse_tex import extract_plaintext
+from common.scan_tex import Pattern, scan_tex
+from common.string import Edit, JournaledString
+from scripts.benchmark_scan_tex import load_tex_snippets, make_tex
+
+
+def make_edits(tex: str) -> List[Edit]:
+    """
+    Make edits like the ones 'extract_plaintext' makes: remove macros and braces, and replace
+    line breaks with newlines.
+    """
+    patterns = [
+        Pattern("macro", r"\\[a-zA-Z]+\*?[ \t]*"),
+        Pattern("brace", r"[{}]"),
+        Pattern("line_break", r"\\\\"),
+    ]
+    return [
+        Edit(m.start, m.end, "\n" if m.pattern.name == "line_break" else "")
+        for m in scan_tex(tex, patterns)
+    ]
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Benchmark extraction of plaintext from TeX with JournaledString."
+    )
+    parser.add_argument(
+        "--size", type=int, default=50000, help="Size of TeX in bytes."
+    )
+    parser.add_argument("--tests-dir", default="tests")
+    args = parser.parse_args()
+
+    tex = make_tex(load_tex_snippets(args.tests_dir), args.size)
+    print(f"{len(tex)} character(s) of TeX.")
+
+    start = time.perf_counter()
+    plaintext = extract_plaintext("main.tex", tex)
+    print(
+        f"Extracted {len(plaintext)} character(s) of plaintext in "
+        + f"{time.perf_counter() - start:.3f}s."
+    )
+
+    edits = make_edits(tex)
+    print(f"Making {len(edits)} edit(s) to the TeX.")
+
+    start = time.perf_counter()
+    edited = JournaledString(tex)
+    for edit in reversed(edits):
+        edited = edited.edit(edit.start, edit.end, edit.replacement)
+    print(f"{'one at a time':<16}{time.perf_counter() - start:>10.3f}s")
+
+    start = time.perf_counter()
+    batch_edited = JournaledString(tex).edit_many(edits)
+    print(f"{'all at once':<16}{time.perf_counter() - start:>10.3f}s")
+
+    assert (
+        batch_edited.segments == edited.segments
+    ), "Edits should produce same journal."
@@ -0,0 +1,135 @@
+"""
+Benchmark the search for colorized entities in rasters of pages. Compares building an index of
+the hues on a page for each hue that is searched for (which is what happens when 'HueIndex'
+objects aren't shared between calls) to building one index per page and sharing it across hues.
+
+Pages are synthetic: white pages with lines of black text, where a number of words have been
+colored with one of 'num_hues' distinct hues, like the pages compared by 'locate_entities'.
+
+Example usage:
+
+python scripts/benchmark_hue_index.py --pages 10 --hues 30
+"""
+
+import time
+from argparse import ArgumentParser
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+from common.bounding_box import HueIndex, extract_bounding_boxes
+from common.colorize_tex import HUES
+from common.locate_entities import has_hue_shifted, index_fill_changes
+from common.types import BoundingBox
+
+PagePair = Tuple[np.ndarray, np.ndarray]
+
+
+def create_synthetic_page(
+    random: np.random.RandomState, width: int, height: int, hues: List[float]
+) -> PagePair:
+    """
+    Create a pair of images of one page: one of the page in black and white, and one where a
+    subset of words on the page have been colorized.
+    """
+    original = np.full((height, width, 3), 255, dtype=np.uint8)
+    colorized = original.copy()
+
+    LINE_HEIGHT = 14
+    WORD_HEIGHT = 9
+    for top in range(40, height - 40, LINE_HEIGHT):
+        left = 50
+        while left < width - 100:
+            word_width = random.randint(10, 60)
+            original[top : top + WORD_HEIGHT, left : left + word_width] = 0
+            colorized[top : top + WORD_HEIGHT, left : left + word_width] = 0
+            if random.random_sample() < 0.2:
+                hue = hues[random.randint(len(hues))]
+                hsv = np.uint8([[[round(hue * 180) % 180, 255, 255]]])
+                bgr = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)[0, 0]
+                colorized[top : top + WORD_HEIGHT, left : left + word_width] = bgr
+            left += word_width + 6
+
+    return original, colorized
+
+
+def diff(original: np.ndarray, colorized: np.ndarray) -> np.ndarray:
+    diff_image = colorized.copy()
+    diff_image[np.all(original == colorized, axis=2)] = 255
+    return diff_image
+
+
+def locate_with_index_per_hue(
+    pages: List[PagePair], hues: List[float]
+) -> Tuple[Dict[float, List[BoundingBox]], int]:
+    boxes: Dict[float, List[BoundingBox]] = {}
+    num_shifted = 0
+    for page_number, (original, colorized) in enumerate(pages):
+        diff_image = diff(original, colorized)
+        for hue in hues:
+            boxes.setdefault(hue, []).extend(
+                extract_bounding_boxes(diff_image, page_number, hue)
+            )
+            num_shifted += int(has_hue_shifted(original, colorized, hue))
+    return boxes, num_shifted
+
+
+def locate_with_index_per_page(
+    pages: List[PagePair], hues: List[float]
+) -> Tuple[Dict[float, List[BoundingBox]], int]:
+    boxes: Dict[float, List[BoundingBox]] = {}
+    num_shifted = 0
+    for page_number, (original, colorized) in enumerate(pages):
+        diff_image = diff(original, colorized)
+        hue_index = HueIndex.for_saturated_pixels(diff_image)
+        shift_index = index_fill_changes(original, colorized)
+        for hue in hues:
+            boxes.setdefault(hue, []).extend(
+                extract_bounding_boxes(
+                    diff_image, page_number, hue, hue_index=hue_index
+                )
+            )
+            num_shifted += int(
+                has_hue_shifted(original, colorized, hue, shift_index=shift_index)
+            )
+    return boxes, num_shifted
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Benchmark search for hues in page rasters.")
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument(
+        "--hues", type=int, default=len(HUES), help="Number of hues (at most 30)."
+    )
+    parser.add_argument(
+        "--width", type=int, default=1275, help="Width of each page in pixels."
+    )
+    parser.add_argument(
+        "--height", type=int, default=1650, help="Height of each page in pixels."
+    )
+    args = parser.parse_args()
+
+    benchmark_hues = list(HUES)[: args.hues]
+    random_state = np.random.RandomState(0)
+    benchmark_pages = [
+        create_synthetic_page(random_state, args.width, args.height, benchmark_hues)
+        for _ in range(args.pages)
+    ]
+
+    print(
+        f"{args.pages} page(s) of {args.width}x{args.height} pixels, {args.hues} hue(s)."
+    )
+    results = {}
+    for name, locate in [
+        ("index per hue", locate_with_index_per_hue),
+        ("index per page", locate_with_index_per_page),
+    ]:
+        start = time.perf_counter()
+        results[name] = locate(benchmark_pages, benchmark_hues)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<16}{elapsed:>10.3f}s")
+
+    assert (
+        results["index per hue"] == results["index per page"]
+    ), "Both approaches should locate the same boxes."
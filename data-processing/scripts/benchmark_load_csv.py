@@ -0,0 +1,106 @@
+"""
+Benchmark loading rows from CSV files with 'file_utils.load_from_csv'. Compares decoders that
+are made once for each dataclass (which is what 'load_from_csv' does) to inspecting the type of
+every field for every row (which is what 'load_from_csv' used to do).
+
+Rows are synthetic symbols, like those saved to 'detected-symbols/<arxiv-id>/entities.csv'.
+
+Example usage:
+
+python scripts/benchmark_load_csv.py --rows 500000
+"""
+
+import ast
+import csv
+import dataclasses
+import os
+import re
+import time
+from argparse import ArgumentParser
+from tempfile import TemporaryDirectory
+from typing import Any, Dict, Iterator, List, Optional
+
+from common import file_utils
+from common.types import SerializableSymbol
+
+
+def create_symbol(index: int) -> SerializableSymbol:
+    equation_index, symbol_index = divmod(index, 10)
+    return SerializableSymbol(
+        tex_path="main.tex",
+        id_=f"{equation_index}-{symbol_index}",
+        start=index * 5,
+        end=index * 5 + 1,
+        tex="x",
+        context_tex="",
+        equation_index=equation_index,
+        symbol_index=symbol_index,
+        equation=f"x_{{{equation_index}}} = y + z",
+        mathml="<mi>x</mi>",
+        type_="identifier",
+        is_definition=index % 7 == 0,
+        relative_start=symbol_index,
+        relative_end=symbol_index + 1,
+        contains_affix=False,
+    )
+
+
+def load_with_field_inspection(csv_path: str) -> Iterator[SerializableSymbol]:
+    """
+    Load symbols, checking the type of each field for each row. Supports the field types of
+    'SerializableSymbol' using the same checks that 'load_from_csv' used to make for every row.
+    """
+    with open(csv_path, encoding="utf-8", newline="") as csv_file:
+        for row in csv.DictReader(csv_file, quoting=csv.QUOTE_MINIMAL):
+            data: Dict[str, Any] = {}
+            for field in dataclasses.fields(SerializableSymbol):
+                type_ = field.type
+                if type_ in [
+                    Optional[bool],
+                    Optional[int],
+                    Optional[float],
+                    Optional[str],
+                ]:
+                    type_ = bool if type_ == Optional[bool] else str
+                if type_ == bool:
+                    data[field.name] = bool(ast.literal_eval(row[field.name]))
+                elif type_ in [int, float, str]:
+                    data[field.name] = type_(row[field.name])
+                elif field.type == List[str]:
+                    data[field.name] = ast.literal_eval(row[field.name])
+                elif re.match(r".*Literal\[('[^']*')(, '[^']*')*\]", repr(type_)):
+                    data[field.name] = str(row[field.name])
+            yield SerializableSymbol(**data)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Benchmark loading of rows from CSV files.")
+    parser.add_argument("--rows", type=int, default=500000)
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as output_dir:
+        path = os.path.join(output_dir, "entities.csv")
+        with file_utils.csv_writer_session():
+            for i in range(args.rows):
+                file_utils.append_to_csv(path, create_symbol(i))
+        print(
+            f"{args.rows} row(s) of {SerializableSymbol.__name__} "
+            + f"({os.path.getsize(path) / 1e6:.1f} MB)."
+        )
+
+        results = {}
+        for name, load in [
+            ("field inspection", load_with_field_inspection),
+            (
+                "cached decoders",
+                lambda p: file_utils.load_from_csv(p, SerializableSymbol),
+            ),
+        ]:
+            start = time.perf_counter()
+            results[name] = list(load(path))
+            elapsed = time.perf_counter() - start
+            print(f"{name:<20}{elapsed:>10.3f}s")
+
+    assert (
+        results["field inspection"] == results["cached decoders"]
+    ), "Both loaders should load the same symbols."
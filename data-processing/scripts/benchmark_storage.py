@@ -0,0 +1,93 @@
+"""
+Benchmark the formats that intermediate data can be stored in (see 'file_utils.STORAGE_FORMATS').
+For each format, rows are appended with 'append_to_csv' both one file write at a time and within
+a writer session (which is how most commands save data), and then loaded back with
+'load_from_csv'. Reports write throughput, read time, and size on disk.
+
+Rows are synthetic locations of equation tokens, the largest files the pipeline writes for most
+papers.
+
+Example usage:
+
+python scripts/benchmark_storage.py --rows 100000
+"""
+
+import os
+import time
+from argparse import ArgumentParser
+from contextlib import ExitStack
+from tempfile import TemporaryDirectory
+from typing import List
+
+import numpy as np
+
+from common import file_utils
+from common.types import HueLocationInfo
+
+
+def create_rows(count: int) -> List[HueLocationInfo]:
+    random = np.random.RandomState(0)
+    rows = []
+    for i in range(count):
+        equation_index, start = divmod(i, 20)
+        rows.append(
+            HueLocationInfo(
+                left=float(random.random_sample()),
+                top=float(random.random_sample()),
+                width=float(random.random_sample() * 0.1),
+                height=0.01,
+                page=int(random.randint(20)),
+                tex_path="main.tex",
+                entity_id=f"{equation_index}-{start}-{start + 1}",
+                iteration=f"main.tex-{i // 300}-0",
+                hue=float(random.random_sample()),
+            )
+        )
+    return rows
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Benchmark storage formats for intermediate data."
+    )
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    benchmark_rows = create_rows(args.rows)
+    print(f"{args.rows} row(s) of {HueLocationInfo.__name__}.")
+    print(
+        f"{'format':<10}{'session':<10}{'rows/s written':>16}{'read (s)':>12}"
+        + f"{'size (MB)':>12}"
+    )
+
+    loaded_rows = {}
+    with TemporaryDirectory() as output_dir:
+        for storage_format in file_utils.STORAGE_FORMATS:
+            file_utils.set_storage_format(storage_format)
+            for in_session in [False, True]:
+                name = f"{storage_format}-{'session' if in_session else 'rows'}"
+                path = os.path.join(output_dir, f"{name}.csv")
+
+                start = time.perf_counter()
+                with ExitStack() as stack:
+                    if in_session:
+                        stack.enter_context(file_utils.csv_writer_session())
+                    for row in benchmark_rows:
+                        file_utils.append_to_csv(path, row)
+                write_time = time.perf_counter() - start
+
+                start = time.perf_counter()
+                loaded_rows[name] = list(
+                    file_utils.load_from_csv(path, HueLocationInfo)
+                )
+                read_time = time.perf_counter() - start
+
+                size = os.path.getsize(file_utils.get_data_path(path)) / 1e6
+                print(
+                    f"{storage_format:<10}{'yes' if in_session else 'no':<10}"
+                    + f"{args.rows / write_time:>16.0f}{read_time:>12.3f}{size:>12.2f}"
+                )
+
+    assert all(
+        rows == benchmark_rows for rows in loaded_rows.values()
+    ), "All formats should load the rows that were saved."
@@ -0,0 +1,127 @@
+"""
+Benchmark the cost of creating scratch copies of TeX sources for each batch of entities
+located by 'LocateEntitiesCommand'. Compares the legacy approach (two full copies of the sources
+per batch, through 'shutil.copytree') to workspaces created with 'create_workspace'.
+
+Example usage, to create 50 workspaces from synthetic sources with 100MB of figures:
+
+python scripts/benchmark_workspaces.py --batches 50 --figures 20 --figure-size 5000000
+"""
+
+import os
+import shutil
+import time
+from argparse import ArgumentParser
+from tempfile import TemporaryDirectory
+from typing import Callable, Dict
+
+from common.types import Path
+from common.workspace import create_workspace
+
+MAIN_TEX = "main.tex"
+
+
+def create_synthetic_sources(
+    sources_dir: Path, num_tex_files: int, num_figures: int, figure_size: int
+) -> None:
+    with open(os.path.join(sources_dir, MAIN_TEX), "w") as main_file:
+        main_file.write("\\documentclass{article}\n\\begin{document}\n")
+        for i in range(num_tex_files):
+            main_file.write(f"\\input{{section{i}}}\n")
+        main_file.write("\\end{document}\n")
+
+    for i in range(num_tex_files):
+        with open(os.path.join(sources_dir, f"section{i}.tex"), "w") as section_file:
+            section_file.write("Lorem ipsum dolor sit amet. " * 2000)
+
+    figures_dir = os.path.join(sources_dir, "figures")
+    os.makedirs(figures_dir)
+    for i in range(num_figures):
+        with open(os.path.join(figures_dir, f"figure{i}.png"), "wb") as figure_file:
+            figure_file.write(os.urandom(figure_size))
+
+
+def directory_size(dir_: Path) -> int:
+    size = 0
+    for dirpath, _, filenames in os.walk(dir_):
+        for filename in filenames:
+            size += os.path.getsize(os.path.join(dirpath, filename))
+    return size
+
+
+def copytree_batch(sources_dir: Path, batch_dir: Path, colorized_tex: bytes) -> int:
+    " Mirrors what was done for each batch before workspaces were introduced. "
+    colorized_dir = os.path.join(batch_dir, "colorized")
+    compiled_dir = os.path.join(batch_dir, "compiled")
+    shutil.copytree(sources_dir, colorized_dir)
+    with open(os.path.join(colorized_dir, MAIN_TEX), "wb") as tex_file:
+        tex_file.write(colorized_tex)
+    shutil.copytree(colorized_dir, compiled_dir)
+    return directory_size(colorized_dir) + directory_size(compiled_dir)
+
+
+def make_workspace_batch(strategy: str) -> Callable[[Path, Path, bytes], int]:
+    def workspace_batch(
+        sources_dir: Path, batch_dir: Path, colorized_tex: bytes
+    ) -> int:
+        colorized_dir = os.path.join(batch_dir, "colorized")
+        os.makedirs(colorized_dir)
+        with open(os.path.join(colorized_dir, MAIN_TEX), "wb") as tex_file:
+            tex_file.write(colorized_tex)
+        stats = create_workspace(
+            sources_dir,
+            os.path.join(batch_dir, "compiled"),
+            {MAIN_TEX: colorized_tex},
+            strategy=strategy,
+        )
+        return len(colorized_tex) + stats.bytes_written
+
+    return workspace_batch
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Benchmark creation of per-batch workspaces.")
+    parser.add_argument("--batches", type=int, default=20)
+    parser.add_argument("--tex-files", type=int, default=10)
+    parser.add_argument("--figures", type=int, default=20)
+    parser.add_argument(
+        "--figure-size", type=int, default=1000000, help="Size of each figure in bytes."
+    )
+    parser.add_argument(
+        "--dir",
+        type=str,
+        default=None,
+        help=(
+            "Directory in which to create temporary files. Set this to a directory on the "
+            + "file system where the pipeline will run, as the availability of reflinks "
+            + "depends on the file system."
+        ),
+    )
+    args = parser.parse_args()
+
+    approaches: Dict[str, Callable[[Path, Path, bytes], int]] = {
+        "copytree": copytree_batch,
+        "workspace (copy)": make_workspace_batch("copy"),
+        "workspace (link)": make_workspace_batch("link"),
+    }
+
+    with TemporaryDirectory(dir=args.dir) as temp_dir:
+        sources = os.path.join(temp_dir, "sources")
+        os.makedirs(sources)
+        create_synthetic_sources(
+            sources, args.tex_files, args.figures, args.figure_size
+        )
+        with open(os.path.join(sources, MAIN_TEX), "rb") as main_tex_file:
+            colorized = main_tex_file.read() + b"\n% Colorized.\n"
+
+        print(f"Sources: {directory_size(sources)} bytes, {args.batches} batches.")
+        print(f"{'Approach':<20}{'Bytes written':>16}{'Elapsed (s)':>14}")
+        for name, create_batch in approaches.items():
+            bytes_written = 0
+            start = time.perf_counter()
+            for batch_index in range(args.batches):
+                batch_dir = os.path.join(temp_dir, f"batch-{batch_index}")
+                bytes_written += create_batch(sources, batch_dir, colorized)
+                shutil.rmtree(batch_dir)
+            elapsed = time.perf_counter() - start
+            print(f"{name:<20}{bytes_written:>16}{elapsed:>14.3f}")
@@ -1,12 +1,14 @@
-from typing import Dict, List
+from typing import Any, Dict, List, Set
 
-from common.commands.base import Command, CommandList
+from common import file_utils
+from common.commands.base import Command, CommandList, process_items
 from common.commands.compile_tex import CompileNormalizedTexSources, CompileTexSources
 from common.commands.fetch_arxiv_sources import FetchArxivSources
 from common.commands.fetch_s2_data import FetchS2Metadata
 from common.commands.normalize_tex import NormalizeTexSources
 from common.commands.raster_pages import RasterPages
 from common.commands.unpack_sources import UnpackSources
+from common.types import ArxivId
 
 # Force the importing of modules for entity processing. This forces a call from each of the entity
 # modules to register pipelines for processing each entity. If these aren't imported,
@@ -90,7 +92,36 @@ for pipeline in entity_pipelines:
                 commands_by_entity[entity_name].append(c)
 
 
-def run_command(cmd: Command) -> None:  # type: ignore
-    for item in cmd.load():
-        for result in cmd.process(item):
+def run_command(cmd: Command, process_workers: int = 1) -> Set[ArxivId]:  # type: ignore
+    """
+    Run a command, saving each result as soon as it is available. If the command is parallel-safe,
+    up to 'process_workers' items will be processed at once. Results are saved in the order that
+    items were loaded. Files that results are appended to are kept open while the command runs,
+    and are written to disk each time the command moves on to a new item. Returns the arXiv IDs
+    of the papers that the command loaded items for and processed all of them, whether or not any
+    results were saved. If an item doesn't belong to one paper, processing it counts for all of the
+    papers the command was run for.
+    """
+    processed_arxiv_ids: Set[ArxivId] = set()
+
+    def item_done(item: Any) -> None:
+        processed_arxiv_ids.update(_get_arxiv_ids(cmd, item))
+
+    with file_utils.csv_writer_session() as session:
+        last_item = None
+        for item, result in process_items(cmd, process_workers, item_done):
+            if item is not last_item:
+                session.flush()
+                last_item = item
             cmd.save(item, result)
+    return processed_arxiv_ids
+
+
+def _get_arxiv_ids(cmd: Command, item: Any) -> List[ArxivId]:  # type: ignore
+    " Get the arXiv IDs of the papers an item loaded by a command belongs to. "
+    if isinstance(item, str):
+        return [item]
+    arxiv_id = getattr(item, "arxiv_id", None)
+    if isinstance(arxiv_id, str):
+        return [arxiv_id]
+    return list(getattr(cmd.args, "arxiv_ids", None) or [])
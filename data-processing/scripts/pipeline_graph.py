@@ -0,0 +1,206 @@
+"""
+Run entity pipelines as a graph of dependencies, rather than as one list of commands. A pipeline
+is started as soon as all of the pipelines it depends on have finished, so that pipelines that
+don't depend on each other (e.g., citations and symbols) can be run at the same time.
+"""
+
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Tuple
+
+from common.commands.base import CommandList
+from common.commands.locate_entities import LocateEntitiesCommand
+
+from scripts.pipelines import EntityPipeline
+
+CommandNames = List[str]
+
+
+@dataclass(frozen=True)
+class ResourceBudget:
+    cpus: int
+    " Number of processors that pipelines can use at once. "
+
+    compile_slots: int
+    " Number of TeX compilations that pipelines can run at once. "
+
+
+@dataclass(frozen=True)
+class PipelineTask:
+    " The commands from one entity pipeline that will be run, and the resources they need. "
+
+    entity_name: str
+    commands: CommandList
+    depends_on: List[str]
+    """
+    Names of the other tasks in the graph that must finish before this one starts. This includes
+    the optional dependencies of the pipeline, when those dependencies are being run.
+    """
+
+    cpus: int = 1
+    compile_slots: int = 0
+
+
+PipelineGraph = Dict[str, PipelineTask]
+" Map from entity names to tasks. Tasks appear in the order they would be run one at a time. "
+
+
+@dataclass(frozen=True)
+class TaskTiming:
+    start: float
+    end: float
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+def build_pipeline_graph(
+    commands: CommandList, pipelines: List[EntityPipeline], batch_workers: int = 1,
+) -> PipelineGraph:
+    """
+    Group 'commands' into tasks, one for each of the 'pipelines' that has commands in 'commands'.
+    The order of commands within each task is kept, and tasks are in the order of 'pipelines'.
+    Commands that don't belong to any pipeline are not included in the graph. Dependencies on
+    pipelines that aren't in the graph are dropped, as they are assumed to have been run
+    before, as they are when the pipeline is run one command at a time. Pipelines that locate
+    entities are assumed to use 'batch_workers' processors and compilation slots.
+    """
+
+    # If a command belongs to more than one pipeline, it is only run by the first.
+    commands_by_pipeline: Dict[str, CommandList] = {}
+    for pipeline in pipelines:
+        commands_by_pipeline[pipeline.entity_name] = [
+            c
+            for c in commands
+            if c in pipeline.commands
+            and not any(c in other for other in commands_by_pipeline.values())
+        ]
+
+    graph: PipelineGraph = {}
+    for pipeline in pipelines:
+        pipeline_commands = commands_by_pipeline[pipeline.entity_name]
+        if not pipeline_commands:
+            continue
+        locates_entities = any(
+            issubclass(c, LocateEntitiesCommand) for c in pipeline_commands
+        )
+        graph[pipeline.entity_name] = PipelineTask(
+            pipeline.entity_name,
+            pipeline_commands,
+            depends_on=[
+                d
+                for d in pipeline.depends_on + pipeline.optional_depends_on
+                if commands_by_pipeline.get(d)
+            ],
+            cpus=batch_workers if locates_entities else 1,
+            compile_slots=batch_workers if locates_entities else 0,
+        )
+
+    return graph
+
+
+def _run_timed(
+    run_commands: Callable[[CommandNames], None], command_names: CommandNames
+) -> TaskTiming:
+    start = time.time()
+    run_commands(command_names)
+    return TaskTiming(start, time.time())
+
+
+def run_pipeline_graph(
+    graph: PipelineGraph,
+    run_commands: Callable[[CommandNames], None],
+    executor: Executor,
+    budget: ResourceBudget,
+) -> Dict[str, TaskTiming]:
+    """
+    Run the tasks in 'graph' on 'executor', starting each task once the tasks it depends on have
+    finished and there are enough resources in the budget to run it. A task that needs more
+    resources than the budget allows is run on its own. Tasks are submitted as a call to
+    'run_commands' with the names of the task's commands, as command classes cannot always be
+    sent to other processes. If a task fails, no more tasks are started, and the exception is
+    raised once the tasks that are already running have finished.
+    """
+
+    pending = list(graph.keys())
+    running: Dict[Future, str] = {}  # type: ignore
+    timings: Dict[str, TaskTiming] = {}
+    cpus_in_use = 0
+    compile_slots_in_use = 0
+
+    while pending or running:
+        for entity_name in list(pending):
+            task = graph[entity_name]
+            if not all(d in timings for d in task.depends_on):
+                continue
+            fits_in_budget = (
+                cpus_in_use + task.cpus <= budget.cpus
+                and compile_slots_in_use + task.compile_slots <= budget.compile_slots
+            )
+            if running and not fits_in_budget:
+                continue
+
+            logging.debug("Starting commands for pipeline %s", entity_name)
+            future = executor.submit(
+                _run_timed, run_commands, [c.get_name() for c in task.commands]
+            )
+            running[future] = entity_name
+            pending.remove(entity_name)
+            cpus_in_use += task.cpus
+            compile_slots_in_use += task.compile_slots
+
+        if not running:
+            raise ValueError(
+                f"Pipelines {pending} depend on each other and can never be started."
+            )
+
+        finished, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in finished:
+            task = graph[running.pop(future)]
+            cpus_in_use -= task.cpus
+            compile_slots_in_use -= task.compile_slots
+            if future.exception() is not None:
+                pending.clear()
+                wait(running)
+                raise future.exception()  # type: ignore
+            timings[task.entity_name] = future.result()
+            logging.debug(
+                "Finished commands for pipeline %s in %.1f seconds",
+                task.entity_name,
+                timings[task.entity_name].duration,
+            )
+
+    return timings
+
+
+def find_critical_path(
+    graph: PipelineGraph, timings: Dict[str, TaskTiming]
+) -> Tuple[List[str], float]:
+    """
+    Find the chain of dependent tasks that took the longest to run, given how long each task took.
+    The length of the critical path is the shortest time the graph could be run in with unlimited
+    resources. Returns the names of the tasks on the path, in order, and the length of the path.
+    """
+
+    longest: Dict[str, Tuple[List[str], float]] = {}
+
+    def find_longest_path(entity_name: str) -> Tuple[List[str], float]:
+        if entity_name not in longest:
+            path: List[str] = []
+            length = 0.0
+            for dependency in graph[entity_name].depends_on:
+                dependency_path, dependency_length = find_longest_path(dependency)
+                if dependency_length > length:
+                    path, length = dependency_path, dependency_length
+            longest[entity_name] = (
+                path + [entity_name],
+                length + timings[entity_name].duration,
+            )
+        return longest[entity_name]
+
+    if not graph:
+        return [], 0.0
+    return max((find_longest_path(e) for e in graph), key=lambda p: p[1])
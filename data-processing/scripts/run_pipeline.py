@@ -1,13 +1,18 @@
+import functools
 import logging
+import multiprocessing
 import os
 import sys
 import uuid
 from argparse import ArgumentParser, Namespace
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
-from typing import List
+from typing import List, Tuple, Type
 
-from common import directories, email, file_utils
+from common import checkpoints, directories, email, file_utils
+from common.colorize_tex import PALETTES
 from common.commands.base import (
+    Command,
     CommandList,
     add_arxiv_id_filter_args,
     create_args,
@@ -26,77 +31,322 @@ from common.commands.store_pipeline_log import StorePipelineLog
 from common.commands.store_results import DEFAULT_S3_LOGS_BUCKET, StoreResults
 from common.fetch_arxiv import FetchFromArxivException
 from common.make_digest import make_paper_digest
+from common.retention import (
+    RETAINED_FILE_PATTERNS,
+    RETENTION_POLICIES,
+    DataRetention,
+    DiskBudgetExceededException,
+)
 from common.types import PipelineDigest
+from common.work_cache import WorkCache, get_code_version
 
 from scripts.commands import (
     ENTITY_COMMANDS,
     TEX_PREPARATION_COMMANDS,
     commands_by_entity,
+    pipelines_ordered,
     run_command,
 )
 from scripts.job_config import fetch_config, load_job_from_s3
+from scripts.pipeline_graph import (
+    ResourceBudget,
+    build_pipeline_graph,
+    find_critical_path,
+    run_pipeline_graph,
+)
 from scripts.pipelines import entity_pipelines
 
 DEFAULT_ENTITIES = ["citations", "symbols", "definitions"]
 RETRYABLE_FAILURE_RETURN_CODE = 100
 
 
+def run_command_for_arxiv_ids(
+    CommandCls: Type[Command], arxiv_id_list: List[str], pipeline_args: Namespace,
+) -> None:
+    """
+    Run a pipeline command for a list of arXiv IDs. If the pipeline is resuming, papers that the
+    command has already finished running for are skipped.
+    """
+
+    if pipeline_args.resume:
+        completed = [
+            arxiv_id
+            for arxiv_id in arxiv_id_list
+            if CommandCls.get_name() in checkpoints.load_completed_commands(arxiv_id)
+        ]
+        if completed:
+            logging.info(
+                "Skipping command %s for papers %s, as it already finished for them.",
+                CommandCls.get_name(),
+                completed,
+            )
+        arxiv_id_list = [i for i in arxiv_id_list if i not in completed]
+        if not arxiv_id_list:
+            return
+
+    # Initialize arguments for each command to defaults.
+    command_args_parser = ArgumentParser()
+    CommandCls.init_parser(command_args_parser)
+    command_args = command_args_parser.parse_known_args("")[0]
+
+    # Pass pipeline arguments to command.
+    command_args.arxiv_ids = arxiv_id_list
+    command_args.arxiv_ids_file = None
+    command_args.v = pipeline_args.v
+    command_args.source = pipeline_args.source
+    if issubclass(CommandCls, LocateEntitiesCommand):
+        command_args.batch_size = pipeline_args.entity_batch_size
+        command_args.batch_workers = pipeline_args.entity_batch_workers
+        command_args.palette = pipeline_args.entity_palette
+        command_args.resume = pipeline_args.resume
+        if pipeline_args.retention_policy == "lean":
+            command_args.retain_batch_files = RETAINED_FILE_PATTERNS
+    command_args.keep_intermediate_files = pipeline_args.keep_intermediate_files
+    command_args.log_names = [log_filename]
+    command_args.schema = pipeline_args.database_schema
+    command_args.create_tables = pipeline_args.database_create_tables
+    command_args.data_version = pipeline_args.data_version
+    if CommandCls == FetchArxivSources:
+        command_args.s3_bucket = pipeline_args.s3_arxiv_sources_bucket
+    if CommandCls in [StorePipelineLog, StoreResults]:
+        command_args.s3_bucket = pipeline_args.s3_output_bucket
+
+    if CommandCls == StorePipelineLog:
+        logging.debug("Flushing file log before storing pipeline logs.")
+        file_log_handler.flush()
+
+    logging.debug(
+        "Creating command %s with args %s",
+        CommandCls.get_name(),
+        vars(command_args),
+    )
+    command = CommandCls(command_args)
+    logging.info("Launching command %s", CommandCls.get_name())
+    try:
+        processed_arxiv_ids = run_command(command, pipeline_args.command_workers)
+    # Catch-all for unexpected errors from running commands. With the amount of networking
+    # and subprocess calls in the commands, it is simply unlikely that we can predict and
+    # write exceptions for every possible exception that could be thrown.
+    except Exception as exc:  # pylint: disable=broad-except
+        logging.exception("Unexpected exception processing papers: {}".format(arxiv_id_list))
+        raise exc
+
+    # Papers the command loaded and processed are checkpointed, even if it saved no results for
+    # them. Papers the command skipped (e.g., because their input was missing) are processed again
+    # when the job is resumed.
+    for arxiv_id in arxiv_id_list:
+        if arxiv_id in processed_arxiv_ids:
+            checkpoints.record_command_completed(arxiv_id, CommandCls.get_name())
+    logging.info("Finished running command %s", CommandCls.get_name())
+
+
+def get_commands_by_name(command_names: List[str]) -> CommandList:
+    """
+    Look up pipeline commands by name. Commands are passed to other processes by name rather than
+    by class, as the classes for entity commands are created at runtime and cannot be sent to
+    another process.
+    """
+    commands_by_name = {
+        CommandCls.get_name(): CommandCls
+        for CommandCls in TEX_PREPARATION_COMMANDS
+        + ENTITY_COMMANDS
+        + [StoreResults, StorePipelineLog]
+    }
+    return [commands_by_name[name] for name in command_names]
+
+
+def run_named_commands_for_arxiv_ids(
+    command_names: List[str], arxiv_id_list: List[str], pipeline_args: Namespace
+) -> None:
+    for CommandCls in get_commands_by_name(command_names):
+        run_command_for_arxiv_ids(CommandCls, arxiv_id_list, pipeline_args)
+
+
+def run_pipelines_concurrently(
+    CommandClasses: CommandList,
+    arxiv_id_list: List[str],
+    pipeline_args: Namespace,
+    retention: DataRetention,
+) -> None:
+    """
+    Run a sequence of pipeline commands for a list of arXiv IDs, running the commands for entity
+    pipelines that don't depend on each other at the same time in separate processes. Commands
+    that aren't part of an entity pipeline (i.e., preparing TeX and storing results) are run
+    before and after the entity pipelines, in the order they appear in 'CommandClasses'.
+    'retention' is told about commands in entity pipelines once all entity pipelines finish.
+    """
+
+    graph = build_pipeline_graph(
+        CommandClasses, pipelines_ordered, pipeline_args.entity_batch_workers
+    )
+    graph_commands = [c for task in graph.values() for c in task.commands]
+    first_graph_command_index = next(
+        (i for i, c in enumerate(CommandClasses) if c in graph_commands),
+        len(CommandClasses),
+    )
+
+    for CommandCls in CommandClasses[:first_graph_command_index]:
+        run_command_for_arxiv_ids(CommandCls, arxiv_id_list, pipeline_args)
+        retention.command_finished(CommandCls)
+
+    if graph:
+        budget = ResourceBudget(
+            pipeline_args.pipeline_cpus, pipeline_args.compile_slots
+        )
+        # Processes are forked so that they inherit the logging configuration.
+        with ProcessPoolExecutor(
+            max_workers=len(graph), mp_context=multiprocessing.get_context("fork")
+        ) as executor:
+            timings = run_pipeline_graph(
+                graph,
+                functools.partial(
+                    run_named_commands_for_arxiv_ids,
+                    arxiv_id_list=arxiv_id_list,
+                    pipeline_args=pipeline_args,
+                ),
+                executor,
+                budget,
+            )
+        critical_path, length = find_critical_path(graph, timings)
+        logging.info(
+            "Critical path of entity pipelines for papers %s: %s (%.1f seconds)",
+            arxiv_id_list,
+            " -> ".join(f"{e} ({timings[e].duration:.1f}s)" for e in critical_path),
+            length,
+        )
+        for CommandCls in graph_commands:
+            retention.command_finished(CommandCls)
+
+    for CommandCls in CommandClasses[first_graph_command_index:]:
+        if CommandCls not in graph_commands:
+            run_command_for_arxiv_ids(CommandCls, arxiv_id_list, pipeline_args)
+            retention.command_finished(CommandCls)
+
+
 def run_commands_for_arxiv_ids(
     CommandClasses: CommandList, arxiv_id_list: List[str], pipeline_args: Namespace,
-) -> PipelineDigest:
-    " Run a sequence of pipeline commands for a list of arXiv IDs. "
-
-    for CommandCls in CommandClasses:
-
-        # Initialize arguments for each command to defaults.
-        command_args_parser = ArgumentParser()
-        CommandCls.init_parser(command_args_parser)
-        command_args = command_args_parser.parse_known_args("")[0]
-
-        # Pass pipeline arguments to command.
-        command_args.arxiv_ids = arxiv_id_list
-        command_args.arxiv_ids_file = None
-        command_args.v = pipeline_args.v
-        command_args.source = pipeline_args.source
-        if CommandCls == LocateEntitiesCommand:
-            command_args.batch_size = pipeline_args.entity_batch_size
-        command_args.keep_intermediate_files = pipeline_args.keep_intermediate_files
-        command_args.log_names = [log_filename]
-        command_args.schema = pipeline_args.database_schema
-        command_args.create_tables = pipeline_args.database_create_tables
-        command_args.data_version = pipeline_args.data_version
-        if CommandCls == FetchArxivSources:
-            command_args.s3_bucket = pipeline_args.s3_arxiv_sources_bucket
-        if CommandCls in [StorePipelineLog, StoreResults]:
-            command_args.s3_bucket = pipeline_args.s3_output_bucket
-
-        if CommandCls == StorePipelineLog:
-            logging.debug("Flushing file log before storing pipeline logs.")
-            file_log_handler.flush()
-
-        logging.debug(
-            "Creating command %s with args %s",
-            CommandCls.get_name(),
-            vars(command_args),
+) -> Tuple[PipelineDigest, List[str]]:
+    """
+    Run a sequence of pipeline commands for a list of arXiv IDs. Data for the papers is deleted
+    as commands finish according to the retention policy. If the papers' data grows larger than
+    the disk budget, the remaining commands are not run. Returns a digest of the processing of
+    the papers, and the names of the commands that finished running.
+    """
+
+    if not pipeline_args.resume:
+        for arxiv_id in arxiv_id_list:
+            checkpoints.clear_checkpoints(arxiv_id)
+
+    retention = DataRetention(
+        "batches"
+        if pipeline_args.keep_intermediate_files
+        else pipeline_args.retention_policy,
+        arxiv_id_list,
+        CommandClasses,
+        int(pipeline_args.disk_budget * 1e9)
+        if pipeline_args.disk_budget is not None
+        else None,
+    )
+    try:
+        if pipeline_args.concurrent_pipelines:
+            run_pipelines_concurrently(
+                CommandClasses, arxiv_id_list, pipeline_args, retention
+            )
+        else:
+            for CommandCls in CommandClasses:
+                run_command_for_arxiv_ids(CommandCls, arxiv_id_list, pipeline_args)
+                retention.command_finished(CommandCls)
+    except DiskBudgetExceededException as e:
+        logging.error(  # pylint: disable=logging-not-lazy
+            "Skipping the remaining commands for papers %s, as their data is over the disk "
+            + "budget: %s",
+            arxiv_id_list,
+            e,
         )
-        command = CommandCls(command_args)
-        logging.info("Launching command %s", CommandCls.get_name())
-        try:
-            run_command(command)
-        # Catch-all for unexpected errors from running commands. With the amount of networking
-        # and subprocess calls in the commands, it is simply unlikely that we can predict and
-        # write exceptions for every possible exception that could be thrown.
-        except Exception as exc:  # pylint: disable=broad-except
-            logging.exception("Unexpected exception processing papers: {}".format(arxiv_id_list))
-            raise exc
-
-        logging.info("Finished running command %s", CommandCls.get_name())
+    retention.log_usage()
 
     # Create digest describing the result of running these commands for these papers
     processing_summary: PipelineDigest = {}
     for id_ in arxiv_id_list:
         processing_summary[id_] = make_paper_digest(entity_pipelines, id_)
-    return processing_summary
+    return processing_summary, retention.finished_commands
+
+
+def is_cacheable(CommandCls: Type[Command]) -> bool:
+    " Whether the data a command produces for a paper can be saved in the work cache. "
+    return not issubclass(
+        CommandCls, (DatabaseUploadCommand, StoreResults, StorePipelineLog)
+    )
+
+
+def run_cached_commands_for_arxiv_id(
+    CommandClasses: CommandList, arxiv_id: str, pipeline_args: Namespace
+) -> PipelineDigest:
+    """
+    Run a sequence of pipeline commands for one paper, using the work cache if one was configured.
+    If the cache has data for the paper from running the same commands with the same code, that
+    data is restored, and only the commands that upload results are run. Otherwise, all commands
+    are run, and the data they produced is saved to the cache if all of them finished running.
+    """
+
+    cached_command_names = [c.get_name() for c in CommandClasses if is_cacheable(c)]
+    if pipeline_args.work_cache_dir is None or not cached_command_names:
+        return run_commands_for_arxiv_ids(CommandClasses, [arxiv_id], pipeline_args)[0]
+
+    cache = WorkCache(
+        pipeline_args.work_cache_dir,
+        int(pipeline_args.work_cache_size * 1e9),
+        pipeline_args.code_version,
+    )
+    if cache.restore(arxiv_id, cached_command_names):
+        logging.info(
+            "Restored data for paper %s from the work cache. Skipping commands %s.",
+            arxiv_id,
+            cached_command_names,
+        )
+        upload_commands = [c for c in CommandClasses if not is_cacheable(c)]
+        return run_commands_for_arxiv_ids(upload_commands, [arxiv_id], pipeline_args)[0]
+
+    digest, finished_command_names = run_commands_for_arxiv_ids(
+        CommandClasses, [arxiv_id], pipeline_args
+    )
+    # Data from commands that were skipped (e.g., as the paper's data went over the disk budget)
+    # would be missing from the entry, yet restoring the entry would skip those commands.
+    unfinished = [c for c in cached_command_names if c not in finished_command_names]
+    if unfinished:
+        logging.info(
+            "Not saving data for paper %s to the work cache, as commands %s did not finish.",
+            arxiv_id,
+            unfinished,
+        )
+        return digest
+
+    try:
+        cache.save(arxiv_id, cached_command_names)
+    except OSError as e:
+        logging.warning(
+            "Could not save data for paper %s to the work cache: %s", arxiv_id, e
+        )
+    return digest
+
+
+def run_commands_for_arxiv_id(
+    command_names: List[str], arxiv_id: str, pipeline_args: Namespace
+) -> PipelineDigest:
+    """
+    Run a sequence of pipeline commands for one paper, then delete the paper's data unless it
+    should be kept. This is the unit of work for processing several papers at once in a pool of
+    processes. The commands are run in the order given.
+    """
+
+    try:
+        logging.info("Running pipeline for paper %s", arxiv_id)
+        return run_cached_commands_for_arxiv_id(
+            get_commands_by_name(command_names), arxiv_id, pipeline_args
+        )
+    finally:
+        if not pipeline_args.keep_paper_data:
+            file_utils.delete_data(arxiv_id)
 
 
 if __name__ == "__main__":
@@ -196,14 +446,91 @@ if __name__ == "__main__":
     parser.add_argument(
         "--entity-batch-size",
         type=int,
-        default=30,
+        default=None,
         help=(
             "Number of entities to attempt to locate at a time. Setting this to a higher value "
             + "should speed up the pipeline by reducing the number of compilations and rasters "
             + "of documents. That said, beyond a certain point, batch size may reduce the accuracy "
             + "of entity localization. This is because entities are distinguished from each other "
             + "during localization using distinct hues, which become closer together as the "
-            + "batch size increases."
+            + "batch size increases. Defaults to the number of colors in the palette "
+            + "(see '--entity-palette')."
+        ),
+    )
+    parser.add_argument(
+        "--entity-palette",
+        choices=list(PALETTES.keys()),
+        default="default",
+        help=(
+            "Palette of colors to colorize entities with when locating them. Larger palettes "
+            + "allow more entities to be located with each compilation of a paper. The largest "
+            + "palette, 'wide', has 120 colors and requires pages to be rastered without "
+            + "anti-aliasing. See the '--palette' argument of the entity location commands."
+        ),
+    )
+    parser.add_argument(
+        "--entity-batch-workers",
+        type=int,
+        default=1,
+        help=(
+            "Number of batches of entities to locate at the same time for each paper. Each "
+            + "batch requires its own compilation and raster of the paper, so setting this to "
+            + "the number of available cores can reduce the time it takes to locate entities "
+            + "roughly by that factor."
+        ),
+    )
+    parser.add_argument(
+        "--command-workers",
+        type=int,
+        default=1,
+        help=(
+            "Number of papers that each command can process at the same time, for commands "
+            + "that support it (e.g., compiling TeX and extracting symbols). Results are still saved one paper at a time. This has no effect when "
+            + "papers are processed one at a time."
+        ),
+    )
+    parser.add_argument(
+        "--concurrent-pipelines",
+        action="store_true",
+        help=(
+            "Run the commands for entity pipelines that don't depend on each other at the same "
+            + "time, each pipeline in its own process (e.g., locate citations while symbols are "
+            + "being located). The pipeline's critical path, the chain of dependent entity "
+            + "pipelines that took the longest, will be logged. See '--pipeline-cpus' and "
+            + "'--compile-slots' for limiting how many pipelines run at once."
+        ),
+    )
+    parser.add_argument(
+        "--pipeline-cpus",
+        type=int,
+        default=os.cpu_count(),
+        help=(
+            "If '--concurrent-pipelines' is set, the number of processors entity pipelines can "
+            + "use at once. Pipelines that locate entities use one processor for each of the "
+            + "'--entity-batch-workers'; other pipelines use one processor."
+        ),
+    )
+    parser.add_argument(
+        "--compile-slots",
+        type=int,
+        default=os.cpu_count(),
+        help=(
+            "If '--concurrent-pipelines' is set, the number of TeX compilations entity "
+            + "pipelines can run at once. Pipelines that locate entities run one compilation "
+            + "for each of the '--entity-batch-workers'. A pipeline that needs more processors "
+            + "or compilations than allowed is run on its own."
+        ),
+    )
+    parser.add_argument(
+        "--storage-format",
+        choices=file_utils.STORAGE_FORMATS,
+        default="csv",
+        help=(
+            "Format in which to save intermediate data. 'sqlite' files are smaller and faster to "
+            + "read for papers with many entities, but can't be inspected with a text editor. "
+            + "They are saved next to where CSV files would be, with the extension '.sqlite'. "
+            + "Results uploaded with '--store-results' are converted to CSV. Compare the "
+            + "formats with 'scripts/benchmark_storage.py'."
         ),
     )
     parser.add_argument(
@@ -222,6 +549,42 @@ if __name__ == "__main__":
             + "the TeX is colorized, TeX compilation logs, and rasters."
         ),
     )
+    parser.add_argument(
+        "--retention-policy",
+        choices=RETENTION_POLICIES,
+        default="batches",
+        help=(
+            "When to delete intermediate files while papers are processed. 'batches' deletes "
+            + "the files made for each batch of entities once the batch has been located. "
+            + "'lean' also deletes large artifacts (i.e., page rasters and the compile cache) "
+            + "as soon as the last command that reads them finishes, and keeps small result "
+            + "files (e.g., CSV files and compilation logs) when deleting files. Ignored if "
+            + "'--keep-intermediate-files' is set."
+        ),
+    )
+    parser.add_argument(
+        "--disk-budget",
+        type=float,
+        help=(
+            "Maximum disk space in gigabytes that the data for the papers processed by one "
+            + "worker may take up (i.e., for one paper if '--one-paper-at-a-time' is set). Disk "
+            + "usage is checked after each command. When it is over the budget, caches are "
+            + "deleted, and if that doesn't free enough space, the remaining commands are "
+            + "skipped for those papers. The peak disk usage of each paper is logged either way."
+        ),
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help=(
+            "Resume a job that was interrupted. Each command records when it finishes running "
+            + "for a paper, if it saved results for the paper. When resuming, commands are "
+            + "skipped for the papers they already finished for, and commands for locating "
+            + "entities skip the batches of entities that were already located. Only resume with the same commands and code as the "
+            + "interrupted job, and with '--keep-paper-data' if '--one-paper-at-a-time' was "
+            + "set, as data for papers that finished is otherwise deleted."
+        ),
+    )
     parser.add_argument(
         "--max-papers",
         type=int,
@@ -247,6 +610,45 @@ if __name__ == "__main__":
         action="store_true",
         help="If '--one-paper-at-a-time' is set, keep a paper's data after it is processed.",
     )
+    parser.add_argument(
+        "--paper-workers",
+        type=int,
+        default=1,
+        help=(
+            "Number of papers to process at the same time, each in its own process. Each "
+            + "process runs all commands for its paper in order, so a paper that takes a long "
+            + "time to process will not hold up other papers. Setting this to a value greater "
+            + "than 1 implies '--one-paper-at-a-time'. Consider how many cores each paper "
+            + "needs (see '--entity-batch-workers') when choosing the number of workers."
+        ),
+    )
+    parser.add_argument(
+        "--work-cache-dir",
+        help=(
+            "Directory of a cache of papers' data to share between runs of the pipeline. If "
+            + "'--one-paper-at-a-time' is set, the data produced for each paper is saved to the "
+            + "cache before it is deleted. When a paper is processed again with the same code, "
+            + "its data is restored from the cache, and only the commands that upload results "
+            + "are run. The cache is keyed by arXiv ID, so make sure to include the version in "
+            + "arXiv IDs if papers may have been updated since they were cached."
+        ),
+    )
+    parser.add_argument(
+        "--work-cache-size",
+        type=float,
+        default=50,
+        help=(
+            "Maximum size of the work cache in gigabytes. The least recently used papers are "
+            + "evicted when the cache grows larger than this."
+        ),
+    )
+    parser.add_argument(
+        "--code-version",
+        help=(
+            "Version of the pipeline code to key the work cache by. Defaults to a hash of the "
+            + "code and the TeX compiler settings."
+        ),
+    )
     parser.add_argument(
         "--store-results",
         action="store_true",
@@ -351,6 +753,12 @@ if __name__ == "__main__":
     if args.config:
         fetch_config(args.config)
 
+    file_utils.set_storage_format(args.storage_format)
+
+    if args.work_cache_dir is not None and args.code_version is None:
+        args.code_version = get_code_version()
+        logging.debug("Keying work cache by code version %s.", args.code_version)
+
     # Load arXiv IDs from arguments or by fetching recent arXiv IDs from a database.
     arxiv_ids = load_arxiv_ids_using_args(args)
     if arxiv_ids is None and args.days is not None:
@@ -465,12 +873,42 @@ if __name__ == "__main__":
 
     # Run the pipeline one paper at a time, or one command at a time, depending on arguments.
     pipeline_digest: PipelineDigest = {}
-    if args.one_paper_at_a_time:
+    if args.paper_workers > 1:
+        # Processes are forked so that they inherit the logging configuration. Each paper is
+        # processed from start to finish by one process, and papers are assigned to processes as
+        # they become free, so that papers can be at different stages of the pipeline.
+        filtered_command_names = [c.get_name() for c in filtered_commands]
+        with ProcessPoolExecutor(
+            max_workers=args.paper_workers,
+            mp_context=multiprocessing.get_context("fork"),
+        ) as executor:
+            future_to_arxiv_id = {
+                executor.submit(
+                    run_commands_for_arxiv_id, filtered_command_names, arxiv_id, args
+                ): arxiv_id
+                for arxiv_id in arxiv_ids
+            }
+            for future in as_completed(future_to_arxiv_id):
+                arxiv_id = future_to_arxiv_id[future]
+                try:
+                    pipeline_digest.update(future.result())
+                except (FetchFromArxivException, S2ApiException) as e:
+                    logging.exception(f"Retryable Failure processing id: {arxiv_id}")
+                    for other_future in future_to_arxiv_id:
+                        other_future.cancel()
+                    exit(RETRYABLE_FAILURE_RETURN_CODE)
+                except Exception:  # pylint: disable=broad-except
+                    # A paper that fails is skipped, so that the rest of the papers in the
+                    # batch are still processed.
+                    logging.exception(
+                        "Error processing paper %s. Skipping this paper.", arxiv_id
+                    )
+    elif args.one_paper_at_a_time:
         for arxiv_id in arxiv_ids:
             try:
                 logging.info("Running pipeline for paper %s", arxiv_id)
-                digest_for_paper = run_commands_for_arxiv_ids(
-                    filtered_commands, [arxiv_id], args
+                digest_for_paper = run_cached_commands_for_arxiv_id(
+                    filtered_commands, arxiv_id, args
                 )
                 # The pipeline digest must be updated after each arXiv ID is processed, because the
                 # digest for a paper cannot be computed once the paper's data is deleted.
@@ -483,7 +921,7 @@ if __name__ == "__main__":
                     file_utils.delete_data(arxiv_id)
     else:
         logging.info("Running pipeline for papers %s", arxiv_ids)
-        digest_for_papers = run_commands_for_arxiv_ids(
+        digest_for_papers, _ = run_commands_for_arxiv_ids(
             filtered_commands, arxiv_ids, args
         )
         pipeline_digest.update(digest_for_papers)
@@ -0,0 +1,78 @@
+import random
+import threading
+import time
+from typing import Iterator, List
+
+import pytest
+
+from common.commands.base import Command, process_items
+
+
+class SlowCommand(Command[int, str]):
+    " Processes items in a random amount of time, producing two results for each item. "
+
+    def __init__(self, parallel_safe: bool) -> None:
+        super().__init__(None)
+        self.parallel_safe = parallel_safe
+        self.max_concurrent = 0
+        self._running = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_name() -> str:
+        return "slow-command"
+
+    @staticmethod
+    def get_description() -> str:
+        return "Process items slowly."
+
+    def is_parallel_safe(self) -> bool:  # type: ignore
+        return self.parallel_safe
+
+    def load(self) -> Iterator[int]:
+        for i in range(8):
+            yield i
+
+    def process(self, item: int) -> Iterator[str]:
+        with self._lock:
+            self._running += 1
+            self.max_concurrent = max(self.max_concurrent, self._running)
+        time.sleep(0.005 + random.random() * 0.01)
+        with self._lock:
+            self._running -= 1
+        yield f"{item}-a"
+        yield f"{item}-b"
+
+    def save(self, item: int, result: str) -> None:
+        pass
+
+
+def expected_results() -> List[str]:
+    return [f"{i}-{suffix}" for i in range(8) for suffix in ["a", "b"]]
+
+
+def test_process_items_concurrently_in_order():
+    command = SlowCommand(parallel_safe=True)
+    results = [result for _, result in process_items(command, process_workers=4)]
+    assert results == expected_results()
+    assert 1 < command.max_concurrent <= 4
+
+
+def test_process_items_one_at_a_time_if_not_parallel_safe():
+    command = SlowCommand(parallel_safe=False)
+    results = [result for _, result in process_items(command, process_workers=4)]
+    assert results == expected_results()
+    assert command.max_concurrent == 1
+
+
+@pytest.mark.parametrize("parallel_safe", [True, False])
+def test_report_items_done_after_their_results(parallel_safe: bool):
+    command = SlowCommand(parallel_safe=parallel_safe)
+    events: List[str] = []
+    for _, result in process_items(
+        command, process_workers=4, item_done=lambda i: events.append(f"{i}-done")
+    ):
+        events.append(result)
+    assert events == [
+        f"{i}-{suffix}" for i in range(8) for suffix in ["a", "b", "done"]
+    ]
@@ -111,6 +111,12 @@ def test_reports_rate_limiting():
             run_command(command)
 
 
+def test_fetches_one_paper_at_a_time():
+    # Requests are spaced out by 'FETCH_DELAY' to stay under S2's rate limit, which only holds
+    # if papers are not fetched concurrently.
+    assert not FetchS2Metadata.is_parallel_safe()
+
+
 def test_reports_generic_exception_for_unhandled_non_2xxs():
     with patch("common.commands.fetch_s2_data.requests") as mock_requests:
         mock_resp = Mock()
@@ -0,0 +1,294 @@
+import os.path
+import random
+import time
+from tempfile import TemporaryDirectory
+from typing import List, Optional, Tuple
+
+import pytest
+
+from common.commands.base import create_args
+from common.commands.locate_entities import (
+    BatchDirectories,
+    BatchOutcome,
+    LocationTask,
+    make_locate_entities_command,
+)
+from common.locate_entities import LocationResult
+from common.types import (
+    BoundingBox,
+    CompilationResult,
+    FileContents,
+    SerializableEntity,
+)
+
+# An entity that shifts the layout of the document whenever it's colorized with other entities.
+SHIFTY_ENTITY_ID = "entity-3"
+
+
+def create_entity(index: int) -> SerializableEntity:
+    return SerializableEntity(
+        start=index * 10,
+        end=index * 10 + 5,
+        id_=f"entity-{index}",
+        tex_path="main.tex",
+        tex=f"tex-{index}",
+        context_tex="",
+    )
+
+
+def fake_run_batch(
+    _: LocationTask, batch_index: int, entities: List[SerializableEntity]
+) -> BatchOutcome:
+    # Finish batches in a random order to simulate workers completing at different times.
+    time.sleep(random.random() * 0.01)
+    batch = [e.id_ for e in entities]
+    dirs = BatchDirectories("colorized", "compiled", "rasters", "diffs")
+    outcome = BatchOutcome(batch_index, f"iteration-{batch_index}", batch, dirs)
+    outcome.entity_hues = {id_: i / len(batch) for i, id_ in enumerate(batch)}
+    outcome.location_result = LocationResult(
+        locations={
+            e.id_: [BoundingBox(e.start / 100.0, 0.1, 0.05, 0.01, 0)] for e in entities
+        },
+        shifted_entities=[SHIFTY_ENTITY_ID]
+        if SHIFTY_ENTITY_ID in batch and len(batch) > 1
+        else [],
+        black_pixels_found=False,
+    )
+    return outcome
+
+
+def locate(batch_workers: int) -> List[str]:
+    LocateWidgets = make_locate_entities_command("widgets")
+    args = create_args(
+        arxiv_ids=["fakeid"],
+        arxiv_ids_file=None,
+        batch_size=2,
+        batch_workers=batch_workers,
+        raster_mode="disk",
+        predict_pages=False,
+        failure_isolation="bisect",
+        max_recovery_batches=None,
+        remember_faults=False,
+        compile_cache=False,
+        keep_intermediate_files=True,
+        resume=False,
+    )
+    command = LocateWidgets(args)
+    command._run_batch = fake_run_batch  # type: ignore # pylint: disable=protected-access
+
+    entities = [create_entity(i) for i in range(9)]
+    task = LocationTask(
+        "fakeid", "main.tex", FileContents("main.tex", "", "utf-8"), entities, 0
+    )
+    with TemporaryDirectory() as checkpoints_dir:
+        path = os.path.join(checkpoints_dir, "checkpoints.csv")
+        command._get_checkpoints_path = lambda _: path  # type: ignore # pylint: disable=protected-access
+        return [f"{r.iteration}:{r.entity_id}:{r.left}" for r in command.process(task)]
+
+
+def test_locate_all_entities_with_batch_workers():
+    results = locate(batch_workers=3)
+    entity_ids = {r.split(":")[1] for r in results}
+    assert entity_ids == {f"entity-{i}" for i in range(9)}
+
+    # The entity that caused shifting was located when it was processed on its own.
+    assert [r for r in results if SHIFTY_ENTITY_ID in r] == [
+        f"iteration-5:{SHIFTY_ENTITY_ID}:0.3"
+    ]
+
+
+def test_batch_worker_results_are_deterministic():
+    expected = locate(batch_workers=3)
+    for _ in range(5):
+        assert locate(batch_workers=3) == expected
+
+
+def test_one_batch_worker_processes_batches_in_order():
+    results = locate(batch_workers=1)
+    assert [r.split(":")[0] for r in results] == sorted(
+        [r.split(":")[0] for r in results], key=lambda i: int(i.split("-")[1])
+    )
+    assert len(results) == 9
+
+
+# Entities that make the colorized TeX fail to compile, whichever batch they are in.
+UNCOMPILABLE_ENTITY_IDS = {"entity-2", "entity-5"}
+TEX_ERROR_LOG = (
+    b"~~~~~~~~~~~ Running pdflatex for the first time ~~~~~~~~\n"
+    + b"! Undefined control sequence.\n"
+    + b"! Emergency stop.\n"
+)
+
+
+def fake_run_batch_with_compile_errors(
+    _: LocationTask,
+    batch_index: int,
+    entities: List[SerializableEntity],
+    failure_log: bytes = TEX_ERROR_LOG,
+) -> BatchOutcome:
+    batch = [e.id_ for e in entities]
+    dirs = BatchDirectories("colorized", "compiled", "rasters", "diffs")
+    outcome = BatchOutcome(batch_index, f"iteration-{batch_index}", batch, dirs)
+    outcome.entity_hues = {id_: i / len(batch) for i, id_ in enumerate(batch)}
+    if UNCOMPILABLE_ENTITY_IDS.intersection(batch):
+        outcome.compilation_result = CompilationResult(False, [], [], failure_log, b"")
+        return outcome
+
+    outcome.compilation_result = CompilationResult(True, [], [], b"", b"")
+    outcome.location_result = LocationResult(
+        locations={
+            e.id_: [BoundingBox(e.start / 100.0, 0.1, 0.05, 0.01, 0)] for e in entities
+        },
+        shifted_entities=[],
+        black_pixels_found=False,
+    )
+    return outcome
+
+
+@pytest.fixture(name="no_compilation_logs")
+def fixture_no_compilation_logs(monkeypatch):  # type: ignore
+    " Skip reading and writing the logs of compilations that never happened. "
+    monkeypatch.setattr(
+        "common.commands.locate_entities.save_compilation_result", lambda *_: None
+    )
+    monkeypatch.setattr(
+        "common.commands.locate_entities.get_last_colorized_entity", lambda *_: None
+    )
+
+
+def locate_with_compile_errors(
+    faults_path: Optional[str] = None,
+    max_recovery_batches: Optional[int] = None,
+    checkpoints_path: Optional[str] = None,
+    interrupt_after_batches: Optional[int] = None,
+    failure_log: bytes = TEX_ERROR_LOG,
+) -> Tuple[List[str], int]:
+    """
+    Locate entities, returning the IDs of entities that were located and the number of batches.
+    If 'checkpoints_path' is given, checkpoints are kept in that file, and locating resumes from
+    the checkpoints in the file. If 'interrupt_after_batches' is given, locating is interrupted
+    once that many batches have been run. Batches that fail to compile produce 'failure_log'.
+    """
+    LocateWidgets = make_locate_entities_command("widgets")
+    args = create_args(
+        arxiv_ids=["fakeid"],
+        arxiv_ids_file=None,
+        batch_size=4,
+        batch_workers=1,
+        raster_mode="disk",
+        predict_pages=False,
+        failure_isolation="bisect",
+        max_recovery_batches=max_recovery_batches,
+        remember_faults=faults_path is not None,
+        compile_cache=False,
+        keep_intermediate_files=True,
+        resume=checkpoints_path is not None,
+    )
+    command = LocateWidgets(args)
+
+    batch_sizes = []
+
+    def run_batch(
+        item: LocationTask, batch_index: int, entities: List[SerializableEntity]
+    ) -> BatchOutcome:
+        if len(batch_sizes) == interrupt_after_batches:
+            raise KeyboardInterrupt()
+        batch_sizes.append(len(entities))
+        return fake_run_batch_with_compile_errors(
+            item, batch_index, entities, failure_log
+        )
+
+    command._run_batch = run_batch  # type: ignore # pylint: disable=protected-access
+    if faults_path is not None:
+        command._get_faults_path = lambda _: faults_path  # type: ignore # pylint: disable=protected-access
+
+    entities = [create_entity(i) for i in range(9)]
+    task = LocationTask(
+        "fakeid", "main.tex", FileContents("main.tex", "", "utf-8"), entities, 0
+    )
+    located: List[str] = []
+    with TemporaryDirectory() as checkpoints_dir:
+        path = checkpoints_path or os.path.join(checkpoints_dir, "checkpoints.csv")
+        command._get_checkpoints_path = lambda _: path  # type: ignore # pylint: disable=protected-access
+        try:
+            for result in command.process(task):
+                located.append(result.entity_id)
+        except KeyboardInterrupt:
+            pass
+    return located, len(batch_sizes)
+
+
+@pytest.mark.usefixtures("no_compilation_logs")
+def test_bisect_batches_that_fail_to_compile():
+    located, num_batches = locate_with_compile_errors()
+    assert sorted(located) == sorted(
+        f"entity-{i}" for i in range(9) if f"entity-{i}" not in UNCOMPILABLE_ENTITY_IDS
+    )
+    # Batches [0-3], [4-7], and [8], and then, for each failed batch of four, two halves and
+    # two quarters from bisecting the half with the uncompilable entity.
+    assert num_batches == 11
+
+
+@pytest.mark.usefixtures("no_compilation_logs")
+def test_limit_batches_for_recovering_from_faults():
+    located, num_batches = locate_with_compile_errors(max_recovery_batches=2)
+    assert num_batches == 5
+    assert "entity-8" in located
+
+
+@pytest.mark.usefixtures("no_compilation_logs")
+def test_skip_entities_known_to_fail_to_compile():
+    with TemporaryDirectory() as faults_dir:
+        faults_path = os.path.join(faults_dir, "widgets.csv")
+        first_located, _ = locate_with_compile_errors(faults_path)
+        located, num_batches = locate_with_compile_errors(faults_path)
+
+    assert sorted(located) == sorted(first_located)
+    # Entities [0, 1, 3, 4], [6, 7, 8].
+    assert num_batches == 2
+
+
+@pytest.mark.usefixtures("no_compilation_logs")
+def test_forget_faults_when_compiler_settings_change(monkeypatch):  # type: ignore
+    with TemporaryDirectory() as faults_dir:
+        faults_path = os.path.join(faults_dir, "widgets.csv")
+        locate_with_compile_errors(faults_path)
+        monkeypatch.setattr(
+            "common.commands.locate_entities.get_compiler_settings",
+            lambda: "new-settings",
+        )
+        _, num_batches = locate_with_compile_errors(faults_path)
+
+    assert num_batches == 11
+
+
+@pytest.mark.usefixtures("no_compilation_logs")
+def test_do_not_remember_failures_without_tex_errors():
+    with TemporaryDirectory() as faults_dir:
+        faults_path = os.path.join(faults_dir, "widgets.csv")
+        locate_with_compile_errors(faults_path, failure_log=b"Compilation timed out.")
+        assert not os.path.exists(faults_path)
+        _, num_batches = locate_with_compile_errors(faults_path)
+
+    assert num_batches == 11
+
+
+@pytest.mark.usefixtures("no_compilation_logs")
+def test_resume_from_checkpointed_batches():
+    with TemporaryDirectory() as checkpoints_dir:
+        checkpoints_path = os.path.join(checkpoints_dir, "checkpoints.csv")
+        first_located, first_num_batches = locate_with_compile_errors(
+            checkpoints_path=checkpoints_path, interrupt_after_batches=4
+        )
+        located, num_batches = locate_with_compile_errors(
+            checkpoints_path=checkpoints_path
+        )
+
+    assert first_num_batches == 4
+    assert first_located == ["entity-0", "entity-1"]
+    # Checkpointed entities aren't located again, and no other entity is missed.
+    assert sorted(first_located + located) == sorted(
+        f"entity-{i}" for i in range(9) if f"entity-{i}" not in UNCOMPILABLE_ENTITY_IDS
+    )
+    # Entity 2, which was found to fail to compile, isn't processed again either.
+    assert first_num_batches + num_batches < 11
@@ -0,0 +1,56 @@
+import pytest
+
+from common.commands.raster_pages import (
+    get_raster_settings,
+    get_streaming_raster_command,
+)
+
+
+@pytest.fixture(name="raster_config")
+def fixture_raster_config(tmp_path, monkeypatch):  # type: ignore
+    " Write rastering commands to a config file that the raster commands read. "
+
+    def write_config(contents: str) -> None:
+        config_path = tmp_path / "config.ini"
+        config_path.write_text(contents)
+        monkeypatch.setattr(
+            "common.commands.raster_pages.RASTER_CONFIG", str(config_path)
+        )
+
+    return write_config
+
+
+def test_derive_streaming_rasterer_from_ghostscript_rasterer(raster_config):  # type: ignore
+    raster_config(
+        "[rasterers]\n"
+        + 'pdf = ["gs", "-r150", "-sDEVICE=png16m", "-o", "{output_dir}/page-%%d.png", "{file}"]\n'
+    )
+    assert get_streaming_raster_command("pdf") == [
+        "gs",
+        "-q",
+        "-dSAFER",
+        "-dBATCH",
+        "-dNOPAUSE",
+        "-sDEVICE=ppmraw",
+        "-sOutputFile=-",
+        "-r150",
+        "{file}",
+    ]
+
+
+def test_use_streaming_rasterer_from_config(raster_config):  # type: ignore
+    raster_config(
+        "[rasterers]\n"
+        + 'pdf = ["pdftoppm", "-png", "{file}", "{output_dir}/page"]\n'
+        + "[streaming-rasterers]\n"
+        + 'pdf = ["pdftoppm", "{file}"]\n'
+    )
+    assert get_streaming_raster_command("pdf") == ["pdftoppm", "{file}"]
+
+
+def test_no_streaming_rasterer_for_other_rasterers(raster_config):  # type: ignore
+    raster_config(
+        "[rasterers]\n" + 'pdf = ["pdftoppm", "-png", "{file}", "{output_dir}/page"]\n'
+    )
+    assert get_streaming_raster_command("pdf") is None
+    assert "'pdf': None" in get_raster_settings(streaming=True)
@@ -0,0 +1,195 @@
+"""
+Reference implementations of the methods of 'JournaledString' that map offsets and take
+substrings, which walk over all of a string's segments. 'JournaledString' looks segments up with
+an index instead; these implementations are kept to check that it behaves the same way.
+"""
+
+from typing import List, Optional, Tuple
+
+from common.string import JournaledString, Segment
+
+
+def substring(
+    string: JournaledString,
+    start: int,
+    end: int,
+    greedy: bool = True,
+    include_truncated_left: bool = True,
+    include_truncated_right: bool = True,
+) -> JournaledString:
+    """
+    Get a substring of the journaled string, with pointers back to only the parts of the
+    initial substring that correspond to the substringed part of the string. 'greedy'
+    determines whether 'initial' is grown, to include:
+    * segments on the boundary where 'initial' was replaced with ''
+    * the contents of 'initial' for bisected segments.
+    """
+
+    new_segments: List[Segment] = []
+    s_start = 0
+    for s in string.segments:
+
+        s_end = s_start + len(s.current)
+
+        # Simplest case: 'start' and 'end' surround a segment, so that entire segment
+        # will be included in the new string.
+        if start <= s_start and end >= s_end:
+            # Only include replacements of spans with blanks if in 'greedy' mode.
+            if s_start == start and s_start == s_end and not include_truncated_left:
+                continue
+            if s_end == end and s_start == s_end and not include_truncated_right:
+                continue
+            new_segments.append(s)
+
+        # Trickier cases: look for when 'start' and 'end' appear within a segment. In that
+        # case, a new segment needs to be added with the initial and current strings truncated.
+        else:
+            initial = s.initial
+            current = s.current
+            overlaps = False
+
+            # Truncate right side if the end is within this segment.
+            if s_start < end < s_end:
+                overlaps = True
+                end_in_s = end - s_start
+                current = current[:end_in_s]
+                # Only truncate the initial string if it has not been changed. If it has
+                # been changed, then it isn't clear which characters in the initial string the
+                # truncated characters in the updated string correspond to, so conservatively
+                # assume that the segment maps to the same initial segment.
+                if not s.changed:
+                    initial = initial[:end_in_s]
+                elif greedy:
+                    initial = initial
+                else:
+                    initial = ""
+            # Truncate left side if the start is within this segment. Note that it might be
+            # possible for both the start ane end to lie within this segment, hence the shared
+            # 'current' and 'initial' variables.
+            if s_start < start < s_end:
+                overlaps = True
+                start_in_s = start - s_start
+                current = current[start_in_s:]
+                if not s.changed:
+                    initial = initial[start_in_s:]
+
+            if overlaps:
+                new_segments.append(Segment(initial, current, s.changed))
+
+        s_start = s_end
+
+    return JournaledString(new_segments)
+
+
+def initial_offsets(
+    string: JournaledString, start: int, end: int
+) -> Tuple[Optional[int], Optional[int]]:
+    """
+    Convert offsets expressed relative to the current value of the string to offsets in the
+    original string. The offsets will be precise wherever the string hasn't been changed. They
+    will be approximate returning a conservatively large span in places where the string has
+    been mutated.
+    """
+
+    # Search for the start position. Search from the end of the current
+    # string backwards, to find the last possible segment that could
+    # map to the initial offsets, to provide a tight mapping.
+    current_segment_end = sum([len(s.current) for s in string.segments])
+    initial_segment_end = sum([len(s.initial) for s in string.segments])
+    start_in_initial: Optional[int] = initial_segment_end
+
+    for s in reversed(string.segments):
+
+        current_segment_start = current_segment_end - len(s.current)
+        initial_segment_start = initial_segment_end - len(s.initial)
+        if current_segment_start <= start <= current_segment_end:
+            if s.changed:
+                start_in_initial = (
+                    initial_segment_end
+                    if start == current_segment_end
+                    else initial_segment_start
+                )
+            else:
+                start_in_initial = initial_segment_start + (
+                    start - current_segment_start
+                )
+            break
+
+        current_segment_end -= len(s.current)
+        initial_segment_end -= len(s.initial)
+
+    # Repeat the search, this time searching forward to find the end offset.
+    current_segment_start = 0
+    initial_segment_start = 0
+    end_in_initial: Optional[int] = initial_segment_start
+
+    for s in string.segments:
+
+        current_segment_end = current_segment_start + len(s.current)
+        initial_segment_end = initial_segment_start + len(s.initial)
+        if current_segment_start <= end <= current_segment_end:
+            if s.changed and len(s.current) > 0:
+                end_in_initial = (
+                    initial_segment_start
+                    if end == current_segment_start
+                    else initial_segment_end
+                )
+            else:
+                end_in_initial = initial_segment_start + (end - current_segment_start)
+            break
+
+        current_segment_start += len(s.current)
+        initial_segment_start += len(s.initial)
+
+    return (start_in_initial, end_in_initial)
+
+
+def current_offsets(
+    string: JournaledString, start: int, end: int
+) -> Tuple[Optional[int], Optional[int]]:
+    """
+    Convert offsets expressed relative to the initial value of the string to offsets in the
+    updated (current value of the) string. See the note in 'to_initial_offsets' about the
+    limitations of precision in this method.
+    """
+
+    current_segment_start = 0
+    initial_segment_start = 0
+
+    start_in_current: Optional[int] = None
+    for s in string.segments:
+
+        initial_segment_end = initial_segment_start + len(s.initial)
+
+        # Search the segment for the start position.
+        if start_in_current is None:
+            if initial_segment_start <= start <= initial_segment_end:
+                start_in_current = current_segment_start
+                # If the 'start' offset comes at the end of this segment, return the end.
+                if s.changed and start == initial_segment_end:
+                    start_in_current = current_segment_start + len(s.current)
+                # If this segment is still from the initial string, the start index
+                # can be adjusted to a specific offset in the segment.
+                if not s.changed:
+                    start_in_current += start - initial_segment_start
+
+        # Only look for the end once the start has been found.
+        if start_in_current is not None:
+            # Search the segment for the end position. This search process is analogous
+            # to the search for 'start' above; see it for comments.
+            if initial_segment_start <= end <= initial_segment_end:
+                if s.changed:
+                    if end == initial_segment_start:
+                        end_in_current = current_segment_start
+                    else:
+                        end_in_current = current_segment_start + len(s.current)
+                else:
+                    end_in_current = current_segment_start + (
+                        end - initial_segment_start
+                    )
+                return (start_in_current, end_in_current)
+
+        current_segment_start += len(s.current)
+        initial_segment_start += len(s.initial)
+
+    return (None, None)
@@ -2,19 +2,23 @@ import os.path
 from typing import FrozenSet
 
 import cv2
+import numpy as np
 from common.bounding_box import (
+    HueIndex,
+    PixelMerger,
     cluster_boxes,
     compute_accuracy,
     find_boxes_with_color,
     intersect,
     iou,
     iou_per_region,
+    merge_pixels,
     subtract,
     subtract_multiple,
     subtract_multiple_from_multiple,
     union,
 )
-from common.types import BoundingBox
+from common.types import BoundingBox, Point
 from common.types import FloatRectangle as Rectangle
 from common.types import Rectangle as IntRectangle
 
@@ -75,6 +79,56 @@ def test_find_boxes_within_masks():
     assert boxes[1].height == 10
 
 
+def test_hue_index_finds_same_pixels_as_scanning_image():
+    random = np.random.RandomState(0)
+    image = random.randint(0, 256, size=(40, 30, 3), dtype=np.uint8)
+    img_hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    saturated = img_hsv[:, :, 1] > 50
+    hue_index = HueIndex.for_saturated_pixels(image)
+
+    # Include hues at both ends of the hue range, where distances between hues wrap around.
+    for hue in [0.0, 0.005, 0.2, 0.5, 0.995, 1.0]:
+        distance = np.abs(img_hsv[:, :, 0].astype(np.int16) - hue * 180)
+        matching = (np.minimum(distance, 180 - distance) <= 0.01 * 180) & saturated
+        expected = set(zip(*np.where(matching)))
+
+        ys, xs = hue_index.find_pixels(hue, 0.01)
+        assert set(zip(ys, xs)) == expected
+        assert len(ys) == len(expected)
+        assert hue_index.contains_hue(hue, 0.01) == (len(expected) > 0)
+
+
+def test_merge_pixels_matches_pixel_merger():
+    random = np.random.RandomState(0)
+    for _ in range(50):
+        num_pixels = random.randint(0, 200)
+        xs = random.randint(0, 100, size=num_pixels)
+        ys = random.randint(0, 100, size=num_pixels)
+        points = [Point(x, y) for x, y in zip(xs, ys)]
+        for max_vertical_break in [0, 1, 3]:
+            expected = list(
+                PixelMerger(max_vertical_break=max_vertical_break).merge_pixels(points)
+            )
+            assert (
+                merge_pixels(xs, ys, max_vertical_break=max_vertical_break) == expected
+            )
+
+
+def test_find_boxes_with_color_matches_pixel_merger():
+    for image_name in ["rectangle_hue_40.png", "two_lines_hue_40.png"]:
+        image = cv2.imread(get_test_path(os.path.join("images", image_name)))
+        img_hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+        distance = np.abs(img_hsv[:, :, 0].astype(np.int16) - 20)
+        matching = (np.minimum(distance, 180 - distance) <= 1.8) & (
+            img_hsv[:, :, 1] > 50
+        )
+        ys, xs = np.where(matching)
+        expected = list(
+            PixelMerger().merge_pixels([Point(x, y) for x, y in zip(xs, ys)])
+        )
+        assert find_boxes_with_color(image, 40 / 360.0) == expected
+
+
 def box(left: float, top: float, width: float, height: float, page: int):
     return BoundingBox(left, top, width, height, page)
 
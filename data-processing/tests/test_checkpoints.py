@@ -0,0 +1,32 @@
+import multiprocessing
+
+import pytest
+
+from common import checkpoints
+from tests.util import use_data_dir
+
+
+@pytest.fixture(name="data_dir")
+def fixture_data_dir(tmp_path, monkeypatch):  # type: ignore
+    " Save data to directories in a temporary data directory. "
+    return use_data_dir(monkeypatch, str(tmp_path), ["checkpoints"])
+
+
+def record_commands(pipeline: int) -> None:
+    for i in range(20):
+        checkpoints.record_command_completed("1601.00001", f"command-{pipeline}-{i}")
+
+
+@pytest.mark.usefixtures("data_dir")
+def test_record_commands_completed_from_many_processes():
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=record_commands, args=(i,)) for i in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    completed = checkpoints.load_completed_commands("1601.00001")
+    assert sorted(completed) == sorted(
+        f"command-{p}-{i}" for p in range(4) for i in range(20)
+    )
@@ -4,6 +4,7 @@ from common.compile import (
     get_errors,
     get_last_autotex_compiler,
     get_last_colorized_entity_id,
+    get_page_count,
     is_driver_unimplemented,
 )
 from common.types import CompiledTexFile
@@ -124,3 +125,15 @@ def test_get_entity_colored_before_failure():
     )
     id_ = get_last_colorized_entity_id(autotex_log, "pdflatex")
     assert id_ == "2"
+
+
+def test_get_page_count():
+    stdout = bytearray(
+        "Output written on main.dvi (3 pages, 11340 bytes).\n"
+        + "Output written on main.dvi (4 pages, 12340 bytes).\n"
+        + "Output written on other.pdf (1 page, 1340 bytes).",
+        "utf-8",
+    )
+    assert get_page_count(stdout, "main.ps") == 4
+    assert get_page_count(stdout, "other.pdf") == 1
+    assert get_page_count(stdout, "missing.pdf") is None
@@ -0,0 +1,85 @@
+import os.path
+from tempfile import TemporaryDirectory
+
+import numpy as np
+
+from common.compile_cache import (
+    CompileCache,
+    compute_cache_key,
+    fingerprint_directory,
+    snapshot_directory,
+)
+from common.types import CompilationResult, CompiledTexFile, OutputFile
+from tests.util import write_file
+
+
+def test_cache_key_depends_on_sources_and_settings():
+    with TemporaryDirectory() as sources_dir:
+        write_file(os.path.join(sources_dir, "main.tex"), b"original")
+        write_file(os.path.join(sources_dir, "figures", "figure.png"), b"figure")
+        fingerprint = fingerprint_directory(sources_dir)
+        key = compute_cache_key(fingerprint, {"main.tex": b"colorized"}, "settings")
+
+        assert key == compute_cache_key(
+            fingerprint, {"./main.tex": b"colorized"}, "settings"
+        )
+        assert key != compute_cache_key(
+            fingerprint, {"main.tex": b"colorized again"}, "settings"
+        )
+        assert key != compute_cache_key(
+            fingerprint, {"main.tex": b"colorized"}, "other settings"
+        )
+
+        write_file(os.path.join(sources_dir, "figures", "figure.png"), b"new figure")
+        assert fingerprint_directory(sources_dir) != fingerprint
+
+
+def test_restore_cached_compilation():
+    with TemporaryDirectory() as cache_dir, TemporaryDirectory() as compiled_dir, TemporaryDirectory() as restored_dir:
+        cache = CompileCache(cache_dir)
+        write_file(os.path.join(compiled_dir, "main.tex"), b"colorized")
+        snapshot = snapshot_directory(compiled_dir)
+
+        assert cache.load_compilation("key", restored_dir) is None
+        write_file(os.path.join(compiled_dir, "main.pdf"), b"pdf")
+        write_file(os.path.join(compiled_dir, "auto_gen_ps.log"), b"log")
+        result = CompilationResult(
+            True,
+            [CompiledTexFile("main.tex")],
+            [OutputFile("pdf", "main.pdf")],
+            b"stdout",
+            b"stderr",
+        )
+        cache.save_compilation("key", compiled_dir, result, snapshot)
+
+        assert cache.load_compilation("key", restored_dir) == result
+        # Only files produced by compilation are cached and restored.
+        assert sorted(os.listdir(restored_dir)) == ["auto_gen_ps.log", "main.pdf"]
+        assert cache.compile_stats.hits == 1
+        assert cache.compile_stats.misses == 1
+
+
+def test_rasters_are_cached_for_each_raster_setting():
+    with TemporaryDirectory() as cache_dir:
+        cache = CompileCache(cache_dir)
+        images = {0: np.full((4, 3, 3), 255, dtype=np.uint8)}
+        images[0][1, 1] = (0, 0, 255)
+
+        assert cache.load_rasters("key", "gs", "dir/main.pdf") is None
+        cache.save_rasters("key", "gs", "dir/main.pdf", images)
+
+        loaded = cache.load_rasters("key", "gs", "dir/main.pdf")
+        assert loaded is not None
+        assert np.array_equal(loaded[0], images[0])
+        assert cache.load_rasters("key", "pdftoppm", "dir/main.pdf") is None
+        assert cache.raster_stats.hits == 1
+        assert cache.raster_stats.misses == 2
+
+
+def test_failed_compilations_are_not_cached():
+    with TemporaryDirectory() as cache_dir, TemporaryDirectory() as compiled_dir:
+        cache = CompileCache(cache_dir)
+        snapshot = snapshot_directory(compiled_dir)
+        result = CompilationResult(False, [], [], b"stdout", b"timed out")
+        cache.save_compilation("key", compiled_dir, result, snapshot)
+        assert cache.load_compilation("key", compiled_dir) is None
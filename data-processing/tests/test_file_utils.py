@@ -0,0 +1,160 @@
+import os.path
+from dataclasses import dataclass
+from tempfile import TemporaryDirectory
+from typing import List, Optional
+
+import pytest
+
+from common import file_utils
+from common.string import JournaledString
+
+
+@dataclass(frozen=True)
+class Record:
+    id_: str
+    index: int
+    score: float
+    optional_score: Optional[float]
+    flag: bool
+    tags: List[str]
+    tex: JournaledString
+
+
+RECORDS = [
+    Record("a", 0, 0.5, None, True, ["x", "y"], JournaledString("\\alpha")),
+    Record('b,\n"c"', 1, 1e-7, 2.0, False, [], JournaledString("")),
+]
+
+
+@pytest.fixture(name="restore_storage_format")
+def fixture_restore_storage_format():  # type: ignore
+    " Restore the default storage format after a test changes it. "
+    yield
+    file_utils.set_storage_format("csv")
+
+
+@pytest.mark.usefixtures("restore_storage_format")
+@pytest.mark.parametrize("storage_format", file_utils.STORAGE_FORMATS)
+def test_save_and_load_records(storage_format: str):
+    file_utils.set_storage_format(storage_format)
+    with TemporaryDirectory() as output_dir:
+        path = os.path.join(output_dir, "records.csv")
+        for record in RECORDS:
+            file_utils.append_to_csv(path, record)
+        loaded = list(file_utils.load_from_csv(path, Record))
+
+    assert [r.tex.to_json() for r in loaded] == [r.tex.to_json() for r in RECORDS]
+    assert [
+        (r.id_, r.index, r.score, r.optional_score, r.flag, r.tags) for r in loaded
+    ] == [(r.id_, r.index, r.score, r.optional_score, r.flag, r.tags) for r in RECORDS]
+
+
+@pytest.mark.usefixtures("restore_storage_format")
+@pytest.mark.parametrize("storage_format", file_utils.STORAGE_FORMATS)
+def test_write_rows_in_session(storage_format: str):
+    file_utils.set_storage_format(storage_format)
+    with TemporaryDirectory() as output_dir:
+        path = os.path.join(output_dir, "records.csv")
+        with pytest.raises(RuntimeError):
+            with file_utils.csv_writer_session():
+                file_utils.append_to_csv(path, RECORDS[0])
+                # Rows appended so far are written before the file is loaded.
+                assert len(list(file_utils.load_from_csv(path, Record))) == 1
+                file_utils.append_to_csv(path, RECORDS[1])
+                raise RuntimeError()
+
+        # Rows are written when the session ends, even if it ended with an error.
+        assert len(list(file_utils.load_from_csv(path, Record))) == 2
+
+
+@pytest.mark.usefixtures("restore_storage_format")
+@pytest.mark.parametrize("storage_format", file_utils.STORAGE_FORMATS)
+def test_reopen_file_deleted_during_session(storage_format: str):
+    file_utils.set_storage_format(storage_format)
+    with TemporaryDirectory() as output_dir:
+        path = os.path.join(output_dir, "records.csv")
+        with file_utils.csv_writer_session():
+            file_utils.append_to_csv(path, RECORDS[0])
+            file_utils.delete_data_file(path)
+            file_utils.append_to_csv(path, RECORDS[1])
+            file_utils.append_to_csv(path, RECORDS[0])
+
+        assert [r.id_ for r in file_utils.load_from_csv(path, Record)] == [
+            RECORDS[1].id_,
+            RECORDS[0].id_,
+        ]
+
+
+def test_load_lists_saved_as_python_literals():
+    with TemporaryDirectory() as output_dir:
+        path = os.path.join(output_dir, "records.csv")
+        file_utils.append_to_csv(path, RECORDS[0])
+        with open(path) as file_:
+            contents = file_.read()
+        assert '"[""x"", ""y""]"' in contents
+
+        # Files written before lists were saved as JSON have lists as Python literals.
+        with open(path, "w") as file_:
+            file_.write(contents.replace('"[""x"", ""y""]"', "\"['x', 'y']\""))
+        loaded = list(file_utils.load_from_csv(path, Record))
+
+    assert loaded[0].tags == ["x", "y"]
+
+
+def test_skip_records_with_lists_that_cannot_be_saved():
+    with TemporaryDirectory() as output_dir:
+        path = os.path.join(output_dir, "records.csv")
+        tags: List = [object()]
+        unserializable = Record("b", 1, 1.0, None, False, tags, JournaledString(""))
+        for record in [RECORDS[0], unserializable, RECORDS[1]]:
+            file_utils.append_to_csv(path, record)
+        loaded = list(file_utils.load_from_csv(path, Record))
+
+    assert [r.id_ for r in loaded] == [RECORDS[0].id_, RECORDS[1].id_]
+
+
+@pytest.mark.usefixtures("restore_storage_format")
+def test_save_sqlite_data_next_to_csv_path():
+    file_utils.set_storage_format("sqlite")
+    with TemporaryDirectory() as output_dir:
+        path = os.path.join(output_dir, "entities.csv")
+        file_utils.append_to_csv(path, RECORDS[0])
+
+        assert not os.path.exists(path)
+        assert file_utils.get_data_path(path) == os.path.join(
+            output_dir, "entities.sqlite"
+        )
+        assert file_utils.data_file_exists(path)
+        assert file_utils.glob_data_files(output_dir, "entities*.csv") == [path]
+
+
+@pytest.mark.usefixtures("restore_storage_format")
+def test_append_to_existing_file_in_its_format():
+    with TemporaryDirectory() as output_dir:
+        path = os.path.join(output_dir, "records.csv")
+        file_utils.append_to_csv(path, RECORDS[0])
+        file_utils.set_storage_format("sqlite")
+        file_utils.append_to_csv(path, RECORDS[1])
+
+        assert file_utils.get_data_path(path) == path
+        assert len(list(file_utils.load_from_csv(path, Record))) == 2
+
+
+@pytest.mark.usefixtures("restore_storage_format")
+def test_export_sqlite_data_to_csv():
+    file_utils.set_storage_format("sqlite")
+    with TemporaryDirectory() as output_dir:
+        path = os.path.join(output_dir, "records.csv")
+        for record in RECORDS:
+            file_utils.append_to_csv(path, record)
+
+        file_utils.set_storage_format("csv")
+        exported_path = os.path.join(output_dir, "exported.csv")
+        file_utils.export_to_csv(path, exported_path)
+        with open(exported_path, encoding="utf-8") as exported_file:
+            assert exported_file.readline().startswith("id_,index,score")
+        exported = list(file_utils.load_from_csv(exported_path, Record))
+
+    assert [(r.id_, r.score, r.tags) for r in exported] == [
+        (r.id_, r.score, r.tags) for r in RECORDS
+    ]
@@ -0,0 +1,141 @@
+import os.path
+from dataclasses import dataclass
+
+import pytest
+
+from common import directories, file_utils, manifest
+from tests.util import use_data_dir
+
+
+@dataclass(frozen=True)
+class Record:
+    id_: str
+    score: float
+
+
+@pytest.fixture(name="data_dir")
+def fixture_data_dir(tmp_path, monkeypatch):  # type: ignore
+    " Save data to directories in a temporary data directory. "
+    return use_data_dir(monkeypatch, str(tmp_path), ["detected-entities", "manifests"])
+
+
+def get_entities_path(arxiv_id: str) -> str:
+    entities_dir = directories.arxiv_subdir("detected-entities", arxiv_id)
+    os.makedirs(entities_dir, exist_ok=True)
+    return os.path.join(entities_dir, "entities.csv")
+
+
+@pytest.mark.usefixtures("data_dir")
+def test_find_arxiv_subdir():
+    path = get_entities_path("hep-th/9901001")
+    assert directories.find_arxiv_subdir(path) == (
+        "detected-entities",
+        "hep-th/9901001",
+        "entities.csv",
+    )
+    assert directories.find_arxiv_subdir("entities.csv") is None
+
+
+@pytest.mark.usefixtures("data_dir")
+def test_record_rows_saved_in_writer_session():
+    path = get_entities_path("1601.00001")
+    with file_utils.csv_writer_session():
+        for i in range(3):
+            file_utils.append_to_csv(path, Record(str(i), i / 2))
+
+    entry = manifest.get_entry(path)
+    assert entry is not None
+    assert entry.dirkey == "detected-entities"
+    assert entry.rows == 3
+    assert entry.size == os.path.getsize(path)
+    assert manifest.count_rows(path) == 3
+
+
+@pytest.mark.usefixtures("data_dir")
+def test_hash_file_only_when_hash_is_requested():
+    path = get_entities_path("1601.00001")
+    with file_utils.csv_writer_session():
+        file_utils.append_to_csv(path, Record("0", 0.0))
+
+    entry = manifest.get_entry(path)
+    assert entry is not None
+    assert entry.sha256 is None
+
+    sha256 = manifest.get_sha256(path)
+    assert sha256 == manifest.hash_file(path)
+    entry = manifest.get_entry(path)
+    assert entry is not None
+    assert entry.sha256 == sha256
+
+    # The hash is forgotten once the file changes.
+    with file_utils.csv_writer_session():
+        file_utils.append_to_csv(path, Record("1", 0.5))
+    entry = manifest.get_entry(path)
+    assert entry is not None
+    assert entry.sha256 is None
+    assert manifest.get_sha256(path) == manifest.hash_file(path)
+
+
+@pytest.mark.usefixtures("data_dir")
+def test_add_appended_rows_to_recorded_rows():
+    path = get_entities_path("1601.00001")
+    for start in [0, 2]:
+        with file_utils.csv_writer_session():
+            for i in range(start, start + 2):
+                file_utils.append_to_csv(path, Record(str(i), i / 2))
+
+    assert manifest.count_rows(path) == 4
+
+
+@pytest.mark.usefixtures("data_dir")
+def test_ignore_entry_for_file_changed_outside_writer_session():
+    path = get_entities_path("1601.00001")
+    with file_utils.csv_writer_session():
+        file_utils.append_to_csv(path, Record("0", 0.0))
+    file_utils.append_to_csv(path, Record("1", 0.5))
+
+    assert manifest.count_rows(path) is None
+    # The next session that appends to the file counts the rows in it again.
+    with file_utils.csv_writer_session():
+        file_utils.append_to_csv(path, Record("2", 1.0))
+    assert manifest.count_rows(path) == 3
+
+
+@pytest.mark.usefixtures("data_dir")
+def test_list_data_files_from_manifest():
+    entities_dir = os.path.dirname(get_entities_path("1601.00001"))
+    for name in ["entities-0.csv", "entities-1.csv"]:
+        with file_utils.csv_writer_session():
+            file_utils.append_to_csv(os.path.join(entities_dir, name), Record("0", 0.0))
+    # Files saved outside of writer sessions aren't in the manifest, so they aren't listed
+    # while the manifest lists the directory's files.
+    file_utils.append_to_csv(
+        os.path.join(entities_dir, "entities-2.csv"), Record("0", 0.0)
+    )
+
+    assert file_utils.glob_data_files(entities_dir, "entities*.csv") == [
+        os.path.join(entities_dir, "entities-0.csv"),
+        os.path.join(entities_dir, "entities-1.csv"),
+    ]
+
+
+@pytest.mark.usefixtures("data_dir")
+def test_list_data_files_by_globbing_without_up_to_date_manifest():
+    entities_dir = os.path.dirname(get_entities_path("1601.00001"))
+    file_utils.append_to_csv(
+        os.path.join(entities_dir, "entities-0.csv"), Record("0", 0.0)
+    )
+    assert manifest.list_files(entities_dir, ["entities*.csv"]) is None
+    assert file_utils.glob_data_files(entities_dir, "entities*.csv") == [
+        os.path.join(entities_dir, "entities-0.csv")
+    ]
+
+    # Once a listed file is deleted, the manifest can't be relied on to list files.
+    path = os.path.join(entities_dir, "entities-1.csv")
+    with file_utils.csv_writer_session():
+        file_utils.append_to_csv(path, Record("0", 0.0))
+    assert manifest.list_files(entities_dir, ["entities*.csv"]) == [path]
+    os.unlink(path)
+    assert file_utils.glob_data_files(entities_dir, "entities*.csv") == [
+        os.path.join(entities_dir, "entities-0.csv")
+    ]
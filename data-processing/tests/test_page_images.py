@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from common.page_images import parse_ppm_stream
+
+
+def make_ppm(rgb: np.ndarray, header_comment: bool = False) -> bytes:
+    height, width, _ = rgb.shape
+    comment = b"# Created by a test\n" if header_comment else b""
+    return b"P6\n" + comment + f"{width} {height}\n255\n".encode() + rgb.tobytes()
+
+
+def test_parse_ppm_stream_with_multiple_pages():
+    page1 = np.zeros((2, 3, 3), dtype=np.uint8)
+    page1[0, 0] = [255, 0, 0]  # red, in RGB
+    page2 = np.full((4, 2, 3), 255, dtype=np.uint8)
+
+    images = parse_ppm_stream(make_ppm(page1) + make_ppm(page2, header_comment=True))
+
+    assert len(images) == 2
+    assert images[0].shape == (2, 3, 3)
+    assert images[1].shape == (4, 2, 3)
+    # Images are converted to the BGR channel order used by OpenCV.
+    assert list(images[0][0, 0]) == [0, 0, 255]
+    assert np.all(images[1] == 255)
+
+
+def test_parse_empty_ppm_stream():
+    assert parse_ppm_stream(b"") == []
+
+
+def test_fail_to_parse_truncated_ppm_stream():
+    page = np.zeros((2, 2, 3), dtype=np.uint8)
+    with pytest.raises(ValueError):
+        parse_ppm_stream(make_ppm(page)[:-1])
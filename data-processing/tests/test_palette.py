@@ -0,0 +1,116 @@
+from typing import Dict, Tuple
+
+import cv2
+import numpy as np
+
+from common.colorize_tex import (
+    HUES,
+    PALETTES,
+    _get_tex_color,
+    colorize_entities,
+    generate_colors,
+)
+from common.locate_entities import locate_entities_in_images
+from common.types import ColorizeOptions, Rectangle, SerializableEntity
+
+PAGE_WIDTH = 1275
+PAGE_HEIGHT = 1650
+WORDS_PER_ROW = 6
+
+
+def test_default_palette_has_original_hues():
+    palette = PALETTES["default"]
+    assert palette.size() == 30
+    assert list(generate_colors(palette)) == [(hue, 1.0) for hue in HUES]
+
+
+def test_wide_palette_colors_are_distinct():
+    colors = list(generate_colors(PALETTES["wide"]))
+    assert len(colors) == PALETTES["wide"].size()
+    assert len(set(colors)) == len(colors)
+
+
+def test_colorize_entities_with_palette():
+    palette = PALETTES["wide"]
+    entities = [
+        SerializableEntity(
+            start=i * 2,
+            end=i * 2 + 1,
+            id_=str(i),
+            tex_path="main.tex",
+            tex="x",
+            context_tex="",
+        )
+        for i in range(palette.size())
+    ]
+    colorized = colorize_entities(
+        "x " * palette.size(),
+        entities,
+        ColorizeOptions(insert_color_macros=False),
+        palette=palette,
+    )
+    assert colorized.entity_values is not None
+    colors = {
+        (colorized.entity_hues[e.id_], colorized.entity_values[e.id_]) for e in entities
+    }
+    assert len(colors) == palette.size()
+
+
+def word_mask(index: int) -> np.ndarray:
+    " Get a mask of the pixels of one word on the page. "
+    mask = np.zeros((PAGE_HEIGHT, PAGE_WIDTH), dtype=np.uint8)
+    left = 50 + (index % WORDS_PER_ROW) * 200
+    baseline = 60 + (index // WORDS_PER_ROW) * 60
+    cv2.putText(mask, "word", (left, baseline), cv2.FONT_HERSHEY_SIMPLEX, 0.8, 255, 2)
+    # Only keep pixels that are fully set: pages are rastered without anti-aliasing, like
+    # Ghostscript rasters pages by default.
+    return mask > 127
+
+
+def to_bgr(hue: float, value: float) -> Tuple[int, int, int]:
+    red, green, blue = _get_tex_color(hue, value)
+    return (round(blue * 255), round(green * 255), round(red * 255))
+
+
+def test_locate_every_color_of_wide_palette_on_page():
+    palette = PALETTES["wide"]
+    colors = list(generate_colors(palette))
+
+    original = np.full((PAGE_HEIGHT, PAGE_WIDTH, 3), 255, dtype=np.uint8)
+    colorized = original.copy()
+    entity_hues: Dict[str, float] = {}
+    entity_values: Dict[str, float] = {}
+    expected_boxes: Dict[str, Rectangle] = {}
+
+    for index, (hue, value) in enumerate(colors):
+        entity_id = f"entity-{index}"
+        entity_hues[entity_id] = hue
+        entity_values[entity_id] = value
+        mask = word_mask(index)
+        original[mask] = (0, 0, 0)
+        colorized[mask] = to_bgr(hue, value)
+
+        ys, xs = np.where(mask)
+        expected_boxes[entity_id] = Rectangle(
+            xs.min(), ys.min(), xs.max() - xs.min() + 1, ys.max() - ys.min() + 1
+        )
+
+    result = locate_entities_in_images(
+        {"main.pdf": {0: original}},
+        {"main.pdf": {0: colorized}},
+        entity_hues,
+        entity_values=entity_values,
+        palette=palette,
+    )
+
+    assert result is not None
+    assert not result.black_pixels_found
+    assert result.shifted_entities == []
+    for entity_id, expected in expected_boxes.items():
+        boxes = result.locations[entity_id]
+        assert len(boxes) == 1, f"Expected one box for {entity_id}, found {boxes}"
+        box = boxes[0]
+        assert round(box.left * PAGE_WIDTH) == expected.left
+        assert round(box.top * PAGE_HEIGHT) == expected.top
+        assert round(box.width * PAGE_WIDTH) == expected.width
+        assert round(box.height * PAGE_HEIGHT) == expected.height
@@ -1,9 +1,15 @@
+import json
+import os.path
+import string
+from typing import List, Tuple
+
 from common.parse_tex import (
     BeginDocumentExtractor,
     DocumentclassExtractor,
     EquationExtractor,
     MacroExtractor,
     PhraseExtractor,
+    Shingle,
     extract_plaintext,
 )
 from common.types import MacroDefinition
@@ -130,6 +136,52 @@ def test_extract_phrase_containing_single_letter():
     assert phrases[0].text == "T"
 
 
+def find_phrases_by_linear_search(
+    phrases: List[str], tex: str
+) -> List[Tuple[str, int, int]]:
+    " Find phrases in the way 'PhraseExtractor' used to, by searching the list of phrases. "
+    plaintext = extract_plaintext("main.tex", tex)
+    found = []
+    for size in range(1, 6):
+        for shingle in PhraseExtractor.get_shingles(str(plaintext), size):
+            cands = [shingle]
+            for cand in list(cands):
+                cands.append(
+                    Shingle(cand.text.strip(string.punctuation), cand.start, cand.end)
+                )
+            for cand in list(cands):
+                cands.append(Shingle(cand.text.lower(), cand.start, cand.end))
+            for cand in list(cands):
+                if cand.text.endswith("s"):
+                    cands.append(Shingle(cand.text[:-1], cand.start, cand.end))
+            for cand in set(cands):
+                if cand.text in phrases:
+                    start, end = plaintext.initial_offsets(cand.start, cand.end)
+                    found.append((cand.text, start, end))
+                    break
+    return found
+
+
+def test_extract_glossary_phrases_like_linear_search():
+    glossary_path = os.path.join(
+        "entities", "glossary_terms", "google_ml-glossary.json"
+    )
+    with open(glossary_path) as glossary_file:
+        glossary_terms = sorted({gloss["name"] for gloss in json.load(glossary_file)})
+    sentences = []
+    for i, term in enumerate(glossary_terms):
+        # Mention terms in the forms that phrases are matched in: as is, capitalized,
+        # plural, formatted, and next to punctuation.
+        variant = [term, term.capitalize() + "s", r"\textit{" + term + "}"][i % 3]
+        sentences.append(f"We consider the {variant}, which is {i}% better.")
+    tex = "\n".join(sentences)
+
+    extractor = PhraseExtractor(glossary_terms)
+    phrases = [(p.text, p.start, p.end) for p in extractor.parse("main.tex", tex)]
+    assert len(phrases) >= len(glossary_terms)
+    assert phrases == find_phrases_by_linear_search(glossary_terms, tex)
+
+
 def test_extract_sentences():
     extractor = SentenceExtractor(from_named_sections_only=False)
     sentences = list(
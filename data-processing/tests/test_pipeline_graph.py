@@ -0,0 +1,117 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List
+
+from common.commands.base import Command
+from common.commands.locate_entities import make_locate_entities_command
+from scripts.pipeline_graph import (
+    ResourceBudget,
+    TaskTiming,
+    build_pipeline_graph,
+    find_critical_path,
+    run_pipeline_graph,
+)
+from scripts.pipelines import EntityPipeline
+
+
+def make_command(name: str) -> Any:
+    class FakeCommand(Command[None, None]):  # pylint: disable=abstract-method
+        @staticmethod
+        def get_name() -> str:
+            return name
+
+    return FakeCommand
+
+
+Prepare = make_command("prepare")
+ExtractEquations = make_command("extract-equations")
+ExtractSymbols = make_command("extract-symbols")
+ExtractSentences = make_command("extract-sentences")
+ExtractCitations = make_command("extract-citations")
+LocateCitations = make_locate_entities_command("citations")
+
+PIPELINES = [
+    EntityPipeline("equations", [ExtractEquations]),
+    EntityPipeline(
+        "symbols",
+        [ExtractSymbols],
+        depends_on=["equations"],
+        optional_depends_on=["sentences"],
+    ),
+    EntityPipeline("citations", [ExtractCitations, LocateCitations]),
+    EntityPipeline("sentences", [ExtractSentences]),
+]
+
+
+def test_build_graph_from_pipelines_with_commands_to_run():
+    graph = build_pipeline_graph(
+        [Prepare, ExtractEquations, ExtractSymbols, LocateCitations],
+        PIPELINES,
+        batch_workers=4,
+    )
+    assert list(graph.keys()) == ["equations", "symbols", "citations"]
+    # The optional dependency on sentences is dropped, as sentences won't be processed.
+    assert graph["symbols"].depends_on == ["equations"]
+    assert graph["citations"].commands == [LocateCitations]
+    assert graph["citations"].compile_slots == 4
+    assert graph["equations"].compile_slots == 0
+
+
+def test_run_independent_pipelines_at_the_same_time():
+    graph = build_pipeline_graph(
+        [ExtractEquations, ExtractSymbols, ExtractSentences], PIPELINES
+    )
+    sentences_started = threading.Event()
+    finished: List[str] = []
+
+    def run_commands(command_names: List[str]) -> None:
+        if command_names == ["extract-equations"]:
+            # Equations can only finish if sentences are being processed at the same time.
+            assert sentences_started.wait(timeout=5)
+        if command_names == ["extract-sentences"]:
+            sentences_started.set()
+        finished.extend(command_names)
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        timings = run_pipeline_graph(
+            graph, run_commands, executor, ResourceBudget(cpus=2, compile_slots=0)
+        )
+
+    assert finished.index("extract-symbols") > finished.index("extract-equations")
+    assert finished.index("extract-symbols") > finished.index("extract-sentences")
+    assert timings["symbols"].start >= timings["equations"].end
+
+
+def test_run_pipelines_one_at_a_time_when_budget_is_used_up():
+    graph = build_pipeline_graph(
+        [ExtractEquations, ExtractSentences, LocateCitations], PIPELINES, 2
+    )
+    running: List[str] = []
+    overlapped = []
+
+    def run_commands(command_names: List[str]) -> None:
+        overlapped.append(bool(running))
+        running.append(command_names[0])
+        threading.Event().wait(0.01)
+        running.remove(command_names[0])
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        run_pipeline_graph(
+            graph, run_commands, executor, ResourceBudget(cpus=1, compile_slots=1)
+        )
+
+    assert overlapped == [False, False, False]
+
+
+def test_find_critical_path():
+    graph = build_pipeline_graph(
+        [ExtractEquations, ExtractSymbols, ExtractSentences, ExtractCitations],
+        PIPELINES,
+    )
+    timings = {
+        "equations": TaskTiming(0, 2),
+        "sentences": TaskTiming(0, 5),
+        "symbols": TaskTiming(5, 8),
+        "citations": TaskTiming(0, 6),
+    }
+    assert find_critical_path(graph, timings) == (["sentences", "symbols"], 8)
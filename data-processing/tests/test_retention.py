@@ -0,0 +1,74 @@
+import os.path
+
+import pytest
+
+from common.commands.compile_tex import CompileTexSources
+from common.commands.locate_entities import make_locate_entities_command
+from common.commands.raster_pages import RasterPages
+from common.retention import DataRetention, DiskBudgetExceededException
+from tests.util import save_data_file, use_data_dir
+
+LocateCitations = make_locate_entities_command("citations")
+LocateEquations = make_locate_entities_command("equations")
+COMMANDS = [CompileTexSources, RasterPages, LocateCitations, LocateEquations]
+ARXIV_ID = "1601.00001"
+
+
+@pytest.fixture(name="data_dir")
+def fixture_data_dir(tmp_path, monkeypatch):  # type: ignore
+    " Save data to directories in a temporary data directory. "
+    return use_data_dir(
+        monkeypatch, str(tmp_path), ["sources", "paper-images", "compile-cache"]
+    )
+
+
+@pytest.mark.usefixtures("data_dir")
+def test_delete_artifacts_once_consumers_finish():
+    retention = DataRetention("lean", [ARXIV_ID], COMMANDS)
+    sources_path = save_data_file("sources", ARXIV_ID, "main.tex", b"0" * 10)
+    retention.command_finished(CompileTexSources)
+    image_path = save_data_file(
+        "paper-images", ARXIV_ID, "main.pdf/page-0.png", b"0" * 100
+    )
+    results_path = save_data_file(
+        "paper-images", ARXIV_ID, "main.pdf/images.csv", b"0" * 10
+    )
+    retention.command_finished(RasterPages)
+    retention.command_finished(LocateCitations)
+    assert os.path.exists(image_path)
+
+    retention.command_finished(LocateEquations)
+    assert not os.path.exists(image_path)
+    assert os.path.exists(results_path)
+    assert os.path.exists(sources_path)
+    assert retention.usage[ARXIV_ID].peak == 120
+    assert retention.usage[ARXIV_ID].peak_command == "raster-pages"
+
+
+@pytest.mark.usefixtures("data_dir")
+def test_keep_artifacts_with_batches_policy():
+    retention = DataRetention("batches", [ARXIV_ID], COMMANDS)
+    image_path = save_data_file(
+        "paper-images", ARXIV_ID, "main.pdf/page-0.png", b"0" * 100
+    )
+    for CommandCls in COMMANDS:
+        retention.command_finished(CommandCls)
+    assert os.path.exists(image_path)
+
+
+@pytest.mark.usefixtures("data_dir")
+def test_drop_caches_when_over_disk_budget():
+    retention = DataRetention("batches", [ARXIV_ID], COMMANDS, disk_budget=150)
+    image_path = save_data_file(
+        "paper-images", ARXIV_ID, "main.pdf/page-0.png", b"0" * 100
+    )
+    cache_path = save_data_file(
+        "compile-cache", ARXIV_ID, "entry/result.pdf", b"0" * 100
+    )
+    retention.command_finished(RasterPages)
+    assert not os.path.exists(cache_path)
+    assert os.path.exists(image_path)
+
+    save_data_file("sources", ARXIV_ID, "main.tex", b"0" * 100)
+    with pytest.raises(DiskBudgetExceededException):
+        retention.command_finished(LocateCitations)
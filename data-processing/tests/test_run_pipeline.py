@@ -0,0 +1,139 @@
+from argparse import Namespace
+from typing import Any, Iterator, List
+
+import pytest
+
+from common import checkpoints
+from common.commands.base import Command
+from common.types import ArxivId
+from common.work_cache import WorkCache
+from scripts import run_pipeline
+from tests.util import save_data_file, use_data_dir
+
+
+@pytest.fixture(name="data_dir")
+def fixture_data_dir(tmp_path, monkeypatch):  # type: ignore
+    " Save data to directories in a temporary data directory. "
+    return use_data_dir(
+        monkeypatch,
+        str(tmp_path / "data"),
+        ["sources", "checkpoints", "manifests", "paper-images", "compile-cache"],
+    )
+
+
+def make_command(name: str, size: int) -> Any:
+    class FakeCommand(Command[None, None]):  # pylint: disable=abstract-method
+        output_size = size
+        " Bytes of data the command saves for each paper when it runs. "
+
+        @staticmethod
+        def get_name() -> str:
+            return name
+
+    return FakeCommand
+
+
+@pytest.fixture(name="commands_run")
+def fixture_commands_run(monkeypatch):  # type: ignore
+    " Run fake commands instead of pipeline commands, and record the commands that were run. "
+    commands_run: List[str] = []
+
+    def run_command_for_arxiv_ids(CommandCls, arxiv_id_list, _):  # type: ignore
+        commands_run.append(CommandCls.get_name())
+        for arxiv_id in arxiv_id_list:
+            save_data_file(
+                "sources",
+                arxiv_id,
+                f"{CommandCls.get_name()}.txt",
+                "x" * CommandCls.output_size,
+            )
+
+    monkeypatch.setattr(
+        run_pipeline, "run_command_for_arxiv_ids", run_command_for_arxiv_ids
+    )
+    monkeypatch.setattr(run_pipeline, "make_paper_digest", lambda *_: {})
+    return commands_run
+
+
+def create_pipeline_args(tmp_path: Any, disk_budget: float) -> Namespace:
+    return Namespace(
+        work_cache_dir=str(tmp_path / "cache"),
+        work_cache_size=1,
+        code_version="v1",
+        resume=False,
+        keep_intermediate_files=False,
+        retention_policy="batches",
+        disk_budget=disk_budget,
+        concurrent_pipelines=False,
+    )
+
+
+COMMANDS = [make_command("unpack-sources", 100), make_command("extract-symbols", 10)]
+
+
+@pytest.mark.usefixtures("data_dir")
+def test_do_not_cache_data_when_over_disk_budget(tmp_path, commands_run):
+    # The budget of 50 bytes is exceeded once the first command has run.
+    pipeline_args = create_pipeline_args(tmp_path, disk_budget=50e-9)
+    run_pipeline.run_cached_commands_for_arxiv_id(COMMANDS, "1601.00001", pipeline_args)
+    assert commands_run == ["unpack-sources"]
+    cache = WorkCache(str(tmp_path / "cache"), int(1e9), "v1")
+    assert cache.load_entry("1601.00001") is None
+
+    # When all commands finish, the data is cached.
+    pipeline_args.disk_budget = None
+    run_pipeline.run_cached_commands_for_arxiv_id(COMMANDS, "1601.00001", pipeline_args)
+    assert commands_run == ["unpack-sources", "unpack-sources", "extract-symbols"]
+    entry = cache.load_entry("1601.00001")
+    assert entry is not None
+    assert entry.commands == ["unpack-sources", "extract-symbols"]
+
+
+class ExtractCitations(Command[ArxivId, str]):
+    " Command that only finds citations in one paper, and records the papers it processed. "
+
+    processed: List[ArxivId] = []
+
+    @staticmethod
+    def get_name() -> str:
+        return "extract-citations"
+
+    @staticmethod
+    def get_description() -> str:
+        return "Extract citations."
+
+    def load(self) -> Iterator[ArxivId]:
+        for arxiv_id in self.args.arxiv_ids:
+            yield arxiv_id
+
+    def process(self, item: ArxivId) -> Iterator[str]:
+        self.processed.append(item)
+        if item == "1601.00001":
+            yield "citation"
+
+    def save(self, item: ArxivId, result: str) -> None:
+        pass
+
+
+@pytest.mark.usefixtures("data_dir")
+def test_resume_skips_paper_with_no_results(tmp_path, monkeypatch):
+    monkeypatch.setattr(run_pipeline, "log_filename", "pipeline.log", raising=False)
+    monkeypatch.setattr(ExtractCitations, "processed", [])
+    pipeline_args = Namespace(
+        v=False,
+        source="arxiv",
+        keep_intermediate_files=False,
+        retention_policy="batches",
+        database_schema=None,
+        database_create_tables=False,
+        data_version=None,
+        command_workers=1,
+        resume=True,
+    )
+    arxiv_ids = ["1601.00001", "1601.00002"]
+    run_pipeline.run_command_for_arxiv_ids(ExtractCitations, arxiv_ids, pipeline_args)
+
+    # The command ran for the paper it found no citations in, so it isn't run for it again.
+    assert checkpoints.load_completed_commands("1601.00002") == ["extract-citations"]
+    run_pipeline.run_command_for_arxiv_ids(ExtractCitations, arxiv_ids, pipeline_args)
+    assert ExtractCitations.processed == arxiv_ids
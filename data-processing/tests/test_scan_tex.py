@@ -1,4 +1,15 @@
-from common.scan_tex import Pattern, scan_tex
+from typing import Iterator
+
+import pytest
+
+from common.scan_tex import (
+    MIN_CACHED_TEX_LENGTH,
+    Match,
+    Pattern,
+    TokenStream,
+    get_token_stream,
+    scan_tex,
+)
 
 
 def test_find_pattern():
@@ -50,3 +61,41 @@ def test_get_unmatched():
     assert match2.start == 1
     assert match2.end == 2
     assert match2.text == "."
+
+
+def test_share_scans_of_same_tex():
+    tex = "a" * MIN_CACHED_TEX_LENGTH
+    letter = Pattern("letter", r"[a-z]")
+    begin = next(scan_tex(tex, [letter]))
+    assert begin.pattern is letter
+
+    # Tokens scanned for one caller are returned to another caller that scans the same TeX
+    # for equal patterns, with the second caller's own pattern objects.
+    other_letter = Pattern("letter", r"[a-z]")
+    matches = list(scan_tex(tex, [other_letter]))
+    assert len(matches) == MIN_CACHED_TEX_LENGTH
+    assert matches[0] == Match(other_letter, "a", 0, 1)
+    assert all(m.pattern is other_letter for m in matches)
+    stream = get_token_stream(tex, (letter,))
+    assert len(list(stream.iterate([letter]))) == MIN_CACHED_TEX_LENGTH
+
+
+def test_raise_scan_error_to_every_reader_of_stream():
+    letter = Pattern("letter", r"[a-z]")
+    stream = TokenStream("ab", (letter,), include_unmatched=False)
+
+    def failing_scan() -> Iterator[Match]:
+        yield Match(letter, "a", 0, 1)
+        raise ValueError("Scan failed")
+
+    stream._scanner = failing_scan()  # pylint: disable=protected-access
+
+    first = stream.iterate([letter])
+    second = stream.iterate([letter])
+    assert next(first) == Match(letter, "a", 0, 1)
+    with pytest.raises(ValueError):
+        next(first)
+    # A reader that starts after the failure sees the tokens scanned before it, then the error.
+    assert next(second) == Match(letter, "a", 0, 1)
+    with pytest.raises(ValueError):
+        next(second)
@@ -1,4 +1,11 @@
-from common.string import JournaledString
+import random
+from typing import Iterator
+
+import pytest
+
+from common.string import Edit, JournaledString
+
+from tests import linear_string
 
 
 def test_replace():
@@ -129,3 +136,75 @@ def test_load():
     assert s == "starter changed"
     assert s.initial_offsets(0, 1) == (0, 1)
     assert s.initial_offsets(9, 9) == (8, 14)
+
+
+def random_edited_strings(seed: int, count: int) -> Iterator[JournaledString]:
+    " Make strings with random sequences of edits, including insertions and deletions. "
+    rng = random.Random(seed)
+    for _ in range(count):
+        s = JournaledString(
+            "".join(rng.choice("ab ") for _ in range(rng.randint(0, 12)))
+        )
+        yield s
+        for _ in range(rng.randint(1, 6)):
+            start = rng.randint(0, len(s))
+            end = rng.randint(start, len(s))
+            replacement = "".join(rng.choice("xy") for _ in range(rng.randint(0, 3)))
+            s = s.edit(start, end, replacement)
+            yield s
+
+
+def test_offsets_match_linear_search():
+    rng = random.Random(0)
+    for s in random_edited_strings(seed=1, count=300):
+        assert len(s) == len(str(s))
+        for _ in range(10):
+            start = rng.randint(-1, len(s) + 1)
+            end = rng.randint(start - 1, len(s) + 1)
+            assert s.initial_offsets(start, end) == linear_string.initial_offsets(
+                s, start, end
+            )
+            start = rng.randint(-1, len(s.initial) + 1)
+            end = rng.randint(start - 1, len(s.initial) + 1)
+            assert s.current_offsets(start, end) == linear_string.current_offsets(
+                s, start, end
+            )
+
+
+def test_substrings_match_linear_search():
+    rng = random.Random(0)
+    for s in random_edited_strings(seed=2, count=300):
+        for _ in range(10):
+            start = rng.randint(-1, len(s) + 1)
+            end = rng.randint(start - 1, len(s) + 1)
+            greedy, left, right = (rng.choice([True, False]) for _ in range(3))
+            sub = s.substring(start, end, greedy, left, right)
+            expected = linear_string.substring(s, start, end, greedy, left, right)
+            assert sub.segments == expected.segments
+
+
+def test_edit_many():
+    s = JournaledString("hello world")
+    edited = s.edit_many([Edit(6, 11, "moon"), Edit(1, 2, "i"), Edit(5, 5, ",")])
+    assert edited == "hillo, moon"
+    assert edited.initial == "hello world"
+
+
+def test_edit_many_rejects_overlapping_edits():
+    s = JournaledString("hello world")
+    with pytest.raises(ValueError):
+        s.edit_many([Edit(0, 5, "hi"), Edit(4, 6, "")])
+
+
+def test_edit_many_matches_edits_one_at_a_time():
+    rng = random.Random(0)
+    for s in random_edited_strings(seed=3, count=300):
+        offsets = sorted(rng.randint(0, len(s)) for _ in range(2 * rng.randint(0, 4)))
+        edits = [
+            Edit(start, end, rng.choice(["", "x", "yy", str(s)[start:end]]))
+            for start, end in zip(offsets[::2], offsets[1::2])
+        ]
+        expected = s
+        for edit in reversed(edits):
+            expected = expected.edit(edit.start, edit.end, edit.replacement)
+        assert s.edit_many(edits).segments == expected.segments
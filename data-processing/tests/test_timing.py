@@ -0,0 +1,33 @@
+import os.path
+from tempfile import TemporaryDirectory
+
+from common import file_utils
+from common.timing import StageTimer
+from common.types import StageTiming
+
+
+def test_timer_adds_up_durations_and_pages_for_each_stage():
+    timer = StageTimer()
+    timer.add("raster", 1.0, pages=2)
+    timer.add("compile", 3.0)
+    timer.add("raster", 0.5, pages=1)
+    with timer.time("diff", pages=3):
+        pass
+
+    assert list(timer.durations.keys()) == ["raster", "compile", "diff"]
+    assert timer.durations["raster"] == 1.5
+    assert timer.pages == {"raster": 3, "diff": 3}
+
+
+def test_save_and_load_stage_timings():
+    timings = [
+        StageTiming(
+            "1234.5678", "symbols", "main.tex-0-0", 0, "compile", 2.5, None, 30
+        ),
+        StageTiming("1234.5678", "symbols", "main.tex-0-0", 0, "raster", 0.75, 12, 30),
+    ]
+    with TemporaryDirectory() as output_dir:
+        timings_path = os.path.join(output_dir, "timings.csv")
+        for timing in timings:
+            file_utils.append_to_csv(timings_path, timing)
+        assert list(file_utils.load_from_csv(timings_path, StageTiming)) == timings
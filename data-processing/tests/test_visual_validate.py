@@ -1,8 +1,15 @@
 import os.path
 
 import cv2
-
-from common.locate_entities import contains_black_pixels, has_hue_shifted
+import numpy as np
+
+from common.colorize_tex import PALETTES
+from common.locate_entities import (
+    contains_black_pixels,
+    has_hue_shifted,
+    locate_entities_in_images,
+    predict_pages,
+)
 from tests.util import get_test_path
 
 
@@ -44,3 +51,95 @@ def test_no_detect_shift_for_other_hue():
         get_test_path(os.path.join("images", "pink_letter_40_shifted.png"))
     )
     assert not has_hue_shifted(black, pink_shifted, YELLOW_HUE)
+
+
+def test_locate_entities_in_images():
+    black = cv2.imread(get_test_path(os.path.join("images", "black_letter_40.png")))
+    yellow = cv2.imread(get_test_path(os.path.join("images", "yellow_letter_40.png")))
+    result = locate_entities_in_images(
+        {"main.pdf": {0: black}}, {"main.pdf": {0: yellow}}, {"entity": YELLOW_HUE}
+    )
+    assert result is not None
+    assert len(result.locations["entity"]) == 1
+    assert result.locations["entity"][0].page == 0
+    assert result.shifted_entities == []
+    assert not result.black_pixels_found
+
+
+def test_locate_entities_in_images_detects_shift():
+    black = cv2.imread(get_test_path(os.path.join("images", "black_letter_40.png")))
+    yellow_shifted = cv2.imread(
+        get_test_path(os.path.join("images", "yellow_letter_40_shifted.png"))
+    )
+    result = locate_entities_in_images(
+        {"main.pdf": {0: black}},
+        {"main.pdf": {0: yellow_shifted}},
+        {"entity": YELLOW_HUE},
+    )
+    assert result is not None
+    assert result.shifted_entities == ["entity"]
+
+
+def test_detect_shift_of_only_one_entity_with_same_hue():
+    # Two entities are colored with the same hue at different brightness levels, as they are
+    # with the 'wide' palette. Only the dark entity moved.
+    palette = PALETTES["wide"]
+    hue = palette.hues()[10]
+
+    def color(value: float) -> np.ndarray:
+        hsv = np.uint8([[[round(hue * 180), 255, round(value * 255)]]])
+        return cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)[0, 0]
+
+    original = np.full((40, 40, 3), 255, dtype=np.uint8)
+    original[5:10, 5:10] = 0
+    original[20:25, 5:10] = 0
+    colorized = np.full((40, 40, 3), 255, dtype=np.uint8)
+    colorized[5:10, 5:10] = color(1.0)
+    colorized[20:25, 15:20] = color(0.5)
+
+    result = locate_entities_in_images(
+        {"main.pdf": {0: original}},
+        {"main.pdf": {0: colorized}},
+        {"bright": hue, "dark": hue},
+        entity_values={"bright": 1.0, "dark": 0.5},
+        palette=palette,
+    )
+    assert result is not None
+    assert result.shifted_entities == ["dark"]
+
+
+def test_locate_entities_in_images_fails_without_colorized_page():
+    black = cv2.imread(get_test_path(os.path.join("images", "black_letter_40.png")))
+    result = locate_entities_in_images(
+        {"main.pdf": {0: black}}, {"main.pdf": {}}, {"entity": YELLOW_HUE}
+    )
+    assert result is None
+
+
+def test_locate_entities_in_images_on_some_pages():
+    black = cv2.imread(get_test_path(os.path.join("images", "black_letter_40.png")))
+    yellow = cv2.imread(get_test_path(os.path.join("images", "yellow_letter_40.png")))
+    result = locate_entities_in_images(
+        {"main.pdf": {0: black, 1: black, 2: black}},
+        {"main.pdf": {1: yellow}},
+        {"entity": YELLOW_HUE},
+        pages=(1, 1),
+    )
+    assert result is not None
+    assert [box.page for box in result.locations["entity"]] == [1]
+
+
+def test_predict_pages_between_located_entities():
+    located = [(100, 2, 2), (500, 4, 5)]
+    assert predict_pages(located, [200, 300], num_pages=40) == (1, 6)
+
+
+def test_predict_pages_after_located_entities():
+    # Entities were found at a rate of one page per 100 characters of TeX.
+    located = [(0, 0, 0), (100, 1, 1), (200, 2, 2)]
+    assert predict_pages(located, [250, 390], num_pages=40) == (1, 5)
+
+
+def test_predict_no_pages_before_entities_are_located():
+    assert predict_pages([], [0, 100], num_pages=40) is None
+    assert predict_pages([(500, 4, 4)], [0, 100], num_pages=40) is None
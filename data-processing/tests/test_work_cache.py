@@ -0,0 +1,68 @@
+import os.path
+
+import pytest
+
+from common import directories, file_utils
+from common.work_cache import WorkCache
+from tests.util import save_data_file, use_data_dir
+
+
+@pytest.fixture(name="data_dir")
+def fixture_data_dir(tmp_path, monkeypatch):  # type: ignore
+    " Save data to directories in a temporary data directory. "
+    return use_data_dir(
+        monkeypatch, str(tmp_path / "data"), ["sources", "compile-cache"]
+    )
+
+
+def read_file(path: str) -> str:
+    with open(path, encoding="utf-8") as file_:
+        return file_.read()
+
+
+@pytest.mark.usefixtures("data_dir")
+def test_restore_saved_data(tmp_path):
+    cache = WorkCache(str(tmp_path / "cache"), 1000, "v1")
+    path = save_data_file("sources", "hep-th/9901001", "main.tex", "\\alpha")
+    save_data_file("compile-cache", "hep-th/9901001", "main.tex", "compiled")
+    cache.save("hep-th/9901001", ["unpack-sources", "compile-tex"])
+    file_utils.delete_data("hep-th/9901001")
+
+    assert not cache.restore("hep-th/9901001", ["unpack-sources", "extract-symbols"])
+    assert cache.restore("hep-th/9901001", ["unpack-sources"])
+    assert read_file(path) == "\\alpha"
+    # The compile cache isn't saved.
+    assert not os.path.exists(
+        directories.arxiv_subdir("compile-cache", "hep-th/9901001")
+    )
+
+
+@pytest.mark.usefixtures("data_dir")
+def test_only_restore_data_saved_by_same_code_version(tmp_path):
+    save_data_file("sources", "1601.00001", "main.tex", "\\alpha")
+    WorkCache(str(tmp_path / "cache"), 1000, "v1").save(
+        "1601.00001", ["unpack-sources"]
+    )
+    assert not WorkCache(str(tmp_path / "cache"), 1000, "v2").restore(
+        "1601.00001", ["unpack-sources"]
+    )
+
+
+@pytest.mark.usefixtures("data_dir")
+def test_evict_least_recently_used_entries(tmp_path):
+    cache = WorkCache(str(tmp_path / "cache"), 25, "v1")
+    for arxiv_id in ["1601.00001", "1601.00002"]:
+        save_data_file("sources", arxiv_id, "main.tex", "0123456789")
+        cache.save(arxiv_id, ["unpack-sources"])
+
+    # Use the first entry, so that the second entry is the least recently used.
+    entry_path = os.path.join(cache.get_entry_dir("1601.00002"), "entry.json")
+    os.utime(entry_path, ns=(0, 0))
+    assert cache.restore("1601.00001", ["unpack-sources"])
+
+    save_data_file("sources", "1601.00003", "main.tex", "0123456789")
+    cache.save("1601.00003", ["unpack-sources"])
+
+    assert cache.load_entry("1601.00001") is not None
+    assert cache.load_entry("1601.00002") is None
+    assert cache.load_entry("1601.00003") is not None
@@ -0,0 +1,81 @@
+import os.path
+from tempfile import TemporaryDirectory
+from typing import Dict
+
+from common.types import Path, RelativePath
+from common.workspace import create_workspace
+
+
+def create_temp_files(
+    dir_path: Path, contents_by_path: Dict[RelativePath, str]
+) -> None:
+    for path, contents in contents_by_path.items():
+        absolute_path = os.path.join(dir_path, path)
+        os.makedirs(os.path.dirname(absolute_path), exist_ok=True)
+        with open(absolute_path, "w") as file_:
+            file_.write(contents)
+
+
+def read(path: Path) -> str:
+    with open(path) as file_:
+        return file_.read()
+
+
+SOURCES = {
+    "main.tex": r"\input{other}",
+    "other.tex": "Hello world!",
+    "figures/plot.png": "<image data>",
+    "main.pdf": "<stale output>",
+}
+
+
+def test_copy_workspace():
+    with TemporaryDirectory() as sources_dir, TemporaryDirectory() as parent_dir:
+        create_temp_files(sources_dir, SOURCES)
+        workspace_dir = os.path.join(parent_dir, "workspace")
+        stats = create_workspace(
+            sources_dir, workspace_dir, {"main.tex": b"Colorized TeX"}, strategy="copy",
+        )
+
+        assert read(os.path.join(workspace_dir, "main.tex")) == "Colorized TeX"
+        assert read(os.path.join(workspace_dir, "other.tex")) == "Hello world!"
+        assert (
+            read(os.path.join(workspace_dir, "figures", "plot.png")) == "<image data>"
+        )
+        assert stats.files_copied == 4
+        assert stats.files_linked == 0
+
+        # The original sources are left untouched.
+        assert read(os.path.join(sources_dir, "main.tex")) == r"\input{other}"
+
+
+def test_link_workspace_shares_figures():
+    with TemporaryDirectory() as sources_dir, TemporaryDirectory() as parent_dir:
+        create_temp_files(sources_dir, SOURCES)
+        workspace_dir = os.path.join(parent_dir, "workspace")
+        stats = create_workspace(
+            sources_dir, workspace_dir, {"main.tex": b"Colorized TeX"}, strategy="link",
+        )
+
+        assert read(os.path.join(workspace_dir, "main.tex")) == "Colorized TeX"
+        assert (
+            read(os.path.join(workspace_dir, "figures", "plot.png")) == "<image data>"
+        )
+        assert stats.files_linked >= 1
+        assert stats.bytes_written < sum(len(c) for c in SOURCES.values())
+
+
+def test_link_workspace_does_not_share_possible_outputs():
+    with TemporaryDirectory() as sources_dir, TemporaryDirectory() as parent_dir:
+        create_temp_files(sources_dir, SOURCES)
+        workspace_dir = os.path.join(parent_dir, "workspace")
+        create_workspace(sources_dir, workspace_dir, strategy="link")
+
+        # Simulate the compiler overwriting the output file in place.
+        with open(os.path.join(workspace_dir, "main.pdf"), "w") as pdf_file:
+            pdf_file.write("<new output>")
+        with open(os.path.join(workspace_dir, "other.tex"), "w") as tex_file:
+            tex_file.write("Rewritten TeX")
+
+        assert read(os.path.join(sources_dir, "main.pdf")) == "<stale output>"
+        assert read(os.path.join(sources_dir, "other.tex")) == "Hello world!"
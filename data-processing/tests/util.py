@@ -1,4 +1,7 @@
 import os.path
+from typing import Any, List, Union
+
+from common import directories
 
 
 def get_test_path(relative_path: str) -> str:
@@ -8,3 +11,40 @@ def get_test_path(relative_path: str) -> str:
     path_to_this_file = os.path.abspath(__file__)
     this_file_dir = os.path.dirname(path_to_this_file)
     return os.path.join(this_file_dir, relative_path)
+
+
+def use_data_dir(monkeypatch: Any, data_dir: str, dirkeys: List[str]) -> str:
+    """
+    Save data to temporary data directories for the rest of a test. Only the data directories
+    with keys 'dirkeys' are registered, and they are created in 'data_dir' when used.
+    """
+    monkeypatch.setattr(directories, "DATA_DIR", data_dir)
+    monkeypatch.setattr(
+        directories,
+        "_directory_paths",
+        {
+            dirkey: os.path.join(data_dir, f"{i:02d}-{dirkey}")
+            for i, dirkey in enumerate(dirkeys, start=1)
+        },
+    )
+    return data_dir
+
+
+def write_file(path: str, contents: Union[str, bytes]) -> None:
+    " Write a file, creating its directory if needed. "
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if isinstance(contents, bytes):
+        with open(path, "wb") as binary_file:
+            binary_file.write(contents)
+    else:
+        with open(path, "w", encoding="utf-8") as text_file:
+            text_file.write(contents)
+
+
+def save_data_file(
+    dirkey: str, arxiv_id: str, relative_path: str, contents: Union[str, bytes]
+) -> str:
+    " Write a file to a paper's data directory. Returns the path of the file. "
+    path = os.path.join(directories.arxiv_subdir(dirkey, arxiv_id), relative_path)
+    write_file(path, contents)
+    return path